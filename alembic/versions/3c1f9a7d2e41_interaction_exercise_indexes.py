@@ -0,0 +1,28 @@
+"""index favorites and saved by exercise
+
+Revision ID: 3c1f9a7d2e41
+Revises: data_migration_001
+Create Date: 2026-10-19 09:12:44.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f9a7d2e41'
+down_revision: Union[str, None] = 'data_migration_001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('idx_favorites_exercise_user', 'favorites', ['exercise_id', 'user_id'])
+    op.create_index('idx_saved_exercise_user', 'saved', ['exercise_id', 'user_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_saved_exercise_user', table_name='saved')
+    op.drop_index('idx_favorites_exercise_user', table_name='favorites')
@@ -0,0 +1,32 @@
+"""add row hashes for incremental CSV re-import
+
+Revision ID: 5a8e3c1d9b72
+Revises: c47d1e9b6f20
+Create Date: 2026-10-19 15:12:44.871920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a8e3c1d9b72'
+down_revision: Union[str, None] = 'c47d1e9b6f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'imported_rows',
+        sa.Column('table_name', sa.String(), nullable=False),
+        sa.Column('row_id', sa.Integer(), nullable=False),
+        sa.Column('row_hash', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('table_name', 'row_id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('imported_rows')
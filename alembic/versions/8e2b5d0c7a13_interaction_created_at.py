@@ -0,0 +1,36 @@
+"""add created_at to favorites, saved and ratings
+
+Revision ID: 8e2b5d0c7a13
+Revises: 3c1f9a7d2e41
+Create Date: 2026-10-19 10:03:27.540911
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e2b5d0c7a13'
+down_revision: Union[str, None] = '3c1f9a7d2e41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('favorites', 'saved', 'ratings')
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        # SQLite can't add a NOT NULL column without a constant default, so add it nullable,
+        # backfill existing rows with the migration time, then tighten it in batch mode.
+        op.add_column(table, sa.Column('created_at', sa.DateTime(), nullable=True))
+        op.execute(sa.text(f"UPDATE {table} SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL"))
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('created_at')
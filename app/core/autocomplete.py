@@ -0,0 +1,291 @@
+"""
+In-memory typeahead over exercise names.
+
+Every name is indexed under each of its word positions ("barbell back squat" under
+"barbell back squat", "back squat" and "squat"), normalized to lowercase ASCII words. The keys
+live in a sorted list, so the names matching a prefix are one contiguous slice found with two
+binary searches. Public exercises share one index; private ones go into their owner's own small
+index. Matches are ranked by all-time popularity from the in-memory leaderboard.
+
+Short prefixes can match a large share of the index. A prefix matching more than MAX_CANDIDATES
+public keys keeps a list of its TOP_K most popular exercises instead, computed once over every
+match when the index is built and maintained by put/remove. Queries re-rank that list by current
+popularity together with the leaderboard's overall top exercises, so one that became popular
+since shows up too; the periodic rebuild recomputes the lists.
+
+Create/update/delete keep the index current in this process; the periodic rebuild picks up
+writes made through other worker processes.
+"""
+
+import heapq
+import itertools
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core import leaderboard
+from app.db.models import Exercise
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+# Sorts after every character a normalized key can contain, closing a prefix range
+_PREFIX_END = "\uffff"
+
+# Ranked public results are cached per prefix for a few seconds: popularity changes don't need
+# to show up on the next keystroke, and edits to the index clear the cache
+RESULT_LIMIT = 25
+CACHE_TTL_SECONDS = 5.0
+CACHE_MAX_PREFIXES = 10000
+
+# Prefixes with more matching public keys than this rank a precomputed top-TOP_K list
+MAX_CANDIDATES = 1000
+TOP_K = 2 * RESULT_LIMIT
+
+
+def normalize(text: str) -> str:
+    """
+    Lowercase, strip accents and collapse everything but letters and digits to single spaces.
+    """
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").lower()
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def _keys(name: str) -> List[str]:
+    words = normalize(name).split()
+    return [" ".join(words[start:]) for start in range(len(words))]
+
+
+def _prefixes(key: str):
+    return (key[:length] for length in range(1, len(key) + 1))
+
+
+class _SortedKeys:
+    """
+    Sorted (key, exercise id) pairs in two parallel lists, so bisect compares plain strings.
+    """
+
+    def __init__(self):
+        self.keys: List[str] = []
+        self.ids: List[int] = []
+
+    def add(self, key: str, exercise_id: int):
+        position = bisect_left(self.keys, key)
+        # Keep equal keys ordered by id so removal can find its exact position
+        while position < len(self.keys) and self.keys[position] == key and self.ids[position] < exercise_id:
+            position += 1
+        self.keys.insert(position, key)
+        self.ids.insert(position, exercise_id)
+
+    def remove(self, key: str, exercise_id: int):
+        position = bisect_left(self.keys, key)
+        while position < len(self.keys) and self.keys[position] == key:
+            if self.ids[position] == exercise_id:
+                del self.keys[position]
+                del self.ids[position]
+                return
+            position += 1
+
+    def range(self, prefix: str) -> Tuple[int, int]:
+        start = bisect_left(self.keys, prefix)
+        return start, bisect_left(self.keys, prefix + _PREFIX_END, start)
+
+    def matches(self, prefix: str) -> List[int]:
+        start, end = self.range(prefix)
+        return self.ids[start:end]
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._public = _SortedKeys()
+            self._private: Dict[int, _SortedKeys] = {}
+            # exercise id -> (name, owner id if private else None)
+            self._entries: Dict[int, Tuple[str, Optional[int]]] = {}
+            # Edits made while a rebuild reads the table, replayed onto the rebuilt index
+            self._pending: Optional[list] = None
+            # normalized prefix -> (expiry, ranked public results)
+            self._cache: Dict[str, Tuple[float, list]] = {}
+            # prefix with more than MAX_CANDIDATES public matches -> its most popular exercise ids
+            self._top: Dict[str, List[int]] = {}
+
+    def _bucket(self, owner_id: Optional[int]) -> _SortedKeys:
+        if owner_id is None:
+            return self._public
+        bucket = self._private.get(owner_id)
+        if bucket is None:
+            bucket = self._private[owner_id] = _SortedKeys()
+        return bucket
+
+    def _remove(self, exercise_id: int):
+        entry = self._entries.pop(exercise_id, None)
+        if entry is None:
+            return
+        name, owner_id = entry
+        bucket = self._bucket(owner_id)
+        for key in _keys(name):
+            bucket.remove(key, exercise_id)
+            if owner_id is None:
+                for prefix in _prefixes(key):
+                    top = self._top.get(prefix)
+                    if top is not None and exercise_id in top:
+                        top.remove(exercise_id)
+                        if len(top) < RESULT_LIMIT:
+                            # Recomputed from every match on the next query
+                            del self._top[prefix]
+        if owner_id is not None and not bucket.keys:
+            del self._private[owner_id]
+
+    def _add(self, exercise_id: int, name: str, owner_id: int, is_public: bool):
+        private_owner = None if is_public else owner_id
+        self._entries[exercise_id] = (name, private_owner)
+        bucket = self._bucket(private_owner)
+        for key in _keys(name):
+            bucket.add(key, exercise_id)
+            if private_owner is None:
+                for prefix in _prefixes(key):
+                    top = self._top.get(prefix)
+                    if top is not None and exercise_id not in top:
+                        top.append(exercise_id)
+                        if len(top) > 2 * TOP_K:
+                            top[:] = [ranked[2] for ranked in self._ranked(top, TOP_K)]
+
+    def put(self, exercise_id: int, name: str, owner_id: int, is_public: bool):
+        """
+        Index a new exercise, or re-index one whose name or visibility changed.
+        """
+        with self._lock:
+            self._remove(exercise_id)
+            self._add(exercise_id, name, owner_id, is_public)
+            self._cache = {}
+            if self._pending is not None:
+                self._pending.append((exercise_id, (name, owner_id, is_public)))
+
+    def remove(self, exercise_id: int):
+        with self._lock:
+            self._remove(exercise_id)
+            self._cache = {}
+            if self._pending is not None:
+                self._pending.append((exercise_id, None))
+
+    @staticmethod
+    def _load(db: Session) -> "PrefixIndex":
+        fresh = PrefixIndex()
+        fresh._top = {}
+        rows = db.query(Exercise.id, Exercise.name, Exercise.owner_id, Exercise.is_public).yield_per(1000)
+        pairs: List[Tuple[str, int]] = []
+        for exercise_id, name, owner_id, is_public in rows:
+            name = name or ""
+            if is_public:
+                # Bulk load: sort once instead of inserting one key at a time
+                fresh._entries[exercise_id] = (name, None)
+                pairs.extend((key, exercise_id) for key in _keys(name))
+            else:
+                fresh._add(exercise_id, name, owner_id, False)
+        pairs.sort()
+        fresh._public.keys = [key for key, _ in pairs]
+        fresh._public.ids = [exercise_id for _, exercise_id in pairs]
+        fresh._compute_top("", 0, len(pairs))
+        return fresh
+
+    def _compute_top(self, prefix: str, start: int, end: int) -> List[int]:
+        """
+        The TOP_K most popular of the public keys [start:end), which all start with `prefix`.
+        Stores the list of every prefix with more than MAX_CANDIDATES matches on the way, each
+        built from its children's lists so that every key is ranked about once.
+        """
+        keys, ids = self._public.keys, self._public.ids
+        if end - start <= MAX_CANDIDATES:
+            return [ranked[2] for ranked in self._ranked(ids[start:end], TOP_K)]
+        depth = len(prefix)
+        candidates = []
+        position = start
+        while position < end and len(keys[position]) == depth:
+            candidates.append(ids[position])
+            position += 1
+        while position < end:
+            child = keys[position][:depth + 1]
+            child_end = bisect_left(keys, child + _PREFIX_END, position, end)
+            candidates.extend(self._compute_top(child, position, child_end))
+            position = child_end
+        top = [ranked[2] for ranked in self._ranked(candidates, TOP_K)]
+        if prefix:
+            self._top[prefix] = top
+        return top
+
+    def rebuild(self, db: Session):
+        with self._lock:
+            self._pending = []
+        try:
+            fresh = self._load(db)
+        except BaseException:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            for exercise_id, values in self._pending:
+                fresh._remove(exercise_id)
+                if values is not None:
+                    fresh._add(exercise_id, *values)
+            self._public, self._private, self._entries = fresh._public, fresh._private, fresh._entries
+            self._top = fresh._top
+            self._cache = {}
+            self._pending = None
+
+    def _ranked(self, ids: List[int], limit: int = RESULT_LIMIT) -> List[Tuple[float, str, int]]:
+        score, entries = leaderboard.popular.scores().get, self._entries
+        return heapq.nsmallest(
+            limit, [(-score(exercise_id, 0.0), entries[exercise_id][0], exercise_id) for exercise_id in set(ids)]
+        )
+
+    def _top_matches(self, prefix: str) -> List[int]:
+        top = self._top.get(prefix)
+        if top is None:
+            top = self._top[prefix] = [ranked[2] for ranked in self._ranked(self._public.matches(prefix), TOP_K)]
+        return top
+
+    def _public_candidates(self, prefix: str) -> List[int]:
+        start, end = self._public.range(prefix)
+        if end - start <= MAX_CANDIDATES:
+            return self._public.ids[start:end]
+        # Exercises that became popular after the list was computed
+        rising = [
+            row["id"] for row in leaderboard.popular.top(leaderboard.popular.capacity)
+            if self._entries.get(row["id"], ("", 0))[1] is None
+            and any(key.startswith(prefix) for key in _keys(self._entries[row["id"]][0]))
+        ]
+        return self._top_matches(prefix) + rising
+
+    def suggest(self, query: str, user_id: int, limit: int) -> List[dict]:
+        """
+        Public exercises and `user_id`'s private ones with a word sequence starting with
+        `query`, most popular first (ties alphabetical). At most RESULT_LIMIT results.
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(prefix)
+            if cached is not None and cached[0] > now:
+                public = cached[1]
+            else:
+                public = self._ranked(self._public_candidates(prefix))
+                if len(self._cache) >= CACHE_MAX_PREFIXES:
+                    self._cache = {}
+                self._cache[prefix] = (now + CACHE_TTL_SECONDS, public)
+            own = self._private.get(user_id)
+            private = self._ranked(own.matches(prefix)) if own is not None else []
+        best = heapq.merge(public, private) if private else public
+        return [{"id": exercise_id, "name": name} for _, name, exercise_id in itertools.islice(best, limit)]
+
+
+index = PrefixIndex()
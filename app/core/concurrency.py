@@ -0,0 +1,190 @@
+"""
+Adaptive concurrency limits per route group, so a spike on a heavy endpoint can't take every
+worker thread from the cheap ones.
+
+Each group has its own limit on requests in flight and a short bounded wait queue. Requests
+that don't fit are rejected at once with 503 and Retry-After instead of queueing
+indefinitely. The limit adapts with AIMD: it grows by about one per limit's worth of fast
+responses and is cut multiplicatively when a response is slower than the group's latency
+target (or fails), which keeps tail latency bounded under overload.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+from app.core import metrics
+
+concurrency_limit = metrics.REGISTRY.register(metrics.Gauge(
+    "concurrency_limit", "Current adaptive concurrency limit by route group.", ("group",)
+))
+concurrency_in_flight = metrics.REGISTRY.register(metrics.Gauge(
+    "concurrency_in_flight", "Requests currently running by route group.", ("group",)
+))
+concurrency_rejected = metrics.REGISTRY.register(metrics.Counter(
+    "concurrency_rejected_total", "Requests shed because the group's limit and queue were full.", ("group", "reason")
+))
+
+# name -> (initial limit, min, max, queue size, latency target seconds)
+ROUTE_GROUPS = {
+    "migrate": (1, 1, 2, 2, 30.0),
+    "video_upload": (2, 1, 4, 4, 60.0),
+    "cloud": (4, 1, 8, 8, 2.0),
+    "collection": (8, 2, 16, 16, 0.5),
+    "auth": (8, 2, 16, 32, 0.5),
+    "default": (16, 4, 32, 64, 0.5),
+}
+
+
+def route_group(scope) -> Optional[str]:
+    """
+    Group a request by path (and the use_cloud flag); None leaves it unlimited.
+    """
+    path = scope["path"]
+    if path == "/metrics":
+        return None
+    if path.startswith("/migrate"):
+        return "migrate"
+    if path.startswith("/videos"):
+        # Streams don't hold a worker thread, and their duration says nothing about load
+        return "video_upload" if scope["method"] == "PUT" else None
+    if b"use_cloud=true" in scope.get("query_string", b""):
+        return "cloud"
+    if path.startswith("/collection"):
+        return "collection"
+    if path.startswith("/auth"):
+        return "auth"
+    return "default"
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limiter with a bounded FIFO wait queue. Used only from the event loop.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        max_queue: int,
+        latency_target: float,
+        backoff: float = 0.75,
+    ):
+        self.name = name
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._labels = (name,)
+        concurrency_limit.set(self.limit, self._labels)
+
+    async def acquire(self, timeout: float) -> Optional[str]:
+        """
+        Take a slot, waiting up to `timeout` seconds in the queue. Returns None on success or
+        the rejection reason ("queue_full" or "timeout").
+        """
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self._start()
+            return None
+        if len(self._waiters) >= self.max_queue:
+            return "queue_full"
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # release() hands the slot over by counting it before waking the waiter
+            await asyncio.wait_for(waiter, timeout)
+            return None
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot arrived as the timeout fired: use it
+                return None
+            return "timeout"
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # Cancelled (e.g. the client went away) after being handed a slot it never used
+                self._hand_back()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def _start(self):
+        self.in_flight += 1
+        concurrency_in_flight.inc(self._labels)
+
+    def release(self, latency: float, failed: bool):
+        if failed or latency > self.latency_target:
+            self.limit = max(float(self.min_limit), self.limit * self.backoff)
+        else:
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+        concurrency_limit.set(self.limit, self._labels)
+        self._hand_back()
+
+    def _hand_back(self):
+        # Free a slot and pass it to the next waiters, without a latency sample
+        self.in_flight -= 1
+        concurrency_in_flight.dec(self._labels)
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._start()
+                waiter.set_result(None)
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Pure ASGI middleware applying one AdaptiveLimiter per route group.
+    """
+
+    def __init__(
+        self,
+        app,
+        limiters: Dict[str, AdaptiveLimiter],
+        classify: Callable = route_group,
+        queue_timeout: float = 1.0,
+    ):
+        self.app = app
+        self.limiters = limiters
+        self.classify = classify
+        self.queue_timeout = queue_timeout
+
+    async def __call__(self, scope, receive, send):
+        limiter = self.limiters.get(self.classify(scope)) if scope["type"] == "http" else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        reason = await limiter.acquire(self.queue_timeout)
+        if reason is not None:
+            concurrency_rejected.inc((limiter.name, reason))
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [(b"content-type", b"application/json"), (b"retry-after", b"1")],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Server busy, retry later"}'})
+            return
+
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            limiter.release(time.perf_counter() - start, failed=status_holder[0] >= 500)
+
+
+def default_limiters() -> Dict[str, AdaptiveLimiter]:
+    return {name: AdaptiveLimiter(name, *config) for name, config in ROUTE_GROUPS.items()}
@@ -18,12 +18,105 @@ class Settings(BaseSettings):
     DB_PORT: int = Field(5432, env="DB_PORT")
     DB_NAME: str = Field("prehab_takehome", env="DB_NAME")
     
+    # SQLite concurrency: how long a connection or writer waits for a lock before giving up
+    SQLITE_BUSY_TIMEOUT_MS: int = Field(5000, env="SQLITE_BUSY_TIMEOUT_MS")
+    
+    # Read routing: replica URL for GET routes (empty = read-only connections to the SQLite file),
+    # and how long a user's reads stay on the primary after they write
+    READ_REPLICA_URL: str = Field("", env="READ_REPLICA_URL")
+    READ_YOUR_WRITES_SECONDS: float = Field(5.0, env="READ_YOUR_WRITES_SECONDS")
+    
     # JWT settings for authentication tokens
     JWT_SECRET_KEY: str = Field("SUPERSECRETKEY", env="JWT_SECRET_KEY")
     JWT_ALGORITHM: str = Field("HS256", env="JWT_ALGORITHM")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = Field(30, env="ACCESS_TOKEN_EXPIRE_MINUTES")
     REFRESH_TOKEN_EXPIRE_MINUTES: int = Field(60 * 24 * 7, env="REFRESH_TOKEN_EXPIRE_MINUTES")  # 7 days
 
+    # Refresh-token revocation filter (app/db/token_revocation.py): entries it is sized for, and how
+    # often rotations are written and other workers' revocations loaded
+    REFRESH_TOKEN_REVOCATION_CAPACITY: int = Field(100_000, env="REFRESH_TOKEN_REVOCATION_CAPACITY")
+    REFRESH_TOKEN_REVOCATION_SYNC_SECONDS: float = Field(2.0, env="REFRESH_TOKEN_REVOCATION_SYNC_SECONDS")
+
+    # Leaderboard settings (trending scores halve every TRENDING_HALF_LIFE_HOURS)
+    LEADERBOARD_SIZE: int = Field(100, env="LEADERBOARD_SIZE")
+    TRENDING_HALF_LIFE_HOURS: float = Field(24.0, env="TRENDING_HALF_LIFE_HOURS")
+    # Rebuild interval, picking up other workers' writes, CSV imports and compaction (0 disables)
+    LEADERBOARD_REFRESH_SECONDS: int = Field(5 * 60, env="LEADERBOARD_REFRESH_SECONDS")
+
+    # "Users who saved this also saved": neighbours kept per exercise and rebuild interval (0 disables)
+    SIMILARITY_TOP_K: int = Field(20, env="SIMILARITY_TOP_K")
+    SIMILARITY_REFRESH_SECONDS: int = Field(15 * 60, env="SIMILARITY_REFRESH_SECONDS")
+
+    # Autocomplete prefix index rebuild interval, picking up other workers' writes (0 disables)
+    AUTOCOMPLETE_REFRESH_SECONDS: int = Field(5 * 60, env="AUTOCOMPLETE_REFRESH_SECONDS")
+
+    # Per-user favorite/save membership cache (the TTL bounds staleness across worker processes)
+    MEMBERSHIP_CACHE_MAX_USERS: int = Field(10000, env="MEMBERSHIP_CACHE_MAX_USERS")
+    MEMBERSHIP_CACHE_TTL_SECONDS: float = Field(60.0, env="MEMBERSHIP_CACHE_TTL_SECONDS")
+
+    # Write-behind mode for favorite/save toggles: acknowledge immediately, commit in batches
+    WRITE_BEHIND_ENABLED: bool = Field(False, env="WRITE_BEHIND_ENABLED")
+    WRITE_BEHIND_FLUSH_MS: int = Field(5, env="WRITE_BEHIND_FLUSH_MS")
+
+    # Background removal of orphaned interaction rows followed by incremental VACUUM (0 disables)
+    ORPHAN_COMPACTION_INTERVAL_SECONDS: int = Field(60 * 60, env="ORPHAN_COMPACTION_INTERVAL_SECONDS")
+    ORPHAN_COMPACTION_BATCH_SIZE: int = Field(1000, env="ORPHAN_COMPACTION_BATCH_SIZE")
+    INCREMENTAL_VACUUM_PAGES: int = Field(1000, env="INCREMENTAL_VACUUM_PAGES")
+
+    # Change-log entries older than this are pruned by the compaction run; /sync asks clients
+    # whose `since` predates the retained log for a full resync (0 keeps every entry)
+    CHANGES_RETENTION_DAYS: int = Field(30, env="CHANGES_RETENTION_DAYS")
+
+    # Sharded Firestore favorite/save counters, rolled up into the exercise documents (0 disables the rollup)
+    FIRESTORE_COUNTERS_ENABLED: bool = Field(False, env="FIRESTORE_COUNTERS_ENABLED")
+    FIRESTORE_COUNTER_SHARDS: int = Field(10, env="FIRESTORE_COUNTER_SHARDS")
+    FIRESTORE_COUNTER_ROLLUP_SECONDS: int = Field(60, env="FIRESTORE_COUNTER_ROLLUP_SECONDS")
+
+    # Rows applied per transaction by the incremental H2 CSV re-import (app/db/csv_import.py)
+    CSV_IMPORT_BATCH_SIZE: int = Field(500, env="CSV_IMPORT_BATCH_SIZE")
+
+    # Per-request profiling: requests sending X-Profile-Token: <PROFILING_TOKEN> are profiled
+    PROFILING_ENABLED: bool = Field(False, env="PROFILING_ENABLED")
+    PROFILING_TOKEN: str = Field("", env="PROFILING_TOKEN")
+    PROFILING_OUTPUT_DIR: str = Field("profiles", env="PROFILING_OUTPUT_DIR")
+
+    # Adaptive per-route-group concurrency limits (groups in app/core/concurrency.py)
+    CONCURRENCY_LIMITS_ENABLED: bool = Field(True, env="CONCURRENCY_LIMITS_ENABLED")
+    CONCURRENCY_QUEUE_TIMEOUT_SECONDS: float = Field(1.0, env="CONCURRENCY_QUEUE_TIMEOUT_SECONDS")
+
+    # Background jobs (app/db/jobs.py): worker threads, jobs allowed to wait, and how long a job may go
+    # without a progress write before startup treats it as abandoned by a dead process
+    JOB_WORKERS: int = Field(2, env="JOB_WORKERS")
+    JOB_MAX_QUEUED: int = Field(20, env="JOB_MAX_QUEUED")
+    JOB_STALE_SECONDS: int = Field(10 * 60, env="JOB_STALE_SECONDS")
+    # How often idle runners adopt jobs queued by other workers
+    JOB_POLL_SECONDS: float = Field(5.0, env="JOB_POLL_SECONDS")
+
+    # Gunicorn's graceful timeout: how long a stopping worker gets to finish requests and jobs
+    GRACEFUL_TIMEOUT: int = Field(30, env="GRACEFUL_TIMEOUT")
+
+    # Online SQLite backups (app/db/backup.py): pages copied per step and the pause between steps
+    BACKUP_DIR: str = Field("backups", env="BACKUP_DIR")
+    BACKUP_PAGES_PER_STEP: int = Field(1000, env="BACKUP_PAGES_PER_STEP")
+    BACKUP_STEP_SLEEP_SECONDS: float = Field(0.05, env="BACKUP_STEP_SLEEP_SECONDS")
+    BACKUP_COMPRESS: bool = Field(True, env="BACKUP_COMPRESS")
+
+    # Admin endpoints (/admin) require the X-Admin-Token header to match; empty disables them
+    ADMIN_TOKEN: str = Field("", env="ADMIN_TOKEN")
+
+    # Local video storage (app/core/video_storage.py). With a prefix set, videos are handed to the
+    # reverse proxy via X-Accel-Redirect (e.g. an nginx `internal` location aliased to the directory)
+    VIDEO_STORAGE_DIR: str = Field("videos", env="VIDEO_STORAGE_DIR")
+    VIDEO_MAX_UPLOAD_BYTES: int = Field(500 * 1024 * 1024, env="VIDEO_MAX_UPLOAD_BYTES")
+    VIDEO_ACCEL_REDIRECT_PREFIX: str = Field("", env="VIDEO_ACCEL_REDIRECT_PREFIX")
+    # Lifetime of the per-video tokens that let a <video> element stream a private video
+    VIDEO_TOKEN_EXPIRE_SECONDS: int = Field(15 * 60, env="VIDEO_TOKEN_EXPIRE_SECONDS")
+
+    # Response compression: bodies smaller than this many bytes are sent as-is
+    COMPRESSION_MINIMUM_SIZE: int = Field(1024, env="COMPRESSION_MINIMUM_SIZE")
+    COMPRESSION_GZIP_LEVEL: int = Field(6, env="COMPRESSION_GZIP_LEVEL")
+    COMPRESSION_BROTLI_QUALITY: int = Field(4, env="COMPRESSION_BROTLI_QUALITY")
+
     class Config:
         # Automatically load variables from a .env file if it exists
         env_file = ".env"
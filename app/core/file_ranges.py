@@ -0,0 +1,168 @@
+"""
+Serving files from disk with HTTP range requests, conditional GETs and zero-copy transfer.
+
+`file_response()` answers `If-None-Match` with 304, a single `Range` (optionally guarded by
+`If-Range`) with 206 and `Content-Range`, and an unsatisfiable range with 416. The body is
+handed to the server with the ASGI zero-copy send extension when the server advertises it, so
+the kernel `sendfile`s the bytes without them passing through Python; otherwise it is read in
+chunks off the event loop. Multi-range requests get the whole file, which RFC 9110 allows.
+"""
+
+import os
+from email.utils import formatdate
+from typing import Optional, Tuple
+
+import anyio
+from starlette.requests import Request
+from starlette.responses import Response
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+CHUNK_SIZE = 256 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def etag(stat: os.stat_result) -> str:
+    """
+    Strong validator from modification time and size; replacing a file changes both.
+    """
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    The (first, last) byte positions of a single `bytes=` range, clamped to the file.
+    Returns None when the whole file should be sent (no header, another unit, several ranges,
+    or a malformed value) and raises RangeNotSatisfiable when no byte of the range exists.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+            if last and start > end:
+                return None
+        else:
+            # Suffix range: the last N bytes
+            suffix = int(last)
+            if suffix == 0:
+                raise RangeNotSatisfiable()
+            start, end = max(size - suffix, 0), size - 1
+    except ValueError:
+        return None
+    if start < 0:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def _matches(header: str, tag: str) -> bool:
+    return header.strip() == "*" or tag in (candidate.strip() for candidate in header.split(","))
+
+
+class FileRangeResponse(Response):
+    """
+    `count` bytes of the file at `path` from `offset`; headers must include Content-Length.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        offset: int,
+        count: int,
+        status_code: int = 200,
+        headers: Optional[dict] = None,
+        media_type: Optional[str] = None,
+        send_body: bool = True,
+    ):
+        self.path = path
+        self.offset = offset
+        self.count = count
+        self.status_code = status_code
+        self.media_type = media_type
+        self.send_body = send_body
+        self.background = None
+        self.init_headers(headers)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_body or self.count == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if ZEROCOPY_EXTENSION in (scope.get("extensions") or {}):
+            with open(self.path, "rb") as file:
+                await send({
+                    "type": ZEROCOPY_EXTENSION,
+                    "file": file,
+                    "offset": self.offset,
+                    "count": self.count,
+                    "more_body": False,
+                })
+            return
+
+        fd = await anyio.to_thread.run_sync(os.open, self.path, os.O_RDONLY)
+        try:
+            offset, remaining = self.offset, self.count
+            while remaining > 0:
+                chunk = await anyio.to_thread.run_sync(os.pread, fd, min(CHUNK_SIZE, remaining), offset)
+                if not chunk:
+                    break  # the file was truncated under us
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            os.close(fd)
+
+
+def file_response(request: Request, path: str, media_type: str) -> Response:
+    """
+    Answer a GET or HEAD for the file at `path`, honouring the request's conditional and
+    range headers. Raises FileNotFoundError if the file is gone.
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    tag = etag(stat)
+    headers = {
+        "etag": tag,
+        "last-modified": formatdate(stat.st_mtime, usegmt=True),
+        "accept-ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, tag):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range is not None and if_range.strip() != tag:
+        range_header = None  # the client's partial copy is stale: send everything
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"})
+
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["content-range"] = f"bytes {start}-{end}/{size}"
+    count = end - start + 1
+    headers["content-length"] = str(count)
+    return FileRangeResponse(
+        path, start, count, status_code, headers, media_type, send_body=request.method != "HEAD"
+    )
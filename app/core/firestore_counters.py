@@ -0,0 +1,112 @@
+"""
+Sharded favorite/save counters for the Firestore exercise documents.
+
+Firestore sustains about one write per second per document, so popular exercises can't
+update `favorite_count`/`save_count` in place. Each exercise instead gets `num_shards`
+documents in an `exercises/{id}/counter_shards` subcollection, and every change increments a
+random shard. A periodic rollup sums the shards of the exercises changed since the last run
+into the exercise document (one write per exercise per run); cloud reads use those totals.
+"""
+
+import logging
+import random
+import threading
+from typing import Dict, Iterable
+
+from firebase_admin import firestore
+from google.api_core.exceptions import NotFound
+
+from app.core.config import settings
+from app.core.metrics import firestore_call
+from app.firebase_setup import db_firestore
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = {"favorite": "favorite_count", "save": "save_count"}
+
+
+class ShardedCounters:
+    def __init__(self, client, num_shards: int):
+        self.client = client
+        self.num_shards = num_shards
+        self._lock = threading.Lock()
+        self._dirty = set()
+
+    def _exercise(self, exercise_id: int):
+        return self.client.collection("exercises").document(str(exercise_id))
+
+    def _shards(self, exercise_id: int):
+        return self._exercise(exercise_id).collection("counter_shards")
+
+    def increment(self, kind: str, exercise_id: int, delta: int = 1):
+        shard = self._shards(exercise_id).document(str(random.randrange(self.num_shards)))
+        with firestore_call("counters.increment"):
+            shard.set({COUNTER_FIELDS[kind]: firestore.Increment(delta)}, merge=True)
+        with self._lock:
+            self._dirty.add(exercise_id)
+
+    def totals(self, exercise_id: int) -> Dict[str, int]:
+        """
+        Current totals, summed over the shards.
+        """
+        totals = dict.fromkeys(COUNTER_FIELDS.values(), 0)
+        with firestore_call("counters.read"):
+            for shard in self._shards(exercise_id).stream():
+                data = shard.to_dict()
+                for field in totals:
+                    totals[field] += int(data.get(field, 0))
+        return totals
+
+    def seed(self, exercise_id: int, totals: Dict[str, int]):
+        """
+        Reset the shards to `totals` (e.g. the SQLite counts when migrating).
+        """
+        shards = self._shards(exercise_id)
+        with firestore_call("counters.seed"):
+            for index in range(self.num_shards):
+                values = totals if index == 0 else dict.fromkeys(COUNTER_FIELDS.values(), 0)
+                shards.document(str(index)).set(dict(values))
+
+    def rollup(self, exercise_ids: Iterable[int] = None) -> int:
+        """
+        Write the summed totals into the exercise documents changed since the last rollup
+        (or `exercise_ids`). Returns the number of documents updated.
+        """
+        if exercise_ids is None:
+            with self._lock:
+                exercise_ids, self._dirty = self._dirty, set()
+        updated = 0
+        for exercise_id in exercise_ids:
+            try:
+                totals = self.totals(exercise_id)
+                with firestore_call("exercises.update"):
+                    self._exercise(exercise_id).update(totals)
+                updated += 1
+            except NotFound:
+                # Not migrated to Firestore yet; the migration writes its counts
+                pass
+            except Exception:
+                logger.exception("Rolling up counters of exercise %s failed", exercise_id)
+                with self._lock:
+                    self._dirty.add(exercise_id)
+        return updated
+
+
+store = ShardedCounters(db_firestore, settings.FIRESTORE_COUNTER_SHARDS)
+
+
+def record(kind: str, exercise_id: int, removed: bool = False):
+    """
+    Count a committed favorite/save (or its removal). Errors are logged rather than raised,
+    since SQLite already holds the change; re-running the migration reseeds the counters.
+    """
+    if not settings.FIRESTORE_COUNTERS_ENABLED:
+        return
+    try:
+        store.increment(kind, exercise_id, -1 if removed else 1)
+    except Exception:
+        logger.exception("Incrementing the %s counter of exercise %s failed", kind, exercise_id)
+
+
+def rollup() -> int:
+    return store.rollup()
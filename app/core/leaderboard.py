@@ -0,0 +1,248 @@
+"""
+In-memory trending and popular exercise leaderboards, updated incrementally as favorites,
+saves and ratings arrive.
+
+Trending scores use forward decay: an event at time t adds weight * 2 ** ((t - epoch) / half_life)
+to its exercise's score. Every score shares the same decay factor at read time, so scores never
+have to be rescaled as time passes and the ranking only changes when an event arrives.
+
+Each worker process updates its boards with its own writes; every LEADERBOARD_REFRESH_SECONDS
+both are rebuilt from the tables to pick up other workers' writes, CSV imports and compaction.
+Events applied while a rebuild reads the tables are replayed onto the rebuilt boards, so one
+committed during that window may be counted twice until the following rebuild.
+"""
+
+import heapq
+import math
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import Exercise, Favorite, Rating, Saved
+
+# Score contributed by each interaction type
+EVENT_WEIGHTS = {"favorite": 1.0, "save": 2.0, "rating": 1.0}
+
+# Once the decay exponent passes this many half-lives, move the epoch forward to avoid overflow
+_MAX_EXPONENT = 512.0
+
+_UNIX_EPOCH = datetime(1970, 1, 1)
+
+
+def _timestamp(at: datetime) -> float:
+    return (at - _UNIX_EPOCH).total_seconds()
+
+
+class Leaderboard:
+    """
+    Keeps every exercise's score plus a sorted top-`capacity` list. Reads return the precomputed
+    snapshot; writes adjust one score and, when it affects the top list, reposition one entry.
+    """
+
+    def __init__(self, capacity: int, half_life_seconds: Optional[float] = None):
+        self.capacity = capacity
+        self.half_life = half_life_seconds
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._epoch = _timestamp(datetime.utcnow())
+            self._scores: Dict[int, float] = {}
+            # Events not yet retracted, so a score whose events were all retracted is dropped
+            # exactly instead of leaving float rounding residue behind
+            self._events: Dict[int, int] = {}
+            self._hidden: Set[int] = set()
+            self._top: List[int] = []
+            self._snapshot: Tuple[Tuple[int, float], ...] = ()
+
+    def _growth(self, at: datetime) -> float:
+        if self.half_life is None:
+            return 1.0
+        exponent = (_timestamp(at) - self._epoch) / self.half_life
+        if exponent > _MAX_EXPONENT:
+            self._rebase(exponent)
+            exponent = (_timestamp(at) - self._epoch) / self.half_life
+        return math.pow(2.0, exponent)
+
+    def _rebase(self, exponent: float):
+        # Rare O(n) pass: move the epoch forward and shrink every stored score by the same factor
+        shift = math.floor(exponent)
+        factor = math.pow(2.0, -shift)
+        self._epoch += shift * self.half_life
+        for exercise_id in self._scores:
+            self._scores[exercise_id] *= factor
+        self._publish()
+
+    def add(self, exercise_id: int, weight: float, at: datetime):
+        """
+        Apply one event. Use a negative weight with the original event time to retract it.
+        """
+        with self._lock:
+            events = self._events.get(exercise_id, 0) + (1 if weight >= 0 else -1)
+            if events <= 0:
+                # Every event was retracted
+                self._events.pop(exercise_id, None)
+                self._scores.pop(exercise_id, None)
+                if exercise_id in self._top:
+                    self._recompute()
+                return
+            self._events[exercise_id] = events
+            score = self._scores.get(exercise_id, 0.0) + weight * self._growth(at)
+            self._scores[exercise_id] = score
+
+            if exercise_id in self._hidden:
+                return
+            if exercise_id in self._top:
+                if weight < 0:
+                    # Something outside the top list may now outrank it
+                    self._recompute()
+                    return
+                self._top.remove(exercise_id)
+            elif len(self._top) >= self.capacity and score <= self._scores[self._top[-1]]:
+                return
+            self._insert(exercise_id, score)
+            self._publish()
+
+    def _insert(self, exercise_id: int, score: float):
+        # Linear scan over at most `capacity` entries, kept sorted by descending score
+        position = len(self._top)
+        while position > 0 and self._scores.get(self._top[position - 1], 0.0) < score:
+            position -= 1
+        self._top.insert(position, exercise_id)
+        del self._top[self.capacity:]
+
+    def _recompute(self):
+        candidates = (
+            (score, exercise_id) for exercise_id, score in self._scores.items() if exercise_id not in self._hidden
+        )
+        self._top = [exercise_id for _, exercise_id in heapq.nlargest(self.capacity, candidates)]
+        self._publish()
+
+    def _publish(self):
+        self._snapshot = tuple((exercise_id, self._scores[exercise_id]) for exercise_id in self._top)
+
+    def set_hidden(self, exercise_id: int, hidden: bool):
+        """
+        Private exercises keep their score but are left out of the rankings.
+        """
+        with self._lock:
+            if hidden == (exercise_id in self._hidden):
+                return
+            if hidden:
+                self._hidden.add(exercise_id)
+            else:
+                self._hidden.discard(exercise_id)
+            self._recompute()
+
+    def replace_with(self, fresh: "Leaderboard"):
+        """
+        Take over the state of a board rebuilt from the tables.
+        """
+        with self._lock:
+            self._epoch, self._scores, self._events = fresh._epoch, fresh._scores, fresh._events
+            self._hidden, self._top, self._snapshot = fresh._hidden, fresh._top, fresh._snapshot
+
+    def discard(self, exercise_id: int):
+        with self._lock:
+            self._scores.pop(exercise_id, None)
+            self._events.pop(exercise_id, None)
+            self._hidden.discard(exercise_id)
+            if exercise_id in self._top:
+                self._recompute()
+
+    def scores(self) -> Mapping[int, float]:
+        """
+        Undecayed scores by exercise id (read-only), comparable with each other at any one time.
+        """
+        return self._scores
+
+    def top(self, limit: int) -> List[dict]:
+        snapshot = self._snapshot
+        decay = 1.0
+        if self.half_life is not None:
+            decay = math.pow(2.0, -(_timestamp(datetime.utcnow()) - self._epoch) / self.half_life)
+        return [{"id": exercise_id, "score": round(score * decay, 4)} for exercise_id, score in snapshot[:limit]]
+
+
+trending = Leaderboard(settings.LEADERBOARD_SIZE, settings.TRENDING_HALF_LIFE_HOURS * 3600)
+popular = Leaderboard(settings.LEADERBOARD_SIZE)
+
+_BOARDS = (trending, popular)
+
+_replay_lock = threading.Lock()
+# Updates made while a rebuild reads the tables, replayed onto the rebuilt boards
+_pending: Optional[List[Tuple[Callable, tuple]]] = None
+
+
+def _apply(update: Callable, *args):
+    with _replay_lock:
+        update(_BOARDS, *args)
+        if _pending is not None:
+            _pending.append((update, args))
+
+
+def _record(boards: Sequence[Leaderboard], kind: str, exercise_id: int, created_at: datetime, removed: bool):
+    weight = EVENT_WEIGHTS[kind] * (-1.0 if removed else 1.0)
+    for board in boards:
+        board.add(exercise_id, weight, created_at)
+
+
+def _set_hidden(boards: Sequence[Leaderboard], exercise_id: int, hidden: bool):
+    for board in boards:
+        board.set_hidden(exercise_id, hidden)
+
+
+def _discard(boards: Sequence[Leaderboard], exercise_id: int):
+    for board in boards:
+        board.discard(exercise_id)
+
+
+def record_event(kind: str, exercise_id: int, created_at: datetime, removed: bool = False):
+    """
+    Feed one favorite/save/rating event (or its removal) into both leaderboards.
+    """
+    _apply(_record, kind, exercise_id, created_at or datetime.utcnow(), removed)
+
+
+def set_visibility(exercise_id: int, is_public: bool):
+    _apply(_set_hidden, exercise_id, not is_public)
+
+
+def remove_exercise(exercise_id: int):
+    _apply(_discard, exercise_id)
+
+
+def _load(db: Session) -> Tuple[Leaderboard, ...]:
+    fresh = tuple(Leaderboard(board.capacity, board.half_life) for board in _BOARDS)
+    for (exercise_id,) in db.query(Exercise.id).filter(Exercise.is_public == False):
+        for board in fresh:
+            board._hidden.add(exercise_id)
+    for kind, model in (("favorite", Favorite), ("save", Saved), ("rating", Rating)):
+        for exercise_id, created_at in db.query(model.exercise_id, model.created_at).yield_per(1000):
+            _record(fresh, kind, exercise_id, created_at or datetime.utcnow(), False)
+    return fresh
+
+
+def rebuild(db: Session):
+    """
+    Rebuild both leaderboards from the interaction tables and swap them in.
+    """
+    global _pending
+    with _replay_lock:
+        _pending = []
+    try:
+        fresh = _load(db)
+    except BaseException:
+        with _replay_lock:
+            _pending = None
+        raise
+    with _replay_lock:
+        for update, args in _pending:
+            update(fresh, *args)
+        for board, rebuilt in zip(_BOARDS, fresh):
+            board.replace_with(rebuilt)
+        _pending = None
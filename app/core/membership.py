@@ -0,0 +1,105 @@
+"""
+Per-user cache of favorited and saved exercise ids.
+
+Each cached user holds two sorted `array('q')` buffers (8 bytes per id, no ORM objects), so
+"which of these page ids are favorited/saved" is a binary search per id. The favorite/save
+routers invalidate a user on change by bumping their epoch, a counter shared by every worker
+process (app/db/shared_slots.py). Each entry remembers the epoch it was loaded at and is
+reloaded once that changes, so a write through any worker is seen by the next read on all of
+them. Entries also expire after a TTL.
+"""
+
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Collection, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.config import settings
+from app.db import statements
+from app.db.database import membership_epochs
+from app.db.models import Favorite, Saved
+
+
+def _contains(ids: array, exercise_id: int) -> bool:
+    index = bisect_left(ids, exercise_id)
+    return index < len(ids) and ids[index] == exercise_id
+
+
+class _Entry:
+    __slots__ = ("favorited", "saved", "expires_at", "epoch")
+
+    def __init__(self, favorited: array, saved: array, expires_at: float, epoch: int):
+        self.favorited = favorited
+        self.saved = saved
+        self.expires_at = expires_at
+        self.epoch = epoch
+
+
+class MembershipCache:
+    def __init__(self, max_users: int, ttl_seconds: float, epochs=membership_epochs):
+        self.max_users = max_users
+        self.ttl = ttl_seconds
+        self.epochs = epochs
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def invalidate(self, user_id: int):
+        """
+        Call after committing a change to the user's favorites or saves.
+        """
+        self.epochs.increment(user_id)
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def _entry(self, db: Session, user_id: int) -> _Entry:
+        now = time.monotonic()
+        # Read before loading: a write committed during the load bumps it and voids the entry
+        epoch = self.epochs.get(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry.expires_at > now and entry.epoch == epoch:
+                self._entries.move_to_end(user_id)
+                metrics.record_cache("membership", True)
+                return entry
+        metrics.record_cache("membership", False)
+
+        params = {"user_id": user_id}
+        favorited = array("q", db.execute(statements.MEMBERSHIP_IDS[Favorite], params).scalars())
+        saved = array("q", db.execute(statements.MEMBERSHIP_IDS[Saved], params).scalars())
+        entry = _Entry(favorited, saved, now + self.ttl, epoch)
+
+        with self._lock:
+            if self.epochs.get(user_id) == epoch:
+                self._entries[user_id] = entry
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_users:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def lookup(self, db: Session, user_id: int, exercise_ids: Collection[int]) -> Tuple[Set[int], Set[int]]:
+        """
+        Return (favorited, saved): the subsets of `exercise_ids` the user has favorited/saved.
+        """
+        entry = self._entry(db, user_id)
+        favorited = {i for i in exercise_ids if _contains(entry.favorited, i)}
+        saved = {i for i in exercise_ids if _contains(entry.saved, i)}
+        return favorited, saved
+
+    def all_ids(self, db: Session, user_id: int) -> Tuple[array, array]:
+        """
+        Return the user's full sorted favorited and saved id arrays.
+        """
+        entry = self._entry(db, user_id)
+        return entry.favorited, entry.saved
+
+
+cache = MembershipCache(settings.MEMBERSHIP_CACHE_MAX_USERS, settings.MEMBERSHIP_CACHE_TTL_SECONDS)
@@ -0,0 +1,269 @@
+"""
+In-process metrics registry that renders the Prometheus text exposition format.
+
+Metrics are plain counters, gauges and fixed-bucket histograms keyed by label tuples,
+so recording a sample is a dict lookup plus an integer increment under a lock.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets (seconds) shared by the request, pool and Firestore histograms
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _format_labels(labelnames: Sequence[str], labels: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labels)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    """
+    Monotonically increasing value per label combination.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, labels: Tuple[str, ...] = ()) -> float:
+        return self._values.get(labels, 0.0)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in items]
+
+
+class Gauge(Counter):
+    """
+    Value that can go up and down. If `function` is given, the gauge is evaluated at scrape time.
+    """
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        function: Optional[Callable[[], float]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._function = function
+
+    def set(self, value: float, labels: Tuple[str, ...] = ()):
+        with self._lock:
+            self._values[labels] = value
+
+    def dec(self, labels: Tuple[str, ...] = (), amount: float = 1.0):
+        self.inc(labels, -amount)
+
+    def collect(self) -> List[str]:
+        if self._function is not None:
+            return [f"{self.name} {self._function()}"]
+        return super().collect()
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. Each label combination owns one preallocated list holding the
+    per-bucket counts followed by the running sum and count.
+    """
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: Tuple[str, ...] = ()):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # len(buckets) finite buckets + the +Inf bucket + sum + count
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, labels: Tuple[str, ...] = ()):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, labels)
+
+    def count(self, labels: Tuple[str, ...] = ()) -> int:
+        series = self._series.get(labels)
+        return series[-1] if series else 0
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        lines = []
+        for labels, series in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), series):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# HTTP
+http_request_duration = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Request latency by route template.", ("method", "route")
+))
+http_request_errors = REGISTRY.register(Counter(
+    "http_request_errors_total", "Responses with a 5xx status or an unhandled exception.", ("method", "route", "status")
+))
+
+# Database connection pool
+db_pool_checkout_wait = REGISTRY.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a connection from the pool."
+))
+db_pool_checkouts = REGISTRY.register(Counter(
+    "db_pool_checkouts_total", "Connections checked out of the pool."
+))
+db_pool_in_use = REGISTRY.register(Gauge(
+    "db_pool_connections_in_use", "Connections currently checked out of the pool."
+))
+
+# In-process caches
+cache_requests = REGISTRY.register(Counter(
+    "cache_requests_total", "Cache lookups by cache name and result (hit or miss).", ("cache", "result")
+))
+
+# Firestore
+firestore_call_duration = REGISTRY.register(Histogram(
+    "firestore_call_duration_seconds", "Latency of Firestore calls by operation.", ("operation",)
+))
+firestore_errors = REGISTRY.register(Counter(
+    "firestore_errors_total", "Firestore calls that raised an exception.", ("operation",)
+))
+
+_HIT = "hit"
+_MISS = "miss"
+
+
+def record_cache(cache: str, hit: bool):
+    """
+    Count one lookup against the named cache.
+    """
+    cache_requests.inc((cache, _HIT if hit else _MISS))
+
+
+@contextmanager
+def firestore_call(operation: str):
+    """
+    Time a Firestore call (or a streamed read, including iteration) and count failures.
+    """
+    labels = (operation,)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        firestore_errors.inc(labels)
+        raise
+    finally:
+        firestore_call_duration.observe(time.perf_counter() - start, labels)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency and 5xx counts per route template.
+
+    Starlette stores the matched endpoint in the (shared) scope while routing, so the
+    template is resolved after the response from a precomputed endpoint -> path map.
+    """
+
+    def __init__(self, app, routes_provider: Callable[[], list]):
+        self.app = app
+        self._routes_provider = routes_provider
+        self._templates: Optional[Dict[Callable, str]] = None
+
+    def _route_template(self, scope) -> str:
+        if self._templates is None:
+            self._templates = {
+                route.endpoint: route.path
+                for route in self._routes_provider()
+                if getattr(route, "endpoint", None) is not None
+            }
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        return self._templates.get(endpoint, UNMATCHED_ROUTE)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            method = scope["method"]
+            route = self._route_template(scope)
+            http_request_duration.observe(elapsed, (method, route))
+            if status_holder[0] >= 500:
+                http_request_errors.inc((method, route, str(status_holder[0])))
@@ -0,0 +1,211 @@
+"""
+Opt-in profiling of single requests.
+
+With PROFILING_ENABLED set, a request carrying the `X-Profile-Token` header (matching
+PROFILING_TOKEN) runs its endpoint under pyinstrument's sampling profiler. Every SQL
+statement it executes on the primary or read engine is recorded with its duration. Bound
+parameters are redacted to their types (numbers are kept), so reports written to disk don't
+hold password hashes, tokens or other user input. The report is saved to
+PROFILING_OUTPUT_DIR as `<name>.html` (flame graph) and `<name>.json` (timings and SQL), and
+the name is returned in the `X-Profile-Report` response header.
+
+Nothing is installed unless profiling is enabled, and other requests only pay one context
+variable lookup per SQL statement.
+"""
+
+import contextvars
+import functools
+import hmac
+import inspect
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+import anyio
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+TOKEN_HEADER = "x-profile-token"
+REPORT_HEADER = "X-Profile-Report"
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.duration = None
+        self.statements: List[dict] = []
+        self.html: Optional[str] = None
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", path).strip("-") or "root"
+        self.name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{method.lower()}-{slug}"
+
+    def to_dict(self) -> dict:
+        sql_seconds = sum(statement["seconds"] for statement in self.statements)
+        return {
+            "method": self.method,
+            "path": self.path,
+            "duration_seconds": self.duration,
+            "sql_seconds": sql_seconds,
+            "sql_count": len(self.statements),
+            "statements": self.statements,
+        }
+
+
+_current: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar("request_profile", default=None)
+
+
+def _profiler(async_mode: str):
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        logger.warning("pyinstrument is not installed; recording SQL timings only")
+        return None
+    return Profiler(interval=0.001, async_mode=async_mode)
+
+
+def _wrap_endpoint(call):
+    """
+    Wrap an endpoint so it runs under the profiler when the request asked for it. Sync
+    endpoints stay sync, so the profiler samples the worker thread that runs them.
+    """
+    if inspect.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def async_endpoint(*args, **kwargs):
+            profile = _current.get()
+            profiler = _profiler("enabled") if profile is not None else None
+            if profiler is None:
+                return await call(*args, **kwargs)
+            profiler.start()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                profiler.stop()
+                profile.html = profiler.output_html()
+        return async_endpoint
+
+    @functools.wraps(call)
+    def endpoint(*args, **kwargs):
+        profile = _current.get()
+        profiler = _profiler("disabled") if profile is not None else None
+        if profiler is None:
+            return call(*args, **kwargs)
+        profiler.start()
+        try:
+            return call(*args, **kwargs)
+        finally:
+            profiler.stop()
+            profile.html = profiler.output_html()
+    return endpoint
+
+
+def _redact(value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__} len={len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def _describe_parameters(parameters, executemany: bool):
+    if executemany:
+        rows = list(parameters)
+        return {"rows": len(rows), "first": _describe_parameters(rows[0], False) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: _redact(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_redact(value) for value in parameters]
+    return _redact(parameters)
+
+
+def _record_sql(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        profile = _current.get()
+        if profile is None:
+            return
+        starts = conn.info.get("profile_query_start")
+        if not starts:
+            return
+        profile.statements.append({
+            "sql": statement,
+            "parameters": _describe_parameters(parameters, executemany),
+            "seconds": time.perf_counter() - starts.pop(),
+        })
+
+
+def _save(profile: RequestProfile, output_dir: str) -> str:
+    os.makedirs(output_dir, exist_ok=True)
+    name = profile.name
+    if profile.html is not None:
+        with open(os.path.join(output_dir, f"{name}.html"), "w") as html_file:
+            html_file.write(profile.html)
+    with open(os.path.join(output_dir, f"{name}.json"), "w") as json_file:
+        json.dump(profile.to_dict(), json_file, indent=2)
+    return name
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware that marks requests with a valid profile token and saves their report.
+    """
+
+    def __init__(self, app, token: str, output_dir: str):
+        self.app = app
+        self.token = token.encode()
+        self.output_dir = output_dir
+
+    def _requested(self, scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == TOKEN_HEADER.encode():
+                return bool(self.token) and hmac.compare_digest(value, self.token)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"])
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (REPORT_HEADER.encode(), profile.name.encode())
+                ]
+            await send(message)
+
+        token = _current.set(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            profile.duration = time.perf_counter() - profile.started
+            await anyio.to_thread.run_sync(_save, profile, self.output_dir)
+
+
+def install(app, engines: Iterable, token: str, output_dir: str):
+    """
+    Enable per-request profiling for every API route of `app` and SQL capture on each of
+    `engines`.
+    """
+    if not token:
+        logger.warning("PROFILING_ENABLED is set but PROFILING_TOKEN is empty; profiling stays off")
+        return
+    for route in app.routes:
+        if isinstance(route, APIRoute):
+            route.dependant.call = _wrap_endpoint(route.dependant.call)
+    for engine in set(engines):
+        _record_sql(engine)
+    app.add_middleware(ProfilingMiddleware, token=token, output_dir=output_dir)
@@ -0,0 +1,35 @@
+"""
+Minimal periodic background jobs for in-process maintenance (index refreshes, compaction).
+"""
+
+import logging
+import threading
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+_stop_events: List[threading.Event] = []
+
+
+def run_periodically(name: str, interval_seconds: float, fn: Callable[[], None]) -> threading.Event:
+    """
+    Call `fn` every `interval_seconds` on a daemon thread until `stop_all()` is called.
+    The first call happens after one interval. Exceptions are logged and the schedule continues.
+    """
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval_seconds):
+            try:
+                fn()
+            except Exception:
+                logger.exception("Scheduled job %s failed", name)
+
+    threading.Thread(target=loop, name=f"scheduled-{name}", daemon=True).start()
+    _stop_events.append(stop)
+    return stop
+
+
+def stop_all():
+    while _stop_events:
+        _stop_events.pop().set()
@@ -2,9 +2,11 @@
 Contains helper functions for hashing passwords and creating/verifying JWT tokens.
 """
 
+import hmac
+import uuid
 from typing import Optional
 from datetime import datetime, timedelta
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from passlib.context import CryptContext
@@ -14,6 +16,7 @@ from app.core.config import settings
 # Set up password hashing context using bcrypt
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 15
@@ -30,9 +33,25 @@ def create_access_token(subject: str, expires_delta: timedelta = None):
     to_encode = {"exp": expire, "sub": subject, "scope": "access_token"}
     return jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=ALGORITHM)
 
-def create_refresh_token(subject: str, expires_delta: Optional[timedelta] = None):
+def create_refresh_token(subject: str, expires_delta: Optional[timedelta] = None, family: Optional[str] = None):
+    """
+    Refresh token with its own id (jti) in token family `family`; a new family if None (at login).
+    """
     expire = datetime.utcnow() + (expires_delta or timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
-    to_encode = {"exp": expire, "sub": subject, "scope": "refresh_token"}
+    to_encode = {
+        "exp": expire,
+        "sub": subject,
+        "scope": "refresh_token",
+        "jti": uuid.uuid4().hex,
+        "fam": family or uuid.uuid4().hex,
+    }
+    return jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=ALGORITHM)
+
+def create_video_token(subject: str, exercise_id: int, expires_delta: timedelta):
+    """
+    Token that only lets its holder stream the video of `exercise_id`, for use in a URL.
+    """
+    to_encode = {"exp": datetime.utcnow() + expires_delta, "sub": subject, "scope": "video", "exercise_id": exercise_id}
     return jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=ALGORITHM)
 
 def decode_jwt(token: str):
@@ -46,3 +65,15 @@ def get_current_user_id(token: str = Depends(oauth2_scheme)) -> int:
         return int(payload.get("sub"))
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
+
+def get_optional_user_id(token: Optional[str] = Depends(optional_oauth2_scheme)) -> Optional[int]:
+    # For routes that also serve callers authenticated another way (e.g. X-Admin-Token)
+    if token is None:
+        return None
+    return get_current_user_id(token)
+
+def require_admin(x_admin_token: str = Header("")):
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not hmac.compare_digest(x_admin_token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
@@ -0,0 +1,134 @@
+"""
+"Users who saved this also saved" recommendations.
+
+A job builds a sparse user x exercise matrix from the favorites and saved tables, computes
+item-item cosine similarity and keeps the top K neighbours of every exercise in dense NumPy
+arrays. Lookups are a dict access plus an array slice.
+"""
+
+import threading
+from typing import Dict, List, NamedTuple, Set
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import Exercise, Favorite, Saved
+
+
+class _IndexData(NamedTuple):
+    rows: Dict[int, int]         # exercise id -> row in the arrays below
+    neighbors: np.ndarray        # (n, k) int64 exercise ids, -1 padded
+    scores: np.ndarray           # (n, k) float32 cosine similarities
+
+
+_EMPTY = _IndexData({}, np.empty((0, 0), dtype=np.int64), np.empty((0, 0), dtype=np.float32))
+
+
+def _top_k(row: np.ndarray, cols: np.ndarray, k: int):
+    if len(row) > k:
+        keep = np.argpartition(-row, k - 1)[:k]
+        row, cols = row[keep], cols[keep]
+    order = np.argsort(-row, kind="stable")
+    return cols[order], row[order]
+
+
+def compute_neighbors(pairs: np.ndarray, public_ids: np.ndarray, k: int) -> _IndexData:
+    """
+    Build the top-k index from an (m, 2) array of (user_id, exercise_id) interactions.
+    Only public exercises are kept as neighbours.
+    """
+    if len(pairs) == 0:
+        return _EMPTY
+
+    user_ids, user_rows = np.unique(pairs[:, 0], return_inverse=True)
+    exercise_ids, exercise_cols = np.unique(pairs[:, 1], return_inverse=True)
+
+    # Binary interaction matrix: favorited or saved counts once per user
+    matrix = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (user_rows, exercise_cols)),
+        shape=(len(user_ids), len(exercise_ids)),
+    )
+    matrix.data[:] = 1.0
+
+    # Item-item co-occurrence, then cosine normalisation by each item's interaction count
+    cooccurrence = (matrix.T @ matrix).tocsr()
+    norms = np.sqrt(cooccurrence.diagonal())
+    cooccurrence.setdiag(0)
+    cooccurrence.eliminate_zeros()
+
+    is_public = np.isin(exercise_ids, public_ids)
+    neighbors = np.full((len(exercise_ids), k), -1, dtype=np.int64)
+    scores = np.zeros((len(exercise_ids), k), dtype=np.float32)
+
+    for row in range(len(exercise_ids)):
+        start, end = cooccurrence.indptr[row], cooccurrence.indptr[row + 1]
+        cols = cooccurrence.indices[start:end]
+        mask = is_public[cols]
+        cols = cols[mask]
+        if len(cols) == 0:
+            continue
+        similarity = cooccurrence.data[start:end][mask] / (norms[row] * norms[cols])
+        top_cols, top_scores = _top_k(similarity, cols, k)
+        neighbors[row, :len(top_cols)] = exercise_ids[top_cols]
+        scores[row, :len(top_cols)] = top_scores
+
+    rows = {int(exercise_id): row for row, exercise_id in enumerate(exercise_ids)}
+    return _IndexData(rows, neighbors, scores)
+
+
+class SimilarityIndex:
+    """
+    Holds the latest computed index. Rebuilds swap in a new immutable snapshot, so readers never lock.
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self._data = _EMPTY
+        self._excluded: Set[int] = set()
+        self._exclude_lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+
+    def rebuild(self, db: Session):
+        # Exclusions recorded before the query are in the tables it reads; ones recorded while
+        # it runs may not be, so they are kept past the swap
+        with self._exclude_lock:
+            excluded_before = self._excluded
+        interactions = db.query(Favorite.user_id, Favorite.exercise_id).union(
+            db.query(Saved.user_id, Saved.exercise_id)
+        )
+        pairs = np.array(interactions.all(), dtype=np.int64).reshape(-1, 2)
+        public_ids = np.array(
+            [exercise_id for (exercise_id,) in db.query(Exercise.id).filter(Exercise.is_public == True)],
+            dtype=np.int64,
+        )
+        with self._rebuild_lock:
+            data = compute_neighbors(pairs, public_ids, self.k)
+            with self._exclude_lock:
+                self._data = data
+                self._excluded = self._excluded - excluded_before
+
+    def exclude(self, exercise_id: int):
+        """
+        Hide an exercise that was deleted or made private until the next rebuild that started
+        after the change was committed.
+        """
+        with self._exclude_lock:
+            self._excluded = self._excluded | {exercise_id}
+
+    def similar(self, exercise_id: int, limit: int) -> List[dict]:
+        data, excluded = self._data, self._excluded
+        row = data.rows.get(exercise_id)
+        if row is None:
+            return []
+        results = []
+        for neighbor_id, score in zip(data.neighbors[row].tolist(), data.scores[row].tolist()):
+            if neighbor_id < 0 or len(results) >= limit:
+                break
+            if neighbor_id not in excluded:
+                results.append({"id": neighbor_id, "score": round(score, 4)})
+        return results
+
+
+index = SimilarityIndex(settings.SIMILARITY_TOP_K)
@@ -0,0 +1,57 @@
+"""
+Single-flight request coalescing: concurrent callers asking for the same key share one
+in-flight computation instead of each running it.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from app.core import metrics
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Route handlers run in Starlette's threadpool, so waiting is done with a threading.Event.
+    Results are not cached: once the leader finishes, the next caller starts a fresh flight.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        # A follower joining an in-flight call counts as a hit for this "cache"
+        metrics.record_cache(self.name, not leader)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
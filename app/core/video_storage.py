@@ -0,0 +1,97 @@
+"""
+Local-disk storage for exercise videos, an alternative to Firebase Storage for on-prem and
+offline deployments.
+
+Each exercise has at most one video, stored as `<VIDEO_STORAGE_DIR>/<exercise_id><ext>`.
+Uploads are streamed to a temporary file in the same directory and moved into place
+atomically, so readers never see a partial video.
+"""
+
+import os
+import uuid
+from typing import AsyncIterator, Optional, Tuple
+
+import anyio
+
+from app.core.config import settings
+
+# Accepted upload types and the extension they are stored under
+CONTENT_TYPES = {
+    "video/mp4": ".mp4",
+    "video/webm": ".webm",
+    "video/ogg": ".ogv",
+    "video/quicktime": ".mov",
+}
+MEDIA_TYPES = {extension: content_type for content_type, extension in CONTENT_TYPES.items()}
+
+# Bytes buffered before each write to disk
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class LocalVideoStorage:
+    def __init__(self, root: str):
+        self.root = root
+
+    def find(self, exercise_id: int) -> Optional[Tuple[str, str]]:
+        """
+        (path, media type) of the exercise's video, or None.
+        """
+        for extension, media_type in MEDIA_TYPES.items():
+            path = os.path.join(self.root, f"{exercise_id}{extension}")
+            if os.path.isfile(path):
+                return path, media_type
+        return None
+
+    def filename(self, path: str) -> str:
+        return os.path.relpath(path, self.root)
+
+    async def save(self, exercise_id: int, content_type: str, chunks: AsyncIterator[bytes], max_bytes: int) -> int:
+        """
+        Stream `chunks` into the exercise's video, replacing any previous one. Returns the
+        size in bytes; raises UploadTooLarge (keeping the old video) past `max_bytes`.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, f"{exercise_id}{CONTENT_TYPES[content_type]}")
+        partial = os.path.join(self.root, f".{exercise_id}.{uuid.uuid4().hex}.part")
+        file = await anyio.to_thread.run_sync(open, partial, "wb")
+        size = 0
+        try:
+            buffer = bytearray()
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge()
+                buffer += chunk
+                if len(buffer) >= WRITE_BUFFER_SIZE:
+                    await anyio.to_thread.run_sync(file.write, bytes(buffer))
+                    buffer.clear()
+            await anyio.to_thread.run_sync(file.write, bytes(buffer))
+            await anyio.to_thread.run_sync(file.close)
+            await anyio.to_thread.run_sync(self._replace, exercise_id, partial, path)
+        except BaseException:
+            file.close()
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        return size
+
+    def _replace(self, exercise_id: int, partial: str, path: str):
+        # A new upload may change the container, so drop videos stored under other extensions
+        self.delete(exercise_id, keep=path)
+        os.replace(partial, path)
+
+    def delete(self, exercise_id: int, keep: Optional[str] = None) -> bool:
+        removed = False
+        for extension in MEDIA_TYPES:
+            path = os.path.join(self.root, f"{exercise_id}{extension}")
+            if path != keep and os.path.isfile(path):
+                os.remove(path)
+                removed = True
+        return removed
+
+
+store = LocalVideoStorage(settings.VIDEO_STORAGE_DIR)
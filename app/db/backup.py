@@ -0,0 +1,238 @@
+"""
+Online backup of the SQLite database with the SQLite backup API.
+
+Pages are copied `pages` at a time with a pause between steps. WAL keeps the writers running
+while the copy is made, and the pauses leave I/O for foreground requests. If other connections
+keep changing the database, SQLite restarts the copy. After `max_restarts` restarts the
+remaining pages are copied in a single step, which reads one consistent snapshot. The copy is
+switched out of WAL mode, optionally checked with `PRAGMA integrity_check` and gzipped, and
+only moved to its final name once complete.
+
+Run manually with:
+    python -m app.db.backup [destination_dir] [--pages N] [--sleep SECONDS] [--gzip] [--no-verify]
+or as a background job in the API process with POST /admin/backup.
+"""
+
+import argparse
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.db import jobs
+from app.db.database import engine
+
+logger = logging.getLogger(__name__)
+
+backup_progress = metrics.REGISTRY.register(metrics.Gauge(
+    "sqlite_backup_progress_ratio", "Fraction of pages copied by the running backup (1 when idle)."
+))
+backup_pages = metrics.REGISTRY.register(metrics.Gauge(
+    "sqlite_backup_pages", "Pages of the running or last backup.", ("state",)
+))
+backup_duration = metrics.REGISTRY.register(metrics.Histogram(
+    "sqlite_backup_duration_seconds", "Duration of completed backups.",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800),
+))
+backup_runs = metrics.REGISTRY.register(metrics.Counter(
+    "sqlite_backup_runs_total", "Backups by result.", ("result",)
+))
+backup_last_success = metrics.REGISTRY.register(metrics.Gauge(
+    "sqlite_backup_last_success_timestamp_seconds", "Unix time of the last successful backup."
+))
+backup_progress.set(1.0)
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class BackupFailed(Exception):
+    pass
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+class _Progress:
+    def __init__(self, sleep: float, max_restarts: Optional[int], on_progress: Optional[Callable[[int, int], None]] = None):
+        self.sleep = sleep
+        self.on_progress = on_progress
+        self.max_restarts = max_restarts
+        self.restarts = 0
+        self.copied = 0
+        self.total = 0
+
+    def __call__(self, status: int, remaining: int, total: int):
+        copied = total - remaining
+        if copied < self.copied:
+            # Another connection changed the source; SQLite starts over
+            self.restarts += 1
+            if self.max_restarts is not None and self.restarts > self.max_restarts:
+                raise _TooManyRestarts()
+        self.copied, self.total = copied, total
+        backup_pages.set(copied, ("copied",))
+        backup_pages.set(total, ("total",))
+        backup_progress.set(copied / total if total else 1.0)
+        if self.on_progress is not None:
+            self.on_progress(copied, total)
+        if remaining and self.sleep > 0:
+            time.sleep(self.sleep)
+
+
+def default_destination(directory: str, compress: bool) -> str:
+    name = f"prehab-{datetime.utcnow():%Y%m%dT%H%M%S}.db"
+    return os.path.join(directory, name + (".gz" if compress else ""))
+
+
+def _copy(source_path: str, target_path: str, pages: int, sleep: float, max_restarts: int, on_progress=None) -> _Progress:
+    source = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True)
+    try:
+        source.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        target = sqlite3.connect(target_path)
+        try:
+            progress = _Progress(sleep, max_restarts, on_progress)
+            try:
+                source.backup(target, pages=pages, progress=progress)
+            except _TooManyRestarts:
+                logger.warning("Backup restarted %d times under writes; copying the rest in one step", progress.restarts)
+                restarts = progress.restarts
+                progress = _Progress(0, None, on_progress)
+                progress.restarts = restarts
+                source.backup(target, pages=-1, progress=progress)
+            # The copied header says WAL; make the file self-contained
+            target.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            target.close()
+    finally:
+        source.close()
+    return progress
+
+
+def _integrity_check(path: str):
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        problems = [row[0] for row in connection.execute("PRAGMA integrity_check")]
+    finally:
+        connection.close()
+    if problems != ["ok"]:
+        raise BackupFailed("integrity_check failed: " + "; ".join(problems[:10]))
+
+
+def _gzip(path: str, target_path: str):
+    with open(path, "rb") as source, gzip.open(target_path, "wb", compresslevel=6) as target:
+        shutil.copyfileobj(source, target, COPY_CHUNK_SIZE)
+
+
+def backup(
+    destination: str,
+    pages: int = None,
+    sleep: float = None,
+    compress: bool = False,
+    verify: bool = True,
+    max_restarts: int = 3,
+    source_path: str = None,
+    on_progress: Callable[[int, int], None] = None,
+) -> dict:
+    """
+    Back up the database to `destination` (gzipped if `compress`). Returns a report with the
+    page count, sizes, duration and restarts; raises BackupFailed if verification fails.
+    `on_progress(copied_pages, total_pages)` is called after every step; an exception it
+    raises aborts the backup.
+    """
+    pages = pages or settings.BACKUP_PAGES_PER_STEP
+    sleep = settings.BACKUP_STEP_SLEEP_SECONDS if sleep is None else sleep
+    source_path = source_path or engine.url.database
+    directory = os.path.dirname(os.path.abspath(destination))
+    os.makedirs(directory, exist_ok=True)
+    partial = os.path.join(directory, f".{os.path.basename(destination)}.{os.getpid()}.{threading.get_ident()}.partial")
+
+    started = time.perf_counter()
+    backup_progress.set(0.0)
+    try:
+        progress = _copy(source_path, partial, pages, sleep, max_restarts, on_progress)
+        if verify:
+            _integrity_check(partial)
+        size = os.path.getsize(partial)
+        if compress:
+            _gzip(partial, partial + ".gz")
+            os.remove(partial)
+            partial += ".gz"
+        os.replace(partial, destination)
+    except BaseException:
+        backup_runs.inc(("failed",))
+        for leftover in (partial, partial + ".gz"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+    finally:
+        backup_progress.set(1.0)
+
+    duration = time.perf_counter() - started
+    backup_runs.inc(("succeeded",))
+    backup_duration.observe(duration)
+    backup_last_success.set(time.time())
+    report = {
+        "destination": destination,
+        "pages": progress.total,
+        "database_bytes": size,
+        "file_bytes": os.path.getsize(destination),
+        "restarts": progress.restarts,
+        "verified": verify,
+        "duration_seconds": round(duration, 3),
+    }
+    logger.info("Backup complete: %s", report)
+    return report
+
+
+@jobs.handler("backup")
+def backup_job(context: jobs.JobContext) -> dict:
+    compress = context.params.get("compress", settings.BACKUP_COMPRESS)
+
+    def on_progress(copied: int, total: int):
+        # Progress is in pages; a restart under writes moves it back
+        context.total = total
+        context.advance(copied - context.processed)
+
+    return backup(
+        default_destination(context.params.get("directory") or settings.BACKUP_DIR, compress),
+        compress=compress,
+        verify=context.params.get("verify", True),
+        on_progress=on_progress,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Back up the SQLite database without blocking writers.")
+    parser.add_argument("directory", nargs="?", default=settings.BACKUP_DIR)
+    parser.add_argument("--pages", type=int, default=None, help="pages copied per step")
+    parser.add_argument("--sleep", type=float, default=None, help="seconds to pause between steps")
+    parser.add_argument("--gzip", action="store_true", default=settings.BACKUP_COMPRESS)
+    parser.add_argument("--no-verify", dest="verify", action="store_false")
+    args = parser.parse_args(argv)
+
+    try:
+        report = backup(
+            default_destination(args.directory, args.gzip),
+            pages=args.pages,
+            sleep=args.sleep,
+            compress=args.gzip,
+            verify=args.verify,
+        )
+    except BackupFailed as exc:
+        print(f"Backup failed: {exc}")
+        return 1
+    for key, value in report.items():
+        print(f"{key:<17} {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(main())
@@ -0,0 +1,45 @@
+"""
+Helpers for appending to the change log (see `Change` in app/db/models.py).
+
+Entries are added to the caller's session, so they commit atomically with the write they
+describe. With SQLite writers serialized by app/db/write_lock.py, versions become visible in
+commit order and a client never skips a change by syncing past it.
+"""
+
+from sqlalchemy.orm import Session
+
+from app.db.models import Change, Exercise
+
+
+def record(db: Session, entity: str, exercise: Exercise, user_id: int = None,
+           deleted: bool = False, was_public: bool = False):
+    """
+    Log a change to `exercise` (entity="exercise") or a user's interaction with it.
+    Pass `was_public=True` when an exercise just turned private, so users who could see it get the update.
+    """
+    db.add(Change(
+        entity=entity,
+        exercise_id=exercise.id,
+        user_id=user_id,
+        owner_id=exercise.owner_id,
+        public=bool(exercise.is_public or was_public),
+        deleted=deleted,
+    ))
+
+
+def record_interactions(db: Session, entries):
+    """
+    Bulk variant for batched writers: `entries` are (entity, exercise, user_id, deleted) tuples,
+    where `exercise` is anything with id, owner_id and is_public attributes (a model or a row).
+    """
+    db.bulk_insert_mappings(Change, [
+        {
+            "entity": entity,
+            "exercise_id": exercise.id,
+            "user_id": user_id,
+            "owner_id": exercise.owner_id,
+            "public": bool(exercise.is_public),
+            "deleted": deleted,
+        }
+        for entity, exercise, user_id, deleted in entries
+    ])
@@ -0,0 +1,309 @@
+"""
+Incremental import of the CSV files written by ExportData.java (java_backend_migration).
+
+A SHA-1 of every imported row is kept in `imported_rows`. A re-import streams each CSV,
+compares the rows against those hashes and applies only inserted, changed or deleted rows,
+`batch_size` at a time. Rows created through the API (no stored hash) are never deleted.
+Each run ends with a verification report comparing row counts and an order-independent
+checksum of the CSV with the same rows read back from SQLite.
+
+Usage, from the project root:
+    python -m app.db.csv_import [csv_dir] [--batch-size N]
+or as a background job with POST /admin/csv-import.
+
+Running servers pick up imported rows in their in-memory indexes on the next restart or
+scheduled refresh; sync clients see them through the change log. Users whose favorites or
+saves changed are invalidated in the membership cache of every worker after each batch.
+"""
+
+import argparse
+import csv
+import hashlib
+import logging
+import os
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import Boolean, Integer
+from sqlalchemy.orm import Session
+
+from app.core import membership
+from app.core.config import settings
+from app.db import changes, jobs
+from app.db.database import SessionLocal
+from app.db.models import Exercise, Favorite, ImportedRow, Rating, Saved, User
+
+logger = logging.getLogger(__name__)
+
+# Import order follows the foreign keys; CSV names match ExportData.java
+TABLES = (
+    ("users", User),
+    ("exercises", Exercise),
+    ("favorites", Favorite),
+    ("saved", Saved),
+    ("ratings", Rating),
+)
+
+CHECKSUM_MODULUS = 2 ** 64
+
+# Tables behind the per-user membership cache
+MEMBERSHIP_MODELS = (Favorite, Saved)
+
+
+def _converter(column):
+    if isinstance(column.type, Boolean):
+        return lambda value: value.strip().upper() in ("TRUE", "T", "1")
+    if isinstance(column.type, Integer):
+        return int
+    return str
+
+
+def row_hash(values: Sequence) -> str:
+    return hashlib.sha1(repr(tuple(values)).encode("utf-8")).hexdigest()
+
+
+def _checksum_part(digest: str) -> int:
+    return int(digest[:16], 16)
+
+
+class _TableImport:
+    """
+    One table's import: buffers changed rows and applies them in batches.
+    """
+
+    def __init__(self, db: Session, name: str, model, batch_size: int, progress: Optional[Callable[[int], None]] = None):
+        self.db = db
+        self.progress = progress
+        self.name = name
+        self.model = model
+        self.batch_size = batch_size
+        self.columns: List[str] = []
+        self.stats = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+        # exercise id -> whether it was public before the import touched it
+        self.touched_exercises: Dict[int, bool] = {}
+
+    def run(self, path: str) -> dict:
+        db, model = self.db, self.model
+        stored = dict(
+            db.query(ImportedRow.row_id, ImportedRow.row_hash).filter(ImportedRow.table_name == self.name)
+        )
+        seen = set()
+        csv_checksum = 0
+        pending: List[Tuple[dict, str, bool]] = []
+        read = 0
+
+        with open(path, newline="") as csv_file:
+            reader = csv.reader(csv_file)
+            # H2 reports column names in upper case
+            header = [name.strip().lower() for name in next(reader)]
+            table_columns = model.__table__.columns
+            self.columns = [name for name in header if name in table_columns]
+            if "id" not in self.columns:
+                raise ValueError(f"{path} has no id column")
+            positions = [header.index(name) for name in self.columns]
+            converters = [_converter(table_columns[name]) for name in self.columns]
+
+            for record in reader:
+                if not record:
+                    continue
+                read += 1
+                if self.progress is not None and read % self.batch_size == 0:
+                    self.progress(self.batch_size)
+                # ExportData writes NULL as an empty field
+                values = [
+                    None if record[position] == "" else convert(record[position])
+                    for position, convert in zip(positions, converters)
+                ]
+                row = dict(zip(self.columns, values))
+                digest = row_hash(values)
+                seen.add(row["id"])
+                csv_checksum = (csv_checksum + _checksum_part(digest)) % CHECKSUM_MODULUS
+                if stored.get(row["id"]) == digest:
+                    self.stats["unchanged"] += 1
+                    continue
+                pending.append((row, digest, row["id"] in stored))
+                if len(pending) >= self.batch_size:
+                    self._apply(pending)
+                    pending = []
+        if pending:
+            self._apply(pending)
+        if self.progress is not None:
+            self.progress(read % self.batch_size)
+
+        removed = [row_id for row_id in stored if row_id not in seen]
+        for start in range(0, len(removed), self.batch_size):
+            self._delete(removed[start:start + self.batch_size])
+
+        return {"csv_rows": len(seen), "csv_checksum": csv_checksum}
+
+    def _users(self, row_ids: List[int]) -> Set[int]:
+        # Current owners of interaction rows about to be changed or deleted
+        if self.model not in MEMBERSHIP_MODELS:
+            return set()
+        return {user_id for (user_id,) in self.db.query(self.model.user_id).filter(self.model.id.in_(row_ids))}
+
+    def _apply(self, pending: List[Tuple[dict, str, bool]]):
+        db, model = self.db, self.model
+        ids = [row["id"] for row, _, _ in pending]
+        users = self._users(ids)
+        if model in MEMBERSHIP_MODELS:
+            users.update(row["user_id"] for row, _, _ in pending if row.get("user_id") is not None)
+        # Rows may already exist without a stored hash (first import into a populated database)
+        if model is Exercise:
+            existing = dict(db.query(Exercise.id, Exercise.is_public).filter(Exercise.id.in_(ids)))
+        else:
+            existing = dict.fromkeys(row_id for (row_id,) in db.query(model.id).filter(model.id.in_(ids)))
+        inserts = [row for row, _, _ in pending if row["id"] not in existing]
+        updates = [row for row, _, _ in pending if row["id"] in existing]
+
+        db.bulk_insert_mappings(model, inserts)
+        db.bulk_update_mappings(model, updates)
+        db.bulk_insert_mappings(ImportedRow, [
+            {"table_name": self.name, "row_id": row["id"], "row_hash": digest}
+            for row, digest, tracked in pending if not tracked
+        ])
+        db.bulk_update_mappings(ImportedRow, [
+            {"table_name": self.name, "row_id": row["id"], "row_hash": digest}
+            for row, digest, tracked in pending if tracked
+        ])
+        db.commit()
+        for user_id in users:
+            membership.cache.invalidate(user_id)
+
+        self.stats["inserted"] += len(inserts)
+        self.stats["updated"] += len(updates)
+        for row in inserts + updates:
+            if model is Exercise:
+                self.touched_exercises.setdefault(row["id"], bool(existing.get(row["id"])))
+            elif "exercise_id" in row:
+                self.touched_exercises.setdefault(row["exercise_id"], False)
+
+    def _delete(self, row_ids: List[int]):
+        db, model = self.db, self.model
+        if model is Exercise:
+            for exercise in db.query(Exercise.id, Exercise.owner_id, Exercise.is_public).filter(Exercise.id.in_(row_ids)):
+                changes.record(db, "exercise", exercise, deleted=True)
+        elif hasattr(model, "exercise_id"):
+            for (exercise_id,) in db.query(model.exercise_id).filter(model.id.in_(row_ids)):
+                self.touched_exercises.setdefault(exercise_id, False)
+        users = self._users(row_ids)
+        deleted = db.query(model).filter(model.id.in_(row_ids)).delete(synchronize_session=False)
+        db.query(ImportedRow).filter(
+            ImportedRow.table_name == self.name, ImportedRow.row_id.in_(row_ids)
+        ).delete(synchronize_session=False)
+        db.commit()
+        for user_id in users:
+            membership.cache.invalidate(user_id)
+        self.stats["deleted"] += deleted
+
+    def verify(self) -> dict:
+        """
+        Count and checksum the imported rows as they are now stored in SQLite.
+        """
+        model = self.model
+        selected = [model.__table__.columns[name] for name in self.columns]
+        rows = (
+            self.db.query(*selected)
+            .join(ImportedRow, (ImportedRow.row_id == model.id) & (ImportedRow.table_name == self.name))
+            .yield_per(self.batch_size)
+        )
+        count = checksum = 0
+        for row in rows:
+            count += 1
+            checksum = (checksum + _checksum_part(row_hash(tuple(row)))) % CHECKSUM_MODULUS
+        return {"db_rows": count, "db_checksum": checksum}
+
+
+def _record_exercise_changes(db: Session, touched: Dict[int, bool]):
+    """
+    Log imported exercise and interaction changes for /sync clients.
+    """
+    ids = list(touched)
+    for start in range(0, len(ids), 500):
+        batch = ids[start:start + 500]
+        for exercise in db.query(Exercise.id, Exercise.owner_id, Exercise.is_public).filter(Exercise.id.in_(batch)):
+            changes.record(db, "exercise", exercise, was_public=touched[exercise.id])
+        db.commit()
+
+
+def import_csv_dir(
+    db: Session, csv_dir: str, batch_size: int = None, progress: Optional[Callable[[int], None]] = None
+) -> Dict[str, dict]:
+    """
+    Incrementally import every exported table found in `csv_dir` and return the per-table
+    report: inserted/updated/deleted/unchanged counts, CSV and SQLite row counts and
+    checksums, and whether they match. `progress` is called with the number of CSV rows read
+    since its last call.
+    """
+    batch_size = batch_size or settings.CSV_IMPORT_BATCH_SIZE
+    report = {}
+    touched: Dict[int, bool] = {}
+    for name, model in TABLES:
+        path = os.path.join(csv_dir, f"{name}.csv")
+        if not os.path.exists(path):
+            logger.warning("CSV file %s not found, skipping %s", path, name)
+            continue
+        table = _TableImport(db, name, model, batch_size, progress)
+        result = table.run(path)
+        result.update(table.stats)
+        result.update(table.verify())
+        result["ok"] = result["csv_rows"] == result["db_rows"] and result["csv_checksum"] == result["db_checksum"]
+        for exercise_id, was_public in table.touched_exercises.items():
+            touched[exercise_id] = touched.get(exercise_id, False) or was_public
+        report[name] = result
+    _record_exercise_changes(db, touched)
+    return report
+
+
+def count_rows(csv_dir: str) -> int:
+    """
+    Data rows in the exported CSVs found in `csv_dir` (a job's progress total).
+    """
+    total = 0
+    for name, _ in TABLES:
+        path = os.path.join(csv_dir, f"{name}.csv")
+        if os.path.exists(path):
+            with open(path, newline="") as csv_file:
+                total += max(sum(1 for record in csv.reader(csv_file) if record) - 1, 0)
+    return total
+
+
+@jobs.handler("csv_import")
+def import_job(context: jobs.JobContext) -> dict:
+    csv_dir = context.params["csv_dir"]
+    if not os.path.isdir(csv_dir):
+        raise ValueError(f"CSV directory {csv_dir} not found")
+    context.set_total(count_rows(csv_dir))
+    db = SessionLocal()
+    try:
+        report = import_csv_dir(db, csv_dir, context.params.get("batch_size"), progress=context.advance)
+    finally:
+        db.close()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally import the H2 CSV exports into SQLite.")
+    parser.add_argument("csv_dir", nargs="?", default="java_backend_migration")
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        report = import_csv_dir(db, args.csv_dir, args.batch_size)
+    finally:
+        db.close()
+
+    print(f"{'table':<10} {'csv':>7} {'sqlite':>7} {'ins':>6} {'upd':>6} {'del':>6} {'same':>7}  checksum")
+    for name, result in report.items():
+        status = "OK" if result["ok"] else f"MISMATCH (csv {result['csv_checksum']:016x})"
+        print(
+            f"{name:<10} {result['csv_rows']:>7} {result['db_rows']:>7} {result['inserted']:>6} "
+            f"{result['updated']:>6} {result['deleted']:>6} {result['unchanged']:>7}  "
+            f"{result['db_checksum']:016x} {status}"
+        )
+    return 0 if all(result["ok"] for result in report.values()) else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(main())
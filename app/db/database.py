@@ -2,8 +2,16 @@
 Module that sets up SQLAlchemy's engine, session, and Base (the declarative base for models). Using SQLite for the database.
 """
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import time
+
+from fastapi import Depends
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.security import get_current_user_id
+from app.db import shared_slots, write_lock
 
 # Define the database URL; here, SQLite is used with a local file "test.db". This'll get placed in the root directory of your project. 
 DATABASE_URL = "sqlite:///./test.db"
@@ -15,19 +23,135 @@ engine = create_engine(
     echo=True  # Echo SQL statements to help with debugging
 )
 
+# SQLite: WAL lets readers in every worker run alongside the single writer, and the busy
+# timeout makes a connection wait for a lock instead of failing immediately. auto_vacuum only
+# takes effect on a new database file; it lets maintenance reclaim pages incrementally.
+@event.listens_for(engine, "connect")
+def _configure_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+# Read-only engine for GET routes: a replica when READ_REPLICA_URL is set, otherwise a
+# read-only connection pool on the same SQLite file (WAL lets it read while the primary writes)
+if settings.READ_REPLICA_URL:
+    read_engine = create_engine(settings.READ_REPLICA_URL)
+else:
+    read_engine = create_engine(
+        f"sqlite:///file:{engine.url.database}?mode=ro&uri=true",
+        connect_args={"check_same_thread": False},
+    )
+
+    @event.listens_for(read_engine, "connect")
+    def _configure_sqlite_reader(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+
+# Track connections handed out by the pools for the /metrics endpoint
+for _engine in (engine, read_engine):
+    @event.listens_for(_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.db_pool_checkouts.inc()
+        metrics.db_pool_in_use.inc()
+
+    @event.listens_for(_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        metrics.db_pool_in_use.dec()
+
 # Create a configured "SessionLocal" class; this will be our database session factory.
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+class RoutingSession(Session):
+    """
+    Session that reads from the read engine until it writes; from its first flush on it
+    uses the primary, so it reads its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.info.get("use_primary") or self._flushing:
+            return engine
+        return read_engine
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _pin_session_to_primary(session, flush_context, instances):
+    session.info["use_primary"] = True
+
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, class_=RoutingSession)
+
+
+class PrimaryPins:
+    """
+    Users who wrote in the last `ttl` seconds; their reads go to the primary so a lagging
+    replica can't hide their own changes (read-your-writes across requests). The pin deadlines
+    are shared by every worker process, so it holds whichever worker serves the next read.
+    """
+
+    def __init__(self, slots: shared_slots.SharedSlots, ttl: float):
+        self.slots = slots
+        self.ttl = ttl
+
+    def pin(self, user_id: int):
+        self.slots.raise_to(user_id, int((time.time() + self.ttl) * 1000))
+
+    def is_pinned(self, user_id: int) -> bool:
+        return self.slots.get(user_id) > time.time() * 1000
+
+
+# Per-user values shared across worker processes (see app/db/shared_slots.py)
+USER_SLOTS = 1 << 16
+primary_pins = PrimaryPins(
+    shared_slots.SharedSlots(f"{engine.url.database}.pins.slots", USER_SLOTS), settings.READ_YOUR_WRITES_SECONDS
+)
+membership_epochs = shared_slots.SharedSlots(f"{engine.url.database}.membership.slots", USER_SLOTS)
+
+# Serialize writers across threads and worker processes (see app/db/write_lock.py)
+writer_lock = write_lock.WriteLock(
+    f"{engine.url.database}.writer.lock", settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+)
+write_lock.install(SessionLocal, writer_lock)
+write_lock.install(ReadSessionLocal, writer_lock)
+
 # Create a base class for our models using SQLAlchemy's declarative base.
 Base = declarative_base()
 
+def _session_scope(db: Session):
+    try:
+        # Check out the connection up front so the pool wait is measured per request
+        start = time.perf_counter()
+        db.connection()
+        metrics.db_pool_checkout_wait.observe(time.perf_counter() - start)
+        yield db
+    finally:
+        db.close()
+
 def get_db():
     """
     Dependency that creates a new database session for a request,
     then closes the session after the request is complete.
     """
-    db = SessionLocal()
+    yield from _session_scope(SessionLocal())
+
+def get_write_db(current_user_id: int = Depends(get_current_user_id)):
+    """
+    Primary session for routes that change data. Afterwards the user's reads stay on the
+    primary for READ_YOUR_WRITES_SECONDS.
+    """
     try:
-        yield db
+        yield from _session_scope(SessionLocal())
     finally:
-        db.close()
+        primary_pins.pin(current_user_id)
+
+def get_read_db(current_user_id: int = Depends(get_current_user_id)):
+    """
+    Session for read-only routes: uses the read engine unless the user wrote recently.
+    """
+    if primary_pins.is_pinned(current_user_id):
+        yield from _session_scope(SessionLocal())
+    else:
+        yield from _session_scope(ReadSessionLocal())
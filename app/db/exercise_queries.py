@@ -0,0 +1,146 @@
+"""
+Shared loading of exercise rows for the list/detail/favorites/collection endpoints.
+
+Rows are loaded as plain column tuples and the aggregates (counts, average rating) and the
+caller's favorited/saved flags are filled in for a whole page with one query each, and only
+for the fields the client asked for.
+"""
+
+from functools import lru_cache
+from typing import Collection, Dict, FrozenSet, List, Mapping, Optional, Sequence
+
+from sqlalchemy import bindparam, or_, select
+from sqlalchemy.orm import Session
+
+from app.core import membership
+from app.db import statements
+from app.db.models import Exercise, Favorite
+from app.schemas.exercise import EXERCISE_FIELDS
+
+COLUMNS = {
+    "id": Exercise.id,
+    "name": Exercise.name,
+    "description": Exercise.description,
+    "difficulty": Exercise.difficulty,
+    "is_public": Exercise.is_public,
+    "owner_id": Exercise.owner_id,
+    "video_url": Exercise.video_url,
+}
+AGGREGATE_FIELDS = frozenset({"favorite_count", "save_count", "average_rating"})
+MEMBERSHIP_FIELDS = frozenset({"user_has_favorited", "user_has_saved"})
+ALL_FIELDS = frozenset(EXERCISE_FIELDS)
+
+
+def columns(fields: FrozenSet[str], extra: Collection[str] = ()) -> list:
+    """
+    Exercise columns to SELECT for `fields` (the id is always loaded).
+    """
+    wanted = set(fields) | set(extra) | {"id"}
+    return [column for name, column in COLUMNS.items() if name in wanted]
+
+
+def aggregates(db: Session, exercise_ids: Sequence[int], fields: FrozenSet[str]) -> Dict[str, Dict[int, float]]:
+    """
+    Per-exercise counts and average rating for the requested aggregate fields, one GROUP BY each.
+    """
+    result = {}
+    if not exercise_ids:
+        return result
+    params = {"exercise_ids": list(exercise_ids)}
+    if "favorite_count" in fields:
+        result["favorite_count"] = dict(db.execute(statements.FAVORITE_COUNTS, params).all())
+    if "save_count" in fields:
+        result["save_count"] = dict(db.execute(statements.SAVE_COUNTS, params).all())
+    if "average_rating" in fields:
+        result["average_rating"] = {
+            exercise_id: round(avg or 0.0, 2)
+            for exercise_id, avg in db.execute(statements.AVERAGE_RATINGS, params)
+        }
+    return result
+
+
+# Cached statements for the column sets requested with ?fields= (see app/db/statements.py)
+
+@lru_cache(maxsize=256)
+def visible_page_statement(fields: FrozenSet[str]):
+    """
+    A page of exercises visible to :user_id, with :skip and :limit.
+    """
+    return (
+        select(*columns(fields))
+        .where(or_(Exercise.is_public == True, Exercise.owner_id == bindparam("user_id")))
+        .offset(bindparam("skip"))
+        .limit(bindparam("limit"))
+    )
+
+
+@lru_cache(maxsize=256)
+def by_id_statement(fields: FrozenSet[str]):
+    """
+    One exercise by :exercise_id.
+    """
+    return select(*columns(fields)).where(Exercise.id == bindparam("exercise_id"))
+
+
+@lru_cache(maxsize=256)
+def favorites_statement(fields: FrozenSet[str]):
+    """
+    The exercises favorited by :user_id.
+    """
+    return (
+        select(*columns(fields))
+        .join(Favorite, Favorite.exercise_id == Exercise.id)
+        .where(Favorite.user_id == bindparam("user_id"))
+    )
+
+
+def build(mappings, fields: FrozenSet[str], aggregate_values: dict, favorited=(), saved=()) -> List[dict]:
+    """
+    Assemble response dicts holding exactly `fields`, in the schema's field order, from
+    exercise column mappings (row._mapping or plain dicts). Aggregates missing from
+    `aggregate_values` are taken from the mapping.
+    """
+    ordered = [name for name in EXERCISE_FIELDS if name in fields]
+    output = []
+    for mapping in mappings:
+        exercise_id = mapping["id"]
+        item = {}
+        for name in ordered:
+            if name in aggregate_values:
+                item[name] = aggregate_values[name].get(exercise_id, 0.0 if name == "average_rating" else 0)
+            elif name == "user_has_favorited":
+                item[name] = exercise_id in favorited
+            elif name == "user_has_saved":
+                item[name] = exercise_id in saved
+            else:
+                item[name] = mapping[name]
+        output.append(item)
+    return output
+
+
+def hydrate_mappings(
+    db: Session, mappings: Sequence[Mapping], fields: FrozenSet[str], user_id: int,
+    precomputed: FrozenSet[str] = frozenset(),
+) -> List[dict]:
+    """
+    Turn exercise column mappings into response dicts, running only the aggregate and
+    membership lookups that `fields` needs. Aggregates in `precomputed` are read from the
+    mappings instead.
+    """
+    exercise_ids = [mapping["id"] for mapping in mappings]
+    aggregate_values = aggregates(db, exercise_ids, fields - precomputed)
+    favorited = saved = ()
+    if fields & MEMBERSHIP_FIELDS:
+        favorited, saved = membership.cache.lookup(db, user_id, exercise_ids)
+    return build(mappings, fields, aggregate_values, favorited, saved)
+
+
+def hydrate(db: Session, rows, fields: FrozenSet[str], user_id: int) -> List[dict]:
+    """
+    Turn column rows into response dicts (see hydrate_mappings).
+    """
+    return hydrate_mappings(db, [row._mapping for row in rows], fields, user_id)
+
+
+def resolve(fields: Optional[FrozenSet[str]]) -> FrozenSet[str]:
+    return ALL_FIELDS if fields is None else fields
@@ -0,0 +1,370 @@
+"""
+Background jobs for long bulk operations (Firestore migration, CSV import, backups).
+
+`submit()` stores a queued row in the `jobs` table and hands it to a bounded thread pool, so the
+request that started it can return 202 with the job id right away. A handler reports progress
+through its JobContext; progress is written to the row at most every PROGRESS_INTERVAL_SECONDS,
+and the same write picks up a cancellation requested from any worker process. Clients poll
+GET /jobs/{id}.
+
+Any worker process may run a queued job: claiming it is a conditional queued -> running update,
+and every JOB_POLL_SECONDS each runner with idle threads adopts queued jobs from the table. A
+worker shutting down (Gunicorn recycles workers and restarts them on SIGHUP) leaves its queued
+jobs for the others and waits for its running jobs; one still running when that wait ends is
+interrupted at its next progress update and queued again, to be restarted by another worker.
+Only a user's cancellation marks a job cancelled.
+
+Handlers are registered by name with `@handler("kind")` in the module that owns the operation.
+"""
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import Job
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_INTERVAL_SECONDS = 0.5
+FINISHED = ("succeeded", "failed", "cancelled")
+
+jobs_finished = metrics.REGISTRY.register(metrics.Counter(
+    "jobs_finished_total", "Background jobs by kind and final status.", ("kind", "status")
+))
+jobs_running = metrics.REGISTRY.register(metrics.Gauge(
+    "jobs_running", "Background jobs currently running in this process.", ("kind",)
+))
+
+_HANDLERS: Dict[str, Callable[["JobContext"], Optional[dict]]] = {}
+
+
+def handler(kind: str):
+    """
+    Register `fn(context) -> result dict` as the handler for jobs of `kind`.
+    """
+    def register(fn):
+        _HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobContext:
+    """
+    Passed to a handler: its parameters plus progress reporting and cancellation.
+    """
+
+    def __init__(self, job_id: int, params: dict, cancel_event: threading.Event):
+        self.job_id = job_id
+        self.params = params
+        self.total: Optional[int] = None
+        self.processed = 0
+        self._cancel_event = cancel_event
+        self._last_write = 0.0
+
+    def set_total(self, total: int):
+        self.total = total
+        self._write()
+
+    def advance(self, count: int = 1):
+        """
+        Count `count` more items as done. Raises JobCancelled if cancellation was requested.
+        """
+        self.processed += count
+        if time.monotonic() - self._last_write >= PROGRESS_INTERVAL_SECONDS:
+            self._write()
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def _write(self):
+        self._last_write = time.monotonic()
+        db = SessionLocal()
+        try:
+            job = db.get(Job, self.job_id)
+            job.total = self.total
+            job.processed = self.processed
+            job.updated_at = datetime.utcnow()
+            if job.cancel_requested:
+                self._cancel_event.set()
+            db.commit()
+        finally:
+            db.close()
+
+
+class JobRunner:
+    def __init__(self, max_workers: int, max_queued: int):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._cancel_events: Dict[int, threading.Event] = {}
+        self._queued = 0
+        self._running = 0
+        self._idle = threading.Condition(self._lock)
+        self._stopping = False
+
+    def start(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="job")
+
+    def submit(self, kind: str, params: dict = None, user_id: int = None) -> int:
+        """
+        Queue a job and return its id. Raises QueueFull when `max_queued` jobs are already waiting.
+        """
+        if kind not in _HANDLERS:
+            raise ValueError(f"No handler registered for job kind {kind!r}")
+        self.start()
+        with self._lock:
+            if self._queued >= self.max_queued:
+                raise QueueFull()
+            self._queued += 1
+        try:
+            db = SessionLocal()
+            try:
+                job = Job(kind=kind, params=json.dumps(params or {}), created_by=user_id)
+                db.add(job)
+                db.commit()
+                job_id = job.id
+            finally:
+                db.close()
+            self._cancel_events[job_id] = threading.Event()
+            self._executor.submit(self._run, job_id)
+        except BaseException:
+            with self._lock:
+                self._queued -= 1
+            raise
+        return job_id
+
+    def adopt_queued(self):
+        """
+        Take on queued jobs from the table, as many as this runner has idle threads for: jobs left
+        by a worker that shut down, or waiting behind another worker's busy threads.
+        """
+        with self._lock:
+            if self._executor is None:
+                return
+            free = self.max_workers - self._running - self._queued
+        if free <= 0:
+            return
+        db = SessionLocal()
+        try:
+            job_ids = [
+                job_id
+                for (job_id,) in db.query(Job.id).filter(Job.status == "queued").order_by(Job.id).limit(free)
+            ]
+        finally:
+            db.close()
+        for job_id in job_ids:
+            with self._lock:
+                if self._executor is None or job_id in self._cancel_events:
+                    continue
+                self._cancel_events[job_id] = threading.Event()
+                self._queued += 1
+                self._executor.submit(self._run, job_id)
+
+    def cancel(self, job_id: int) -> Optional[Job]:
+        """
+        Request cancellation. A queued job is cancelled at once; a running one stops at its next
+        progress update (in whichever process runs it). Returns the job, or None if unknown.
+        """
+        db = SessionLocal()
+        try:
+            job = db.get(Job, job_id)
+            if job is None or job.status in FINISHED:
+                return job
+            job.cancel_requested = True
+            if job.status == "queued":
+                job.status = "cancelled"
+                job.finished_at = datetime.utcnow()
+            db.commit()
+            db.refresh(job)
+            event = self._cancel_events.get(job_id)
+            if event is not None:
+                event.set()
+            return job
+        finally:
+            db.close()
+
+    def _claim(self, job_id: int) -> Optional[Job]:
+        # queued -> running, unless it was cancelled while waiting or another worker claimed it
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            claimed = (
+                db.query(Job)
+                .filter(Job.id == job_id, Job.status == "queued")
+                .update({"status": "running", "started_at": now, "updated_at": now}, synchronize_session=False)
+            )
+            db.commit()
+            if not claimed:
+                return None
+            job = db.get(Job, job_id)
+            db.expunge(job)
+            return job
+        finally:
+            db.close()
+
+    def _finish(self, job_id: int, context: Optional[JobContext], status: str, result=None, error: str = None):
+        db = SessionLocal()
+        try:
+            job = db.get(Job, job_id)
+            kind = job.kind
+            job.status = status
+            if context is not None:
+                job.total, job.processed = context.total, context.processed
+            job.result = json.dumps(result) if result is not None else None
+            job.error = error
+            job.finished_at = job.updated_at = datetime.utcnow()
+            db.commit()
+        finally:
+            db.close()
+        jobs_finished.inc((kind, status))
+
+    def _interrupted(self, job_id: int, context: JobContext):
+        # Stopped by this worker's shutdown: queue it again for another worker, unless the user
+        # cancelled it meanwhile
+        db = SessionLocal()
+        try:
+            job = db.get(Job, job_id)
+            cancelled = job.cancel_requested
+            if not cancelled:
+                job.status = "queued"
+                job.total, job.processed = context.total, 0
+                job.started_at = None
+                job.updated_at = datetime.utcnow()
+                db.commit()
+        finally:
+            db.close()
+        if cancelled:
+            self._finish(job_id, context, "cancelled")
+        else:
+            logger.warning("Job %s was interrupted by shutdown and queued again", job_id)
+
+    def _run(self, job_id: int):
+        with self._lock:
+            self._queued -= 1
+        cancel_event = self._cancel_events.get(job_id) or threading.Event()
+        try:
+            job = self._claim(job_id)
+            if job is None:
+                return
+            context = JobContext(job_id, json.loads(job.params), cancel_event)
+            with self._lock:
+                self._running += 1
+            jobs_running.inc((job.kind,))
+            try:
+                result = _HANDLERS[job.kind](context)
+            except JobCancelled:
+                if self._stopping:
+                    self._interrupted(job_id, context)
+                else:
+                    self._finish(job_id, context, "cancelled")
+            except Exception as exc:
+                logger.exception("Job %s (%s) failed", job_id, job.kind)
+                self._finish(job_id, context, "failed", error=str(exc) or type(exc).__name__)
+            else:
+                self._finish(job_id, context, "succeeded", result=result)
+            finally:
+                jobs_running.dec((job.kind,))
+                with self._lock:
+                    self._running -= 1
+                    self._idle.notify_all()
+        finally:
+            self._cancel_events.pop(job_id, None)
+
+    def stop(self, timeout: float):
+        """
+        Shut down for a worker exit. Jobs not started yet stay queued for other workers; running
+        ones get up to `timeout` seconds to finish, then are interrupted at their next progress
+        update and queued again.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            finished = self._idle.wait_for(lambda: self._running == 0, timeout)
+        if not finished:
+            self._stopping = True
+            for event in list(self._cancel_events.values()):
+                event.set()
+        executor.shutdown(wait=True)
+        self._cancel_events.clear()
+        self._queued = 0
+        self._stopping = False
+
+
+def fail_abandoned(stale_seconds: float):
+    """
+    Mark jobs left running by a process that died (no progress write for `stale_seconds`) as
+    failed. Run at startup. Queued jobs are left for `JobRunner.adopt_queued`.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_seconds)
+    db = SessionLocal()
+    try:
+        abandoned = (
+            db.query(Job)
+            .filter(Job.status == "running", Job.updated_at < cutoff)
+            .update(
+                {"status": "failed", "error": "Interrupted: the worker running it stopped", "finished_at": datetime.utcnow()},
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+    finally:
+        db.close()
+    if abandoned:
+        logger.warning("Marked %d abandoned jobs as failed", abandoned)
+    return abandoned
+
+
+def to_dict(job: Job) -> dict:
+    """
+    API view of a job, with its fraction done, throughput and estimated time remaining.
+    """
+    end = job.finished_at or datetime.utcnow()
+    elapsed = (end - job.started_at).total_seconds() if job.started_at else 0.0
+    throughput = job.processed / elapsed if elapsed > 0 else None
+    remaining = None
+    if job.status == "running" and throughput and job.total is not None:
+        remaining = round(max(job.total - job.processed, 0) / throughput, 1)
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "params": json.loads(job.params),
+        "total": job.total,
+        "processed": job.processed,
+        "progress": round(job.processed / job.total, 4) if job.total else None,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_per_second": round(throughput, 2) if throughput is not None else None,
+        "eta_seconds": remaining,
+        "cancel_requested": job.cancel_requested,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+runner = JobRunner(settings.JOB_WORKERS, settings.JOB_MAX_QUEUED)
@@ -0,0 +1,169 @@
+"""
+Database maintenance: remove favorites/saves/ratings that point at deleted exercises, prune
+change-log entries older than CHANGES_RETENTION_DAYS and return the freed pages to the
+filesystem with incremental VACUUM.
+
+Runs on a schedule from app/main.py, or manually with:
+    python -m app.db.maintenance
+
+Every worker process schedules the run, but only the one holding an flock on a sidecar file
+next to the database (`<db>.maintenance.lock`) carries it out. The lock is kept for the life
+of that process; when it exits another worker takes over at its next scheduled run.
+"""
+
+import fcntl
+import logging
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import SessionLocal, engine, writer_lock
+from app.db.models import Change, Exercise, Favorite, Rating, Saved
+
+logger = logging.getLogger(__name__)
+
+INTERACTION_MODELS = (Favorite, Saved, Rating)
+
+
+class LeaderLock:
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+        self._held = False
+
+    def claim(self) -> bool:
+        """
+        Take the lock if no other process holds it. Once taken it is kept until the process exits.
+        """
+        if not self._held:
+            # Opened lazily so each forked worker gets its own open file description
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self._held = True
+            except BlockingIOError:
+                pass
+        return self._held
+
+    def reset_after_fork(self):
+        self._fd = None
+        self._held = False
+
+
+compaction_leader = LeaderLock(f"{engine.url.database}.maintenance.lock")
+
+
+def delete_orphans(db: Session, batch_size: int) -> dict:
+    """
+    Delete interaction rows whose exercise no longer exists, `batch_size` rows per transaction
+    so the writer lock is never held for long. Returns the number of rows removed per table.
+    """
+    removed = {}
+    for model in INTERACTION_MODELS:
+        total = 0
+        while True:
+            orphan_ids = [
+                row_id
+                for (row_id,) in db.query(model.id)
+                .outerjoin(Exercise, Exercise.id == model.exercise_id)
+                .filter(Exercise.id.is_(None))
+                .limit(batch_size)
+            ]
+            if not orphan_ids:
+                break
+            db.query(model).filter(model.id.in_(orphan_ids)).delete(synchronize_session=False)
+            db.commit()
+            total += len(orphan_ids)
+        removed[model.__tablename__] = total
+    return removed
+
+
+def prune_changes(db: Session, retention_days: int, batch_size: int) -> int:
+    """
+    Delete change-log entries older than `retention_days`, oldest first and `batch_size` per
+    transaction. Only a prefix of versions is removed, and never the latest entry, so the oldest
+    remaining version tells /sync which cursors are still complete. Returns the number removed.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    latest = db.query(func.max(Change.version)).scalar()
+    total = 0
+    while latest is not None:
+        rows = (
+            db.query(Change.version, Change.created_at)
+            .filter(Change.version < latest)
+            .order_by(Change.version)
+            .limit(batch_size)
+            .all()
+        )
+        expired = []
+        for version, created_at in rows:
+            if created_at >= cutoff:
+                break
+            expired.append(version)
+        if not expired:
+            break
+        db.query(Change).filter(Change.version <= expired[-1]).delete(synchronize_session=False)
+        db.commit()
+        total += len(expired)
+        if len(expired) < len(rows) or len(rows) < batch_size:
+            break
+    return total
+
+
+def oldest_complete_version(db: Session) -> int:
+    """
+    The smallest `since` for which the change log still holds every later entry.
+    """
+    oldest = db.query(func.min(Change.version)).scalar()
+    return 0 if oldest is None else oldest - 1
+
+
+def incremental_vacuum(pages: int) -> bool:
+    """
+    Release up to `pages` free pages. Only possible when the database uses auto_vacuum=INCREMENTAL
+    (set on new databases by app/db/database.py; existing ones need a one-off full VACUUM).
+    """
+    with engine.connect() as conn:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+            logger.warning("auto_vacuum is not INCREMENTAL; run a full VACUUM once to enable it")
+            return False
+        writer_lock.acquire()
+        try:
+            # executescript steps the pragma to completion (a plain execute frees a single page)
+            conn.connection.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        finally:
+            writer_lock.release()
+    return True
+
+
+def compact(batch_size: int = None, vacuum_pages: int = None) -> dict:
+    batch_size = batch_size or settings.ORPHAN_COMPACTION_BATCH_SIZE
+    db = SessionLocal()
+    try:
+        removed = delete_orphans(db, batch_size)
+        if settings.CHANGES_RETENTION_DAYS > 0:
+            removed[Change.__tablename__] = prune_changes(db, settings.CHANGES_RETENTION_DAYS, batch_size)
+    finally:
+        db.close()
+    if any(removed.values()):
+        logger.info("Removed orphaned interaction rows and expired changes: %s", removed)
+    # Also reclaims pages freed by exercise deletes since the last run
+    incremental_vacuum(vacuum_pages or settings.INCREMENTAL_VACUUM_PAGES)
+    return removed
+
+
+def scheduled_compact():
+    """
+    Scheduler entry point: compact only in the worker process that holds the maintenance lock.
+    """
+    if compaction_leader.claim():
+        compact()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(compact())
@@ -2,11 +2,15 @@
 Defines SQLAlchemy models for User, Exercise, Favorite, Saved, and Rating.
 """
 
+from datetime import datetime
+
 from sqlalchemy import (
     Column,
     Integer,
     String,
+    Text,
     Boolean,
+    DateTime,
     ForeignKey,
     UniqueConstraint,
     Index
@@ -64,6 +68,7 @@ class Favorite(Base):
     Favorite model:
     - user_id (Foreign Key to User)
     - exercise_id (Foreign Key to Exercise)
+    - created_at (when the exercise was favorited)
     - unique combo (user_id, exercise_id)
     """
     __tablename__ = "favorites"
@@ -71,11 +76,14 @@ class Favorite(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     exercise_id = Column(Integer, ForeignKey("exercises.id"), nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
     user = relationship("User", back_populates="favorites")
 
     __table_args__ = (
         UniqueConstraint("user_id", "exercise_id", name="unique_user_favorite"),
+        # Serves per-exercise counts and keyset pagination of users by user_id
+        Index("idx_favorites_exercise_user", "exercise_id", "user_id"),
     )
 
 class Saved(Base):
@@ -83,6 +91,7 @@ class Saved(Base):
     Saved model:
     - user_id (Foreign Key to User)
     - exercise_id (Foreign Key to Exercise)
+    - created_at (when the exercise was saved)
     - unique combo (user_id, exercise_id)
     """
     __tablename__ = "saved"
@@ -90,11 +99,14 @@ class Saved(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     exercise_id = Column(Integer, ForeignKey("exercises.id"), nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
     user = relationship("User", back_populates="saved_exercises")
 
     __table_args__ = (
         UniqueConstraint("user_id", "exercise_id", name="unique_user_saved"),
+        # Serves per-exercise counts and keyset pagination of users by user_id
+        Index("idx_saved_exercise_user", "exercise_id", "user_id"),
     )
 
 class Rating(Base):
@@ -103,6 +115,7 @@ class Rating(Base):
     - user_id (Foreign Key to User)
     - exercise_id (Foreign Key to Exercise)
     - rating (1-5)
+    - created_at (when the exercise was first rated)
     - unique combo (user_id, exercise_id)
     """
     __tablename__ = "ratings"
@@ -111,9 +124,99 @@ class Rating(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     exercise_id = Column(Integer, ForeignKey("exercises.id"), nullable=False)
     rating = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
     user = relationship("User", back_populates="ratings")
 
     __table_args__ = (
         UniqueConstraint("user_id", "exercise_id", name="unique_user_rating"),
     )
+
+class Change(Base):
+    """
+    Change log read by the /sync endpoint:
+    - version: monotonically increasing primary key (never reused)
+    - entity: "exercise", "favorite", "save" or "rating"
+    - exercise_id: the exercise that changed or was interacted with
+    - user_id: the acting user for favorite/save/rating changes
+    - owner_id: owner of the exercise
+    - public: whether every user should see this change (the exercise was public before or after it)
+    - deleted: tombstone for deleted exercises, unfavorites and unsaves
+    """
+    __tablename__ = "changes"
+
+    version = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)
+    exercise_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=True)
+    owner_id = Column(Integer, nullable=False)
+    public = Column(Boolean, nullable=False, default=True)
+    deleted = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        {"sqlite_autoincrement": True},
+    )
+
+class ImportedRow(Base):
+    """
+    Hash of a row last imported from the Java H2 CSV exports, so re-imports only apply the rows
+    that changed (see app/db/csv_import.py):
+    - table_name + row_id: the imported row
+    - row_hash: SHA-1 of the row's normalized values
+    """
+    __tablename__ = "imported_rows"
+
+    table_name = Column(String, primary_key=True)
+    row_id = Column(Integer, primary_key=True)
+    row_hash = Column(String, nullable=False)
+
+class Job(Base):
+    """
+    Background job run by app/db/jobs.py:
+    - kind: registered handler name, params: its JSON arguments
+    - status: queued, running, succeeded, failed or cancelled
+    - total/processed: progress in the handler's units (exercises, rows, pages)
+    - cancel_requested: set by POST /jobs/{id}/cancel; the handler stops at its next progress update
+    - result/error: JSON result or error message once finished
+    - updated_at: last progress write, doubling as the running job's heartbeat
+    """
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    params = Column(Text, nullable=False, default="{}")
+    status = Column(String, nullable=False, default="queued")
+    total = Column(Integer, nullable=True)
+    processed = Column(Integer, nullable=False, default=0)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    created_by = Column(Integer, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("idx_jobs_status", "status"),
+    )
+
+class RevokedToken(Base):
+    """
+    Refresh-token revocations, mirrored in memory by app/db/token_revocation.py:
+    - token_id: a used refresh token's jti, or a revoked token family's id
+    - kind: "rotated" (the token was exchanged already) or "family" (every token of the family)
+    - expires_at: when every token the row covers has expired, so it can be pruned
+    """
+    __tablename__ = "revoked_tokens"
+
+    id = Column(Integer, primary_key=True)
+    token_id = Column(String, nullable=False, unique=True)
+    kind = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("idx_revoked_tokens_expires_at", "expires_at"),
+    )
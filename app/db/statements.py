@@ -0,0 +1,48 @@
+"""
+Registry of the statements on the hot request paths, built once at import time.
+
+Each statement takes its values as bind parameters, so a request only supplies a parameter
+dict: no ORM Query is rebuilt per call and SQLAlchemy's compiled cache is hit with the same
+statement object every time. Execute with `db.execute(statement, {...})`.
+Statements whose columns depend on the requested fields are cached in
+app/db/exercise_queries.py.
+"""
+
+from sqlalchemy import bindparam, func, select
+
+from app.db.models import Exercise, Favorite, Rating, Saved
+
+# Aggregates for a page of exercises (:exercise_ids is an expanding IN list)
+FAVORITE_COUNTS = (
+    select(Favorite.exercise_id, func.count(Favorite.id))
+    .where(Favorite.exercise_id.in_(bindparam("exercise_ids", expanding=True)))
+    .group_by(Favorite.exercise_id)
+)
+SAVE_COUNTS = (
+    select(Saved.exercise_id, func.count(Saved.id))
+    .where(Saved.exercise_id.in_(bindparam("exercise_ids", expanding=True)))
+    .group_by(Saved.exercise_id)
+)
+AVERAGE_RATINGS = (
+    select(Rating.exercise_id, func.avg(Rating.rating))
+    .where(Rating.exercise_id.in_(bindparam("exercise_ids", expanding=True)))
+    .group_by(Rating.exercise_id)
+)
+
+# All exercise ids a user favorited / saved, sorted (membership cache loads), by model
+MEMBERSHIP_IDS = {
+    model: select(model.exercise_id).where(model.user_id == bindparam("user_id")).order_by(model.exercise_id)
+    for model in (Favorite, Saved)
+}
+
+# A user's favorite / saved row for one exercise (toggle endpoints), by model
+INTERACTION = {
+    model: select(model).where(model.user_id == bindparam("user_id"), model.exercise_id == bindparam("exercise_id"))
+    for model in (Favorite, Saved)
+}
+
+# Existence and visibility of one exercise
+EXERCISE_VISIBILITY = (
+    select(Exercise.id, Exercise.owner_id, Exercise.is_public)
+    .where(Exercise.id == bindparam("exercise_id"))
+)
@@ -0,0 +1,192 @@
+"""
+Refresh-token rotation and revocation without a database round trip on the common path.
+
+Every refresh token carries its own id (`jti`) and the id of its family (`fam`): the chain of
+tokens rotated from one login. A refresh consumes the presented token and issues the next one
+of the family. If a consumed token is presented again it has been copied, so the whole family
+is revoked and whoever holds it has to sign in again.
+
+Consumed token ids and revoked families are stored in the revoked_tokens table and mirrored in
+an in-memory Bloom filter. When neither the token nor its family is in the filter (the common
+case) the refresh is answered from memory: the token is added to the filter at once and written
+to the table by `sync()` every REFRESH_TOKEN_REVOCATION_SYNC_SECONDS, which also loads the rows
+other worker processes wrote. Only filter hits (reuse, revoked families and the rare false
+positive) are checked against the table.
+
+Another worker process sees this one's consumed tokens after its next sync, so a token replayed
+against a different worker within that window is not detected as reuse. Revoking a family is
+written through at once.
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.dialects.sqlite import insert
+
+from app.core import metrics
+from app.core.bloom import BloomFilter
+from app.core.config import settings
+from app.core.security import REFRESH_TOKEN_EXPIRE_DAYS
+from app.db.database import SessionLocal
+from app.db.models import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+FALSE_POSITIVE_RATE = 0.001
+
+REUSED = "reused"
+REVOKED = "revoked"
+
+refresh_checks = metrics.REGISTRY.register(metrics.Counter(
+    "refresh_token_checks_total",
+    "Refresh tokens checked for revocation, by where the answer came from and the outcome.",
+    ("source", "outcome"),
+))
+
+
+class RevocationList:
+    def __init__(self, session_factory, capacity: int):
+        self.session_factory = session_factory
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._sync_lock = threading.RLock()
+        self._filter = BloomFilter(capacity, FALSE_POSITIVE_RATE)
+        # Rows not written yet: token_id -> (kind, expires_at)
+        self._pending: Dict[str, Tuple[str, datetime]] = {}
+        self._last_id = 0
+
+    def rebuild(self):
+        """
+        Prune expired rows and rebuild the filter from the table, sized for twice its rows.
+        """
+        with self._sync_lock:
+            db = self.session_factory()
+            try:
+                db.query(RevokedToken).filter(RevokedToken.expires_at < datetime.utcnow()).delete(
+                    synchronize_session=False
+                )
+                db.commit()
+                rows = db.query(RevokedToken.id, RevokedToken.token_id).all()
+            finally:
+                db.close()
+            bloom = BloomFilter(max(self.capacity, 2 * len(rows)), FALSE_POSITIVE_RATE)
+            for row in rows:
+                bloom.add(row.token_id)
+            with self._lock:
+                for token_id in self._pending:
+                    bloom.add(token_id)
+                self._filter = bloom
+                self._last_id = max((row.id for row in rows), default=0)
+
+    def consume(self, jti: str, family: str, expires_at: datetime) -> Optional[str]:
+        """
+        Mark refresh token `jti` as used. Returns None if it may be exchanged, REVOKED if its
+        family was revoked, or REUSED if it was used before, in which case the family is revoked.
+        """
+        with self._lock:
+            if jti not in self._filter and family not in self._filter:
+                self._pending[jti] = ("rotated", expires_at)
+                self._filter.add(jti)
+                refresh_checks.inc(("filter", "ok"))
+                return None
+            # Consumed here since the last sync
+            used_here = jti in self._pending
+
+        source = "memory" if used_here else "table"
+        state = REUSED if used_here else self._lookup(jti, family)
+        if state is None:
+            with self._lock:
+                if jti in self._pending:
+                    # A concurrent refresh with the same token got here first
+                    state = REUSED
+                else:
+                    self._pending[jti] = ("rotated", expires_at)
+                    self._filter.add(jti)
+        if state == REUSED:
+            logger.warning("Refresh token reuse detected; revoking token family %s", family)
+            self.revoke_family(family)
+        refresh_checks.inc((source, state or "ok"))
+        return state
+
+    def _lookup(self, jti: str, family: str) -> Optional[str]:
+        db = self.session_factory()
+        try:
+            kinds = dict(
+                db.query(RevokedToken.token_id, RevokedToken.kind)
+                .filter(RevokedToken.token_id.in_((jti, family)))
+                .all()
+            )
+        finally:
+            db.close()
+        if family in kinds:
+            return REVOKED
+        if jti in kinds:
+            return REUSED
+        return None
+
+    def revoke_family(self, family: str):
+        """
+        Revoke every refresh token of `family`. Written through, so other workers reject them
+        from their next sync.
+        """
+        with self._lock:
+            self._filter.add(family)
+        db = self.session_factory()
+        try:
+            db.execute(
+                insert(RevokedToken)
+                .values(
+                    token_id=family,
+                    kind="family",
+                    expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+                    created_at=datetime.utcnow(),
+                )
+                .on_conflict_do_nothing(index_elements=["token_id"])
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def sync(self):
+        """
+        Write the tokens consumed since the last sync and load the rows other workers wrote.
+        """
+        with self._sync_lock:
+            with self._lock:
+                pending = dict(self._pending)
+            db = self.session_factory()
+            try:
+                if pending:
+                    now = datetime.utcnow()
+                    db.execute(
+                        insert(RevokedToken).on_conflict_do_nothing(index_elements=["token_id"]),
+                        [
+                            {"token_id": token_id, "kind": kind, "expires_at": expires_at, "created_at": now}
+                            for token_id, (kind, expires_at) in pending.items()
+                        ],
+                    )
+                    db.commit()
+                rows = (
+                    db.query(RevokedToken.id, RevokedToken.token_id)
+                    .filter(RevokedToken.id > self._last_id)
+                    .order_by(RevokedToken.id)
+                    .all()
+                )
+            finally:
+                db.close()
+            with self._lock:
+                # Entries stay pending until written, so consume() still finds them meanwhile
+                for token_id in pending:
+                    self._pending.pop(token_id, None)
+                for row in rows:
+                    self._filter.add(row.token_id)
+                if rows:
+                    self._last_id = rows[-1].id
+                full = self._filter.count > self._filter.capacity
+            if full:
+                self.rebuild()
+
+
+revocations = RevocationList(SessionLocal, settings.REFRESH_TOKEN_REVOCATION_CAPACITY)
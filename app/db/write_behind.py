@@ -0,0 +1,217 @@
+"""
+Optional write-behind queue for favorite/save toggles.
+
+Toggles are acknowledged immediately and kept as the desired final state per
+(kind, user, exercise), so rapid on/off clicking collapses to one row change. A background
+thread applies the pending states every few milliseconds in a single transaction. Reads
+call `settle(user_id)` first so the acting user always sees their own toggles, and
+`stop()` drains whatever is left on shutdown. Firestore counter updates for committed toggles
+are sent afterwards by the background thread, so a read that settles never waits on Firestore.
+
+Pending toggles live in the process that accepted them, and `settle` can only flush its own
+process's queue, so read-your-writes needs a single worker process: gunicorn.conf.py refuses
+to start more than one with write-behind enabled.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from app.core import firestore_counters, leaderboard, membership, metrics
+from app.core.config import settings
+from app.db import changes
+from app.db.database import SessionLocal
+from app.db.models import Exercise, Favorite, Saved
+
+logger = logging.getLogger(__name__)
+
+MODELS = {"favorite": Favorite, "save": Saved}
+
+toggles_submitted = metrics.REGISTRY.register(metrics.Counter(
+    "write_behind_toggles_total", "Favorite/save toggles accepted by the write-behind queue.", ("kind",)
+))
+toggles_coalesced = metrics.REGISTRY.register(metrics.Counter(
+    "write_behind_coalesced_total", "Toggles that replaced a still-pending toggle for the same user and exercise."
+))
+flush_duration = metrics.REGISTRY.register(metrics.Histogram(
+    "write_behind_flush_duration_seconds", "Time to apply one batch of pending toggles."
+))
+
+Key = Tuple[str, int, int]
+
+
+class ToggleQueue:
+    def __init__(self, session_factory, interval_seconds: float):
+        self.session_factory = session_factory
+        self.interval = interval_seconds
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[Key, bool] = {}
+        self._pending_users = set()
+        self._in_flight_users = set()
+        # Committed (kind, exercise id, removed) toggles not yet sent to the Firestore counters
+        self._unpublished: List[Tuple[str, int, bool]] = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def submit(self, kind: str, user_id: int, exercise_id: int, state: bool):
+        """
+        Record that `user_id` wants `exercise_id` favorited/saved (state=True) or not.
+        """
+        with self._lock:
+            if (kind, user_id, exercise_id) in self._pending:
+                toggles_coalesced.inc()
+            self._pending[(kind, user_id, exercise_id)] = state
+            self._pending_users.add(user_id)
+        toggles_submitted.inc((kind,))
+        self._wakeup.set()
+
+    def settle(self, user_id: int):
+        """
+        Make sure every toggle by `user_id` is committed before a read (read-your-writes).
+        Cheap when the user has nothing pending.
+        """
+        with self._lock:
+            if user_id not in self._pending_users and user_id not in self._in_flight_users:
+                return
+        self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._in_flight_users, self._pending_users = self._pending_users, set()
+            if not batch:
+                return
+            try:
+                with flush_duration.time():
+                    published = self._apply(batch)
+            except Exception:
+                logger.exception("Write-behind flush of %d toggles failed, requeueing", len(batch))
+                with self._lock:
+                    # Newer toggles submitted during the failed flush take precedence
+                    for key, state in batch.items():
+                        self._pending.setdefault(key, state)
+                        self._pending_users.add(key[1])
+                raise
+            finally:
+                with self._lock:
+                    self._in_flight_users = set()
+        if published:
+            with self._lock:
+                self._unpublished.extend(published)
+            self._wakeup.set()
+
+    def _publish(self):
+        with self._lock:
+            unpublished, self._unpublished = self._unpublished, []
+        for kind, exercise_id, removed in unpublished:
+            firestore_counters.record(kind, exercise_id, removed=removed)
+
+    def _apply(self, batch: Dict[Key, bool]) -> List[Tuple[str, int, bool]]:
+        now = datetime.utcnow()
+        events = []
+        db = self.session_factory()
+        try:
+            exercise_ids = {exercise_id for (_, _, exercise_id) in batch}
+            existing_exercises = {
+                row.id: row
+                for row in db.query(Exercise.id, Exercise.owner_id, Exercise.is_public)
+                .filter(Exercise.id.in_(exercise_ids))
+            }
+            logged = []
+
+            for kind, model in MODELS.items():
+                wanted = {(u, e): state for (k, u, e), state in batch.items() if k == kind}
+                if not wanted:
+                    continue
+                users = {u for (u, _) in wanted}
+                exercises = {e for (_, e) in wanted}
+                current = {
+                    (u, e): created_at
+                    for u, e, created_at in db.query(model.user_id, model.exercise_id, model.created_at)
+                    .filter(model.user_id.in_(users), model.exercise_id.in_(exercises))
+                }
+
+                inserts = [
+                    {"user_id": u, "exercise_id": e, "created_at": now}
+                    for (u, e), state in wanted.items()
+                    if state and (u, e) not in current and e in existing_exercises
+                ]
+                deletes = defaultdict(list)
+                for (u, e), state in wanted.items():
+                    if not state and (u, e) in current:
+                        deletes[u].append(e)
+
+                if inserts:
+                    db.bulk_insert_mappings(model, inserts)
+                for user_id, user_exercises in deletes.items():
+                    db.query(model).filter(
+                        model.user_id == user_id, model.exercise_id.in_(user_exercises)
+                    ).delete(synchronize_session=False)
+
+                logged.extend((kind, existing_exercises[row["exercise_id"]], row["user_id"], False) for row in inserts)
+                logged.extend(
+                    (kind, existing_exercises[e], u, True)
+                    for u, user_exercises in deletes.items() for e in user_exercises if e in existing_exercises
+                )
+                events.extend((kind, row["exercise_id"], now, False) for row in inserts)
+                events.extend(
+                    (kind, e, current[(u, e)], True) for u, user_exercises in deletes.items() for e in user_exercises
+                )
+            if logged:
+                changes.record_interactions(db, logged)
+            db.commit()
+        finally:
+            db.close()
+
+        for user_id in {u for (_, u, _) in batch}:
+            membership.cache.invalidate(user_id)
+        for kind, exercise_id, created_at, removed in events:
+            leaderboard.record_event(kind, exercise_id, created_at, removed=removed)
+        return [(kind, exercise_id, removed) for kind, exercise_id, _, removed in events]
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait()
+            # Let a burst of toggles accumulate into one transaction
+            time.sleep(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                time.sleep(self.interval)
+            self._publish()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """
+        Stop the background thread and durably apply everything still pending.
+        """
+        if self._thread is not None:
+            self._stopping.set()
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        self._publish()
+
+
+queue = ToggleQueue(SessionLocal, settings.WRITE_BEHIND_FLUSH_MS / 1000)
+
+
+def settle(user_id: int):
+    if settings.WRITE_BEHIND_ENABLED:
+        queue.settle(user_id)
@@ -0,0 +1,92 @@
+"""
+Single-writer serialization for SQLite when several worker processes share one database file.
+
+Readers run in parallel under WAL. A session takes the writer lock (a thread lock plus an
+flock on a sidecar file, so it also excludes other processes) just before its first write
+and holds it until its transaction ends, so writers queue here instead of failing with
+"database is locked".
+"""
+
+import fcntl
+import os
+import threading
+import time
+
+from sqlalchemy import event
+
+_HELD_KEY = "write_lock_held"
+
+
+class WriteLockTimeout(Exception):
+    """
+    Raised when the writer lock could not be acquired within the configured timeout.
+    """
+
+
+class WriteLock:
+    def __init__(self, path: str, timeout_seconds: float):
+        self.path = path
+        self.timeout = timeout_seconds
+        self._thread_lock = threading.Lock()
+        self._fd = None
+
+    def _file(self) -> int:
+        # Opened lazily so each forked worker gets its own open file description
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        return self._fd
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        if not self._thread_lock.acquire(timeout=self.timeout):
+            raise WriteLockTimeout(f"Timed out waiting for the database writer lock ({self.path})")
+        try:
+            delay = 0.001
+            while True:
+                try:
+                    fcntl.flock(self._file(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise WriteLockTimeout(f"Timed out waiting for the database writer lock ({self.path})")
+                    time.sleep(delay)
+                    delay = min(delay * 2, 0.05)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+
+    def release(self):
+        try:
+            fcntl.flock(self._file(), fcntl.LOCK_UN)
+        finally:
+            self._thread_lock.release()
+
+    def reset_after_fork(self):
+        self._fd = None
+        self._thread_lock = threading.Lock()
+
+
+def install(session_factory, lock: WriteLock):
+    """
+    Make every session created by `session_factory` take `lock` before writing.
+    """
+
+    def acquire_for(session):
+        if not session.info.get(_HELD_KEY):
+            lock.acquire()
+            session.info[_HELD_KEY] = True
+
+    @event.listens_for(session_factory, "before_flush")
+    def _before_flush(session, flush_context, instances):
+        acquire_for(session)
+
+    @event.listens_for(session_factory, "do_orm_execute")
+    def _before_execute(orm_execute_state):
+        # Bulk query.update()/delete() and Core DML statements don't go through a flush
+        if not orm_execute_state.is_select:
+            acquire_for(orm_execute_state.session)
+
+    @event.listens_for(session_factory, "after_transaction_end")
+    def _after_transaction_end(session, transaction):
+        if transaction.parent is None and session.info.pop(_HELD_KEY, False):
+            lock.release()
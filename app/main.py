@@ -3,10 +3,17 @@ FastAPI app to test config and database.
 """
 
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.core.config import settings  # Import our settings
-from app.db.database import Base, engine
-from app.routers import exercises, auth, favorites, saves, ratings, collection, migrate
+from app.core.compression import CompressionMiddleware
+from app.core.concurrency import ConcurrencyLimitMiddleware, default_limiters
+from app.core.metrics import REGISTRY, MetricsMiddleware
+from app.db.database import Base, engine, read_engine, SessionLocal
+from app.db.write_lock import WriteLockTimeout
+from app.db import jobs as background_jobs, maintenance, token_revocation, write_behind
+from app.core import autocomplete, firestore_counters, leaderboard, membership, profiling, scheduler, similarity
+from app.routers import admin, exercises, auth, favorites, saves, ratings, collection, jobs, migrate, sync, videos
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -24,6 +31,10 @@ app.include_router(saves.router)
 app.include_router(ratings.router)
 app.include_router(collection.router)
 app.include_router(migrate.router)
+app.include_router(sync.router)
+app.include_router(videos.router)
+app.include_router(admin.router)
+app.include_router(jobs.router)
 
 
 
@@ -36,6 +47,104 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+)
+
+if settings.PROFILING_ENABLED:
+    # GET routes read through read_engine, everything else through the primary
+    profiling.install(app, (engine, read_engine), settings.PROFILING_TOKEN, settings.PROFILING_OUTPUT_DIR)
+
+if settings.CONCURRENCY_LIMITS_ENABLED:
+    # Inside the metrics middleware so shed requests show up as 503s
+    app.add_middleware(
+        ConcurrencyLimitMiddleware,
+        limiters=default_limiters(),
+        queue_timeout=settings.CONCURRENCY_QUEUE_TIMEOUT_SECONDS,
+    )
+
+# Outermost middleware so the recorded latency covers the whole stack
+app.add_middleware(MetricsMiddleware, routes_provider=lambda: app.routes)
+
+@app.exception_handler(WriteLockTimeout)
+def write_lock_timeout_handler(request: Request, exc: WriteLockTimeout):
+    # The database is saturated with writes; ask the client to retry shortly
+    return JSONResponse(status_code=503, content={"detail": "Database busy, retry later"}, headers={"Retry-After": "1"})
+
+@app.on_event("startup")
+def load_in_memory_indexes():
+    """
+    Build the in-memory structures that are maintained incrementally afterwards.
+    """
+    membership.cache.clear()
+    db = SessionLocal()
+    try:
+        leaderboard.rebuild(db)
+        similarity.index.rebuild(db)
+        autocomplete.index.rebuild(db)
+    finally:
+        db.close()
+    token_revocation.revocations.rebuild()
+
+    if settings.WRITE_BEHIND_ENABLED:
+        write_behind.queue.start()
+    background_jobs.fail_abandoned(settings.JOB_STALE_SECONDS)
+    background_jobs.runner.start()
+    scheduler.run_periodically("jobs", settings.JOB_POLL_SECONDS, background_jobs.runner.adopt_queued)
+    if settings.LEADERBOARD_REFRESH_SECONDS > 0:
+        scheduler.run_periodically("leaderboard", settings.LEADERBOARD_REFRESH_SECONDS, _rebuild_leaderboard)
+    if settings.SIMILARITY_REFRESH_SECONDS > 0:
+        scheduler.run_periodically("similarity", settings.SIMILARITY_REFRESH_SECONDS, _rebuild_similarity)
+    scheduler.run_periodically(
+        "token-revocation-sync", settings.REFRESH_TOKEN_REVOCATION_SYNC_SECONDS, token_revocation.revocations.sync
+    )
+    if settings.AUTOCOMPLETE_REFRESH_SECONDS > 0:
+        scheduler.run_periodically("autocomplete", settings.AUTOCOMPLETE_REFRESH_SECONDS, _rebuild_autocomplete)
+    if settings.ORPHAN_COMPACTION_INTERVAL_SECONDS > 0:
+        scheduler.run_periodically("orphan-compaction", settings.ORPHAN_COMPACTION_INTERVAL_SECONDS, maintenance.scheduled_compact)
+    if settings.FIRESTORE_COUNTERS_ENABLED and settings.FIRESTORE_COUNTER_ROLLUP_SECONDS > 0:
+        scheduler.run_periodically(
+            "firestore-counter-rollup", settings.FIRESTORE_COUNTER_ROLLUP_SECONDS, firestore_counters.rollup
+        )
+
+def _rebuild_leaderboard():
+    db = SessionLocal()
+    try:
+        leaderboard.rebuild(db)
+    finally:
+        db.close()
+
+def _rebuild_similarity():
+    db = SessionLocal()
+    try:
+        similarity.index.rebuild(db)
+    finally:
+        db.close()
+
+def _rebuild_autocomplete():
+    db = SessionLocal()
+    try:
+        autocomplete.index.rebuild(db)
+    finally:
+        db.close()
+
+@app.on_event("shutdown")
+def stop_background_jobs():
+    scheduler.stop_all()
+    # Persist the refresh tokens consumed since the last sync
+    token_revocation.revocations.sync()
+    # Queued jobs are left to other workers; running ones get the graceful timeout, less a few
+    # seconds for the steps below, to finish before they are interrupted and queued again
+    background_jobs.runner.stop(max(settings.GRACEFUL_TIMEOUT - 5, 0))
+    # Drain pending favorite/save toggles before the worker exits
+    write_behind.queue.stop()
+    if settings.FIRESTORE_COUNTERS_ENABLED:
+        # Publish the counter changes this worker made since the last rollup
+        firestore_counters.rollup()
+
 @app.get("/test")
 def test():
     """
@@ -43,6 +152,14 @@ def test():
     """
     return {"message": "Configuration & database are set up!"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Prometheus scrape endpoint: request latency/errors per route, DB pool usage,
+    cache hit/miss counts and Firestore call latency.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     # Run the app with Uvicorn for local development
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,34 @@
+"""
+Operational endpoints, enabled by setting ADMIN_TOKEN and called with the X-Admin-Token header.
+Each starts a background job; poll GET /jobs/{job_id}.
+"""
+
+from fastapi import APIRouter, Depends
+
+from app.core.config import settings
+from app.core.security import require_admin
+from app.routers.jobs import start_job
+
+# Imported for their job handlers
+from app.db import backup, csv_import  # noqa: F401
+
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+
+@router.post("/backup", status_code=202)
+def start_backup(compress: bool = None, verify: bool = True):
+    """
+    Start an online backup of the database into BACKUP_DIR. Writers keep running while it is
+    copied; progress is reported in pages.
+    """
+    compress = settings.BACKUP_COMPRESS if compress is None else compress
+    return start_job("backup", {"directory": settings.BACKUP_DIR, "compress": compress, "verify": verify})
+
+
+@router.post("/csv-import", status_code=202)
+def start_csv_import(csv_dir: str = "java_backend_migration", batch_size: int = None):
+    """
+    Start an incremental re-import of the H2 CSV exports in `csv_dir` (a path on the server);
+    progress is reported in CSV rows and the result is the per-table verification report.
+    """
+    return start_job("csv_import", {"csv_dir": csv_dir, "batch_size": batch_size})
@@ -1,7 +1,12 @@
 """
-Handles user registration, login, and token refresh endpoints.
+Handles user registration, login, token refresh and revocation endpoints.
 """
+import hashlib
+from datetime import datetime
+from typing import Tuple
+
 from fastapi import APIRouter, Depends, HTTPException, status
+from jose import JWTError
 from sqlalchemy.orm import Session
 from app.core.security import (
     get_password_hash,
@@ -11,6 +16,7 @@ from app.core.security import (
     decode_jwt,
 )
 from app.db.database import get_db
+from app.db.token_revocation import REUSED, revocations
 from app.db.models import User
 from app.schemas.user import UserCreate, UserResponse
 from app.schemas.token import Token, RefreshTokenRequest
@@ -47,20 +53,55 @@ def login(user_create: UserCreate, db: Session = Depends(get_db)):
     )
 
 
+def _token_ids(payload: dict, token: str) -> Tuple[str, str]:
+    """
+    The (jti, family) of a refresh token. Tokens issued before rotation existed carry neither;
+    they get ids derived from the token itself, so each can be exchanged once and is rotated
+    into a family of its own. They stop working when they expire, REFRESH_TOKEN_EXPIRE_DAYS
+    after that deploy at the latest.
+    """
+    if payload.get("jti") and payload.get("fam"):
+        return payload["jti"], payload["fam"]
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    return digest[:32], digest[32:]
+
 @router.post("/refresh", response_model=Token)
-def refresh_token(request: RefreshTokenRequest, db: Session = Depends(get_db)):
+def refresh_token(request: RefreshTokenRequest):
+    """
+    Exchange a refresh token for a new access token and the next refresh token of its family.
+    Each refresh token works once; presenting a used one again revokes its whole family.
+    Unless the token is in the revocation filter, this needs no database access.
+    """
     try:
         payload = decode_jwt(request.refresh_token)
-    except:
+    except JWTError:
         raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
     if payload.get("scope") != "refresh_token":
         raise HTTPException(status_code=401, detail="Invalid scope for token")
     user_id = payload.get("sub")
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token payload")
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    new_access_token = create_access_token(subject=str(user.id))
-    new_refresh_token = create_refresh_token(subject=str(user.id))
-    return Token(access_token=new_access_token, refresh_token=new_refresh_token, user_id=user.id)
+    jti, family = _token_ids(payload, request.refresh_token)
+    state = revocations.consume(jti, family, datetime.utcfromtimestamp(payload["exp"]))
+    if state == REUSED:
+        raise HTTPException(status_code=401, detail="Refresh token already used; sign in again")
+    if state is not None:
+        raise HTTPException(status_code=401, detail="Refresh token revoked")
+    return Token(
+        access_token=create_access_token(subject=user_id),
+        refresh_token=create_refresh_token(subject=user_id, family=family),
+        user_id=int(user_id),
+    )
+
+@router.post("/revoke", status_code=204)
+def revoke_refresh_token(request: RefreshTokenRequest):
+    """
+    Revoke a refresh token together with every token rotated from the same login, e.g. on
+    sign-out or when it leaked. Invalid or expired tokens are ignored: there is nothing to revoke.
+    """
+    try:
+        payload = decode_jwt(request.refresh_token)
+    except JWTError:
+        return
+    if payload.get("scope") == "refresh_token":
+        revocations.revoke_family(_token_ids(payload, request.refresh_token)[1])
@@ -4,122 +4,165 @@ Handles CRUD for Exercises. Supports fetching from local SQLite or from Firestor
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from sqlalchemy.orm import Session
-from sqlalchemy import func, distinct
-from typing import List
+from sqlalchemy import func
+from typing import FrozenSet, List, Optional
 
-from app.db.database import get_db
+from app.db.database import get_read_db, get_write_db, primary_pins
 from app.db.models import Exercise, Favorite, Saved, User, Rating
 from app.schemas.exercise import (
+    EXERCISE_FIELDS,
     ExerciseCreate,
     ExerciseResponse,
-    ExerciseUpdate
+    ExerciseUpdate,
+    requested_fields,
+    exercise_response,
 )
 from app.core.security import get_current_user_id
+from app.core.metrics import firestore_call
+from app.core.singleflight import SingleFlight
+from app.core import autocomplete
+from app.core import leaderboard
+from app.core.config import settings
+from app.core import firestore_counters
+from app.core import similarity
+from app.core import video_storage
+from app.core import membership
+from app.db import changes, exercise_queries, write_behind
 
 # Firestore client
 from app.firebase_setup import db_firestore, bucket
 
 router = APIRouter(prefix="/exercises", tags=["Exercises"])
 
+# Coalesces concurrent reads of the same exercise (e.g. a popular shared link)
+exercise_reads = SingleFlight("exercise_singleflight")
+
+# Always loaded for single-exercise reads so visibility can be checked
+VISIBILITY_FIELDS = frozenset({"is_public", "owner_id"})
+
+# Counts kept by the sharded Firestore counters (see app/core/firestore_counters.py)
+COUNTER_FIELDS = frozenset(firestore_counters.COUNTER_FIELDS.values())
+
+# Upper bound on ids accepted by a batch lookup (GET /exercises/?ids=...)
+MAX_BATCH_IDS = 200
+
+
+def _parse_ids(ids: str) -> List[int]:
+    try:
+        parsed = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    if len(parsed) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    return parsed
+
+
+def _get_exercises_batch(db: Session, exercise_ids: List[int], selected: FrozenSet[str], user_id: int) -> list:
+    """
+    Hydrate the given exercises in request order with a fixed number of queries. Ids that don't
+    exist or aren't visible to the user come back as {"id": ..., "not_found": true}.
+    """
+    rows = (
+        db.query(*exercise_queries.columns(selected, extra=VISIBILITY_FIELDS))
+        .filter(Exercise.id.in_(set(exercise_ids)))
+        .filter((Exercise.is_public == True) | (Exercise.owner_id == user_id))
+        .all()
+    )
+    items = {item["id"]: item for item in exercise_queries.hydrate(db, rows, selected, user_id)}
+    return [items.get(exercise_id, {"id": exercise_id, "not_found": True}) for exercise_id in exercise_ids]
+
+
+def _exercise_snapshot(db: Session, exercise_id: int, fields: FrozenSet[str]):
+    """
+    Load the user-independent part of an exercise: the requested columns and aggregates, plus
+    the visibility columns. Returns None if the exercise does not exist.
+    """
+    row = db.execute(
+        exercise_queries.by_id_statement(fields | VISIBILITY_FIELDS), {"exercise_id": exercise_id}
+    ).first()
+    if row is None:
+        return None
+    aggregate_values = exercise_queries.aggregates(db, [exercise_id], fields)
+    return exercise_queries.build([row._mapping], fields | VISIBILITY_FIELDS, aggregate_values)[0]
+
+def _get_cloud_exercises(user_id: int, skip: int, limit: int) -> List[dict]:
+    """
+    One page of the Firestore exercise documents visible to the user, in id order. Streaming
+    stops as soon as the page is full. The documents only describe the exercise itself; the
+    caller fills in counts and the user's flags from SQLite for the whole page.
+    """
+    page = []
+    visible = 0
+    with firestore_call("exercises.stream"):
+        for doc in db_firestore.collection('exercises').order_by('id').stream():
+            data = doc.to_dict()
+            owner_id = int(data.get('owner_id', 0))
+            is_public = bool(data.get('is_public', True))
+            if not is_public and owner_id != user_id:
+                continue
+            visible += 1
+            if visible <= skip:
+                continue
+            page.append({
+                'id': int(data.get('id', 0)),
+                'name': data.get('name'),
+                'description': data.get('description'),
+                'difficulty': int(data.get('difficulty', 1)),
+                'is_public': is_public,
+                'owner_id': owner_id,
+                'video_url': str(data.get('video_url', "")),
+                'favorite_count': int(data.get('favorite_count', 0)),
+                'save_count': int(data.get('save_count', 0)),
+            })
+            if len(page) >= limit:
+                break
+    return page
+
 @router.get("/", response_model=List[ExerciseResponse])
 def get_exercises(
     request: Request,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user_id: int = Depends(get_current_user_id),
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=50),
+    fields: Optional[FrozenSet[str]] = Depends(requested_fields),
+    ids: Optional[str] = Query(
+        None, description=f"Comma-separated exercise ids to fetch in one request (max {MAX_BATCH_IDS})"
+    ),
 ):
     """
     Retrieve public exercises and user's private exercises with pagination.
-    Uses subqueries to correctly count favorites and saves and calculates average rating.
+    Counts, average rating and the user's flags are loaded for the page with one query each,
+    and skipped entirely for fields left out of `fields`.
+    With `ids`, return exactly those exercises in request order instead of a page.
+    With `use_cloud=true`, the page is read from Firestore and gets the same counts and flags.
     """
+    write_behind.settle(current_user_id)
+    selected = exercise_queries.resolve(fields)
+    if ids is not None:
+        return exercise_response(_get_exercises_batch(db, _parse_ids(ids), selected, current_user_id))
     # Fetch from Firestore
     if request.query_params.get('use_cloud') == 'true':
-        exercises_firestore = db_firestore.collection('exercises').stream()
-        response_list = []
-        for doc in exercises_firestore:
-            data = doc.to_dict()
-            data['id'] = int(data.get('id', 0))
-            data['difficulty'] = int(data.get('difficulty', 1))
-            data['is_public'] = bool(data.get('is_public', True))
-            data['owner_id'] = int(data.get('owner_id', 0))
-            data['favorite_count'] = int(data.get('favorite_count', 0))
-            data['save_count'] = int(data.get('save_count', 0))
-            data['average_rating'] = float(data.get('average_rating', 0.0))
-            data['video_url'] = str(data.get('video_url', ""))
-            # These fields aren't maintained in Firestore so default to False.
-            data['user_has_favorited'] = False
-            data['user_has_saved'] = False
-            response_list.append(data)
-        return response_list
+        documents = _get_cloud_exercises(current_user_id, skip, limit)
+        # With sharded counters the documents carry rolled-up counts; otherwise they come from SQLite
+        precomputed = COUNTER_FIELDS if settings.FIRESTORE_COUNTERS_ENABLED else frozenset()
+        return exercise_response(
+            exercise_queries.hydrate_mappings(db, documents, selected, current_user_id, precomputed)
+        )
     
     # Fetch from SQLite
     else:
-        # Subquery for counting favorites
-        favorite_subq = (
-            db.query(
-                Favorite.exercise_id,
-                func.count(Favorite.id).label("favorite_count")
-            )
-            .group_by(Favorite.exercise_id)
-            .subquery()
-        )
-
-        # Subquery for counting saves
-        save_subq = (
-            db.query(
-                Saved.exercise_id,
-                func.count(Saved.id).label("save_count")
-            )
-            .group_by(Saved.exercise_id)
-            .subquery()
-        )
-
-        query = (
-            db.query(
-                Exercise,
-                func.coalesce(favorite_subq.c.favorite_count, 0).label("favorite_count"),
-                func.coalesce(save_subq.c.save_count, 0).label("save_count")
-            )
-            .outerjoin(favorite_subq, favorite_subq.c.exercise_id == Exercise.id)
-            .outerjoin(save_subq, save_subq.c.exercise_id == Exercise.id)
-            .filter((Exercise.is_public == True) | (Exercise.owner_id == current_user_id))
-            .offset(skip)
-            .limit(limit)
-        )
-
-        results = query.all()
-
-        # Get the user's favorite and saved exercise IDs separately
-        user_fav_ids = {fav.exercise_id for fav in db.query(Favorite).filter(Favorite.user_id == current_user_id).all()}
-        user_save_ids = {s.exercise_id for s in db.query(Saved).filter(Saved.user_id == current_user_id).all()}
-
-        response_list = []
-        for (exercise, fav_count, save_count) in results:
-            avg_rating = db.query(func.avg(Rating.rating)).filter(Rating.exercise_id == exercise.id).scalar() or 0.0
-            response_list.append(
-                ExerciseResponse(
-                    id=exercise.id,
-                    name=exercise.name,
-                    description=exercise.description,
-                    difficulty=exercise.difficulty,
-                    is_public=exercise.is_public,
-                    owner_id=exercise.owner_id,
-                    favorite_count=fav_count,
-                    save_count=save_count,
-                    user_has_favorited=(exercise.id in user_fav_ids),
-                    user_has_saved=(exercise.id in user_save_ids),
-                    average_rating=round(avg_rating, 2),
-                    video_url=exercise.video_url
-                )
-            )
-
-        return response_list
+        rows = db.execute(
+            exercise_queries.visible_page_statement(selected),
+            {"user_id": current_user_id, "skip": skip, "limit": limit},
+        ).all()
+        response_list = exercise_queries.hydrate(db, rows, selected, current_user_id)
+        return exercise_response(response_list)
 
 @router.post("/", response_model=ExerciseResponse)
 def create_exercise(
     exercise: ExerciseCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_write_db),
     user_id: int = Depends(get_current_user_id)
 ):
     """
@@ -135,8 +178,12 @@ def create_exercise(
     )
 
     db.add(new_exercise)
+    db.flush()
+    changes.record(db, "exercise", new_exercise)
     db.commit()
     db.refresh(new_exercise)
+    leaderboard.set_visibility(new_exercise.id, new_exercise.is_public)
+    autocomplete.index.put(new_exercise.id, new_exercise.name, new_exercise.owner_id, new_exercise.is_public)
     # Return with zero counts, obviously, as it's new
     return ExerciseResponse(
         id=new_exercise.id,
@@ -153,54 +200,79 @@ def create_exercise(
 
     )
 
+@router.get("/trending")
+def get_trending_exercises(
+    limit: int = Query(10, ge=1, le=100),
+    current_user_id: int = Depends(get_current_user_id),
+):
+    """
+    Public exercises ranked by time-decayed popularity, served from the in-memory leaderboard.
+    """
+    return leaderboard.trending.top(limit)
+
+@router.get("/popular")
+def get_popular_exercises(
+    limit: int = Query(10, ge=1, le=100),
+    current_user_id: int = Depends(get_current_user_id),
+):
+    """
+    Public exercises ranked by all-time popularity, served from the in-memory leaderboard.
+    """
+    return leaderboard.popular.top(limit)
+
+@router.get("/autocomplete")
+def autocomplete_exercises(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=autocomplete.RESULT_LIMIT),
+    current_user_id: int = Depends(get_current_user_id),
+):
+    """
+    Typeahead suggestions: public exercises and the caller's private ones with a word starting
+    with `q` (words in order), most popular first. Served from the in-memory prefix index
+    without touching the database.
+    """
+    return autocomplete.index.suggest(q, current_user_id, limit)
+
 @router.get("/{exercise_id}", response_model=ExerciseResponse)
 def get_exercise_by_id(
     exercise_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user_id: int = Depends(get_current_user_id),
+    fields: Optional[FrozenSet[str]] = Depends(requested_fields),
 ):
-    exercise = db.query(Exercise).filter(Exercise.id == exercise_id).first()
-    if not exercise:
+    """
+    Retrieve a single exercise. Concurrent requests for the same exercise (and fieldset) share
+    one load of the row and its aggregates; only the caller's flags are looked up per request.
+    Users who wrote recently load it themselves, since a shared load may have started before
+    their write committed.
+    """
+    write_behind.settle(current_user_id)
+    selected = exercise_queries.resolve(fields)
+    shared_fields = selected - exercise_queries.MEMBERSHIP_FIELDS
+    if primary_pins.is_pinned(current_user_id):
+        snapshot = _exercise_snapshot(db, exercise_id, shared_fields)
+    else:
+        snapshot = exercise_reads.do(
+            (exercise_id, shared_fields), lambda: _exercise_snapshot(db, exercise_id, shared_fields)
+        )
+    if snapshot is None:
         raise HTTPException(status_code=404, detail="Exercise not found")
-    if not exercise.is_public and exercise.owner_id != current_user_id:
+    if not snapshot["is_public"] and snapshot["owner_id"] != current_user_id:
         raise HTTPException(status_code=403, detail="Not authorized to view this exercise")
 
-    favorite_count = db.query(func.count(distinct(Favorite.id))).filter(Favorite.exercise_id == exercise_id).scalar()
-    save_count = db.query(func.count(distinct(Saved.id))).filter(Saved.exercise_id == exercise_id).scalar()
-    avg_rating = db.query(func.avg(Rating.rating)).filter(Rating.exercise_id == exercise_id).scalar() or 0.0
+    item = dict(snapshot)
+    if selected & exercise_queries.MEMBERSHIP_FIELDS:
+        favorited, saved = membership.cache.lookup(db, current_user_id, [exercise_id])
+        item["user_has_favorited"] = exercise_id in favorited
+        item["user_has_saved"] = exercise_id in saved
 
-    user_has_favorited = bool(
-        db.query(Favorite)
-        .filter(Favorite.exercise_id == exercise_id, Favorite.user_id == current_user_id)
-        .first()
-    )
-    user_has_saved = bool(
-        db.query(Saved)
-        .filter(Saved.exercise_id == exercise_id, Saved.user_id == current_user_id)
-        .first()
-    )
-
-    return ExerciseResponse(
-        id=exercise.id,
-        name=exercise.name,
-        description=exercise.description,
-        difficulty=exercise.difficulty,
-        is_public=exercise.is_public,
-        owner_id=exercise.owner_id,
-        favorite_count=favorite_count,
-        save_count=save_count,
-        user_has_favorited=user_has_favorited,
-        user_has_saved=user_has_saved,
-        average_rating=round(avg_rating, 2),
-        video_url=exercise.video_url
-
-    )
+    return exercise_response({name: item[name] for name in EXERCISE_FIELDS if name in selected})
 
 @router.put("/{exercise_id}", response_model=ExerciseResponse)
 def update_exercise(
     exercise_id: int,
     exercise_update: ExerciseUpdate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_write_db),
     current_user_id: int = Depends(get_current_user_id),
 ):
     """
@@ -212,26 +284,26 @@ def update_exercise(
     if exercise.owner_id != current_user_id:
         raise HTTPException(status_code=403, detail="Not authorized to update this exercise")
 
+    was_public = exercise.is_public
     for field, value in exercise_update.dict(exclude_unset=True).items():
         setattr(exercise, field, value)
 
+    changes.record(db, "exercise", exercise, was_public=was_public)
     db.commit()
     db.refresh(exercise)
+    leaderboard.set_visibility(exercise.id, exercise.is_public)
+    autocomplete.index.put(exercise.id, exercise.name, exercise.owner_id, exercise.is_public)
+    if not exercise.is_public:
+        similarity.index.exclude(exercise.id)
 
-    favorite_count = db.query(func.count(distinct(Favorite.id))).filter(Favorite.exercise_id == exercise.id).scalar()
-    save_count = db.query(func.count(distinct(Saved.id))).filter(Saved.exercise_id == exercise.id).scalar()
-    avg_rating = db.query(func.avg(Rating.rating)).filter(Rating.exercise_id == exercise.id).scalar() or 0.0
+    counts = exercise_queries.aggregates(db, [exercise.id], exercise_queries.AGGREGATE_FIELDS)
+    favorite_count = counts["favorite_count"].get(exercise.id, 0)
+    save_count = counts["save_count"].get(exercise.id, 0)
+    avg_rating = counts["average_rating"].get(exercise.id, 0.0)
 
-    user_has_favorited = bool(
-        db.query(Favorite)
-        .filter(Favorite.exercise_id == exercise.id, Favorite.user_id == current_user_id)
-        .first()
-    )
-    user_has_saved = bool(
-        db.query(Saved)
-        .filter(Saved.exercise_id == exercise.id, Saved.user_id == current_user_id)
-        .first()
-    )
+    favorited, saved = membership.cache.lookup(db, current_user_id, [exercise.id])
+    user_has_favorited = exercise.id in favorited
+    user_has_saved = exercise.id in saved
 
     return ExerciseResponse(
         id=exercise.id,
@@ -253,7 +325,7 @@ def update_exercise(
 @router.delete("/{exercise_id}", status_code=204)
 def delete_exercise(
     exercise_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_write_db),
     current_user_id: int = Depends(get_current_user_id),
 ):
     """
@@ -267,36 +339,96 @@ def delete_exercise(
     if exercise.owner_id != current_user_id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this exercise")
 
+    # Favorite/Saved/Rating have no ORM relationship to Exercise and SQLite doesn't enforce
+    # foreign keys, so delete the interaction rows set-based in the same transaction
+    affected_users = {
+        user_id
+        for (user_id,) in db.query(Favorite.user_id).filter(Favorite.exercise_id == exercise_id)
+        .union(db.query(Saved.user_id).filter(Saved.exercise_id == exercise_id))
+    }
+    for model in (Favorite, Saved, Rating):
+        db.query(model).filter(model.exercise_id == exercise_id).delete(synchronize_session=False)
+    changes.record(db, "exercise", exercise, deleted=True)
     db.delete(exercise)
     db.commit()
+    for user_id in affected_users:
+        membership.cache.invalidate(user_id)
+    leaderboard.remove_exercise(exercise_id)
+    autocomplete.index.remove(exercise_id)
+    similarity.index.exclude(exercise_id)
+    video_storage.store.delete(exercise_id)
+
+@router.get("/{exercise_id}/similar")
+def get_similar_exercises(
+    exercise_id: int,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_read_db),
+    current_user_id: int = Depends(get_current_user_id),
+):
+    """
+    Public exercises most often favorited/saved by the same users, from the precomputed index.
+    """
+    exercise = db.query(Exercise.is_public, Exercise.owner_id).filter(Exercise.id == exercise_id).first()
+    if not exercise:
+        raise HTTPException(status_code=404, detail="Exercise not found")
+    if not exercise.is_public and exercise.owner_id != current_user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to view this exercise")
+    return similarity.index.similar(exercise_id, limit)
 
 @router.get("/{exercise_id}/users")
 def get_users_for_exercise(
     exercise_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user_id: int = Depends(get_current_user_id),
+    kind: Optional[str] = Query(None, regex="^(favorited|saved)$"),
+    limit: int = Query(50, ge=1, le=500),
+    favorited_after: Optional[int] = Query(None, ge=0),
+    saved_after: Optional[int] = Query(None, ge=0),
+    totals_only: bool = Query(False),
 ):
+    """
+    List the users who favorited and/or saved an exercise.
+
+    Each list is paginated independently with a keyset cursor on the user id: pass the
+    returned `favorited_next_cursor` / `saved_next_cursor` back as `favorited_after` /
+    `saved_after`. Use `kind` to fetch only one of the lists and `totals_only=true` to
+    get just the counts.
+    """
+    write_behind.settle(current_user_id)
     exercise = db.query(Exercise).filter(Exercise.id == exercise_id).first()
     if not exercise:
         raise HTTPException(status_code=404, detail="Exercise not found")
     if not exercise.is_public and exercise.owner_id != current_user_id:
         raise HTTPException(status_code=403, detail="Not authorized to view this exercise")
 
-    favorited_users = (
-        db.query(User.id, User.username)
-        .join(Favorite, Favorite.user_id == User.id)
-        .filter(Favorite.exercise_id == exercise_id)
-        .all()
-    )
+    lists = {
+        "favorited": (Favorite, favorited_after, "favorited_by", "favorite_count"),
+        "saved": (Saved, saved_after, "saved_by", "save_count"),
+    }
 
-    saved_users = (
-        db.query(User.id, User.username)
-        .join(Saved, Saved.user_id == User.id)
-        .filter(Saved.exercise_id == exercise_id)
-        .all()
-    )
+    response = {}
+    for list_kind, (model, after, list_key, count_key) in lists.items():
+        if kind is not None and kind != list_kind:
+            continue
+
+        if totals_only:
+            response[count_key] = (
+                db.query(func.count(model.id)).filter(model.exercise_id == exercise_id).scalar()
+            )
+            continue
+
+        query = (
+            db.query(User.id, User.username)
+            .join(model, model.user_id == User.id)
+            .filter(model.exercise_id == exercise_id)
+        )
+        if after is not None:
+            query = query.filter(model.user_id > after)
+        # Fetch one extra row to know whether there is a next page
+        rows = query.order_by(model.user_id).limit(limit + 1).all()
+
+        page = rows[:limit]
+        response[list_key] = [{"id": user_id, "username": username} for user_id, username in page]
+        response[f"{list_kind}_next_cursor"] = page[-1][0] if len(rows) > limit else None
 
-    return {
-        "favorited_by": favorited_users,
-        "saved_by": saved_users
-    }
\ No newline at end of file
+    return response
@@ -1,67 +1,90 @@
 """
 Handles operations relating to favoriting exercises: favorite, unfavorite, list
 """
+from datetime import datetime
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import List
-from app.db.database import get_db
-from app.db.models import Favorite, Exercise
+from typing import FrozenSet, List, Optional
+from app.db.database import get_read_db, get_write_db
+from app.db.models import Favorite
 from app.core.security import get_current_user_id
-from app.schemas.exercise import ExerciseResponse
+from app.schemas.exercise import ExerciseResponse, requested_fields, exercise_response
+from app.core import firestore_counters, leaderboard, membership
+from app.core.config import settings
+from app.db import changes, exercise_queries, statements, write_behind
 
 router = APIRouter(prefix="/favorites", tags=["Favorites"])
 
 
 @router.get("/", response_model=List[ExerciseResponse])
 def list_favorites(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user_id: int = Depends(get_current_user_id),
+    fields: Optional[FrozenSet[str]] = Depends(requested_fields),
 ):
-    favorites = (
-        db.query(Exercise)
-        .join(Favorite, Favorite.exercise_id == Exercise.id)
-        .filter(Favorite.user_id == current_user_id)
-        .all()
-    )
-    return favorites
+    """
+    List the user's favorited exercises, with only the requested `fields` if given.
+    """
+    write_behind.settle(current_user_id)
+    selected = exercise_queries.resolve(fields)
+    rows = db.execute(exercise_queries.favorites_statement(selected), {"user_id": current_user_id}).all()
+    return exercise_response(exercise_queries.hydrate(db, rows, selected, current_user_id))
 
 
 @router.post("/{exercise_id}", status_code=204)
 def favorite_exercise(
     exercise_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_write_db),
     current_user_id: int = Depends(get_current_user_id),
 ):
-    existing = db.query(Favorite).filter(
-        Favorite.user_id == current_user_id,
-        Favorite.exercise_id == exercise_id
-    ).first()
+    if settings.WRITE_BEHIND_ENABLED:
+        # Acknowledge now; the final state is committed with the next batch
+        write_behind.queue.submit("favorite", current_user_id, exercise_id, True)
+        return
+
+    params = {"user_id": current_user_id, "exercise_id": exercise_id}
+    existing = db.execute(statements.INTERACTION[Favorite], params).scalars().first()
 
     if existing:
         raise HTTPException(status_code=400, detail="Already favorited")
 
-    exercise = db.query(Exercise).filter(Exercise.id == exercise_id).first()
+    exercise = db.execute(statements.EXERCISE_VISIBILITY, params).first()
     if not exercise:
         raise HTTPException(status_code=404, detail="Exercise not found")
 
-    favorite = Favorite(user_id=current_user_id, exercise_id=exercise_id)
+    created_at = datetime.utcnow()
+    favorite = Favorite(user_id=current_user_id, exercise_id=exercise_id, created_at=created_at)
     db.add(favorite)
+    changes.record(db, "favorite", exercise, user_id=current_user_id)
     db.commit()
+    membership.cache.invalidate(current_user_id)
+    leaderboard.record_event("favorite", exercise_id, created_at)
+    firestore_counters.record("favorite", exercise_id)
 
 
 @router.delete("/{exercise_id}", status_code=204)
 def unfavorite_exercise(
     exercise_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_write_db),
     current_user_id: int = Depends(get_current_user_id),
 ):
-    favorite = db.query(Favorite).filter(
-        Favorite.user_id == current_user_id,
-        Favorite.exercise_id == exercise_id
-    ).first()
+    if settings.WRITE_BEHIND_ENABLED:
+        write_behind.queue.submit("favorite", current_user_id, exercise_id, False)
+        return
+
+    params = {"user_id": current_user_id, "exercise_id": exercise_id}
+    favorite = db.execute(statements.INTERACTION[Favorite], params).scalars().first()
 
     if not favorite:
         raise HTTPException(status_code=404, detail="Favorite not found")
 
+    created_at = favorite.created_at
     db.delete(favorite)
+    exercise = db.execute(statements.EXERCISE_VISIBILITY, params).first()
+    if exercise:
+        changes.record(db, "favorite", exercise, user_id=current_user_id, deleted=True)
     db.commit()
+    membership.cache.invalidate(current_user_id)
+    leaderboard.record_event("favorite", exercise_id, created_at, removed=True)
+    firestore_counters.record("favorite", exercise_id, removed=True)
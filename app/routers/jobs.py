@@ -0,0 +1,71 @@
+"""
+Status and cancellation of background jobs (app/db/jobs.py).
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from sqlalchemy.orm import Session
+
+from app.core.security import get_optional_user_id, require_admin
+from app.db import jobs
+from app.db.database import get_db
+from app.db.models import Job
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+def start_job(kind: str, params: dict = None, user_id: int = None) -> dict:
+    """
+    Queue a job for a 202 response: its id and where to poll it.
+    """
+    try:
+        job_id = jobs.runner.submit(kind, params, user_id)
+    except jobs.QueueFull:
+        raise HTTPException(status_code=503, detail="Too many jobs waiting, retry later", headers={"Retry-After": "30"})
+    return {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}
+
+
+def _visible_job(db: Session, job_id: int, user_id: Optional[int], x_admin_token: str) -> Job:
+    """
+    The job if the caller may see it: their own jobs, or with the admin token the jobs started
+    without a user (admin operations). Anything else is reported as not found.
+    """
+    job = db.get(Job, job_id)
+    if job is not None and job.created_by is None:
+        try:
+            require_admin(x_admin_token)
+        except HTTPException:
+            job = None
+    if job is None or (job.created_by is not None and job.created_by != user_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/{job_id}")
+def get_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user_id: Optional[int] = Depends(get_optional_user_id),
+    x_admin_token: str = Header(""),
+):
+    """
+    A job's status, progress (processed of total), throughput, estimated time remaining and,
+    once finished, its result or error. Admin jobs need the X-Admin-Token header.
+    """
+    return jobs.to_dict(_visible_job(db, job_id, current_user_id, x_admin_token))
+
+
+@router.post("/{job_id}/cancel", status_code=202)
+def cancel_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user_id: Optional[int] = Depends(get_optional_user_id),
+    x_admin_token: str = Header(""),
+):
+    """
+    Cancel a job. Queued jobs are cancelled at once; running ones stop at their next progress
+    update, so poll until the status is "cancelled".
+    """
+    _visible_job(db, job_id, current_user_id, x_admin_token)
+    return jobs.to_dict(jobs.runner.cancel(job_id))
@@ -4,34 +4,80 @@ Provides an endpoint to migrate local SQLite exercise data to Firestore.
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from app.db.database import get_db
+from app.db.database import SessionLocal, get_db
 from app.db.models import Exercise
 from app.firebase_setup import db_firestore  # Firestore client
-from app.schemas.exercise import ExerciseResponse
+from app.core.metrics import firestore_call
+from app.core import firestore_counters
+from app.core.config import settings
+from app.core.security import get_current_user_id
+from app.db import exercise_queries, jobs
+from app.routers.jobs import start_job
 
 router = APIRouter(prefix="/migrate", tags=["Migrate"])
 
-@router.post("/exercises", status_code=200)
-def migrate_exercises(db: Session = Depends(get_db)):
-    
-    # Migrate all exercises from local SQLite to Firestore.
-    exercises_local = db.query(Exercise).all()
-    if not exercises_local:
+# Exercises loaded (with their counts) per query while migrating
+MIGRATE_BATCH_SIZE = 500
+
+EXPORTED_COLUMNS = (
+    Exercise.id, Exercise.name, Exercise.description, Exercise.difficulty,
+    Exercise.is_public, Exercise.owner_id, Exercise.video_url,
+)
+
+@jobs.handler("migrate_exercises")
+def migrate_exercises_job(context: jobs.JobContext):
+    """
+    Copy every exercise from SQLite to Firestore, one progress step per exercise.
+    """
+    db = SessionLocal()
+    try:
+        context.set_total(db.query(Exercise).count())
+        last_id = 0
+        while True:
+            batch = (
+                db.query(*EXPORTED_COLUMNS)
+                .filter(Exercise.id > last_id)
+                .order_by(Exercise.id)
+                .limit(MIGRATE_BATCH_SIZE)
+                .all()
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            # Real counts, so cloud reads and the sharded counters start from the SQLite totals
+            counts = exercise_queries.aggregates(db, [ex.id for ex in batch], exercise_queries.AGGREGATE_FIELDS)
+            db.rollback()  # don't keep a read transaction open while talking to Firestore
+            for ex in batch:
+                totals = {
+                    "favorite_count": int(counts["favorite_count"].get(ex.id, 0)),
+                    "save_count": int(counts["save_count"].get(ex.id, 0)),
+                }
+                doc_data = {
+                    "id": int(ex.id),
+                    "name": str(ex.name),
+                    "description": str(ex.description),
+                    "difficulty": int(ex.difficulty),
+                    "is_public": bool(ex.is_public),
+                    "owner_id": int(ex.owner_id),
+                    **totals,
+                    "average_rating": float(counts["average_rating"].get(ex.id, 0.0)),
+                    "video_url": str(ex.video_url)
+                }
+                with firestore_call("exercises.set"):
+                    db_firestore.collection('exercises').document(str(ex.id)).set(doc_data)
+                if settings.FIRESTORE_COUNTERS_ENABLED:
+                    firestore_counters.store.seed(ex.id, totals)
+                context.advance()
+    finally:
+        db.close()
+    return {"migrated": context.processed}
+
+@router.post("/exercises", status_code=202)
+def migrate_exercises(db: Session = Depends(get_db), current_user_id: int = Depends(get_current_user_id)):
+    """
+    Start migrating all exercises from local SQLite to Firestore as a background job.
+    Poll GET /jobs/{job_id} for progress.
+    """
+    if db.query(Exercise.id).first() is None:
         raise HTTPException(status_code=404, detail="No exercises found to migrate")
-    
-    for ex in exercises_local:
-        doc_data = {
-            "id": int(ex.id),
-            "name": str(ex.name),
-            "description": str(ex.description),
-            "difficulty": int(ex.difficulty),
-            "is_public": bool(ex.is_public),
-            "owner_id": int(ex.owner_id),
-            "favorite_count": int(0),
-            "save_count": int(0),
-            "average_rating": float(0.0),
-            "video_url": str(ex.video_url)
-        }
-        db_firestore.collection('exercises').document(str(ex.id)).set(doc_data)
-    
-    return {"message": "Migration successful"}
+    return start_job("migrate_exercises", user_id=current_user_id)
@@ -2,12 +2,16 @@
 Endpoints to rate an exercise from 1-5.
 """
 
+from datetime import datetime
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from app.db.database import get_db
+from app.db.database import get_write_db
 from app.db.models import Rating, Exercise
 from app.schemas.rating import RateExerciseRequest
 from app.core.security import get_current_user_id
+from app.core import leaderboard
+from app.db import changes
 
 router = APIRouter(prefix="/ratings", tags=["Ratings"])
 # Endpoint to rate an exercise
@@ -15,7 +19,7 @@ router = APIRouter(prefix="/ratings", tags=["Ratings"])
 def rate_exercise(
     exercise_id: int,
     req: RateExerciseRequest,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_write_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
     # Get the current exercise
@@ -33,6 +37,11 @@ def rate_exercise(
         existing_rating.rating = req.rating
     # Otherwise, create a rating
     else:
-        new_rating = Rating(user_id=current_user_id, exercise_id=exercise_id, rating=req.rating)
+        created_at = datetime.utcnow()
+        new_rating = Rating(user_id=current_user_id, exercise_id=exercise_id, rating=req.rating, created_at=created_at)
         db.add(new_rating)
+    changes.record(db, "rating", exercise, user_id=current_user_id)
     db.commit()
+    # Only a first rating counts as a new popularity event
+    if not existing_rating:
+        leaderboard.record_event("rating", exercise_id, created_at)
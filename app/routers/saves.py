@@ -2,55 +2,77 @@
 Endpoints for saving/unsaving an exercise.
 """
 
+from datetime import datetime
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from app.db.database import get_db
-from app.db.models import Saved, Exercise
+from app.db.database import get_write_db
+from app.db.models import Saved
 from app.core.security import get_current_user_id
+from app.core import firestore_counters, leaderboard, membership
+from app.core.config import settings
+from app.db import changes, statements, write_behind
 
 router = APIRouter(prefix="/saves", tags=["Saves"])
 
 @router.post("/{exercise_id}", status_code=204)
 def save_exercise(
     exercise_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_write_db),
     current_user_id: int = Depends(get_current_user_id),
 ):
     """
     Save an exercise for the authenticated user.
     """
-    exercise = db.query(Exercise).filter(Exercise.id == exercise_id).first()
+    if settings.WRITE_BEHIND_ENABLED:
+        # Acknowledge now; the final state is committed with the next batch
+        write_behind.queue.submit("save", current_user_id, exercise_id, True)
+        return
+
+    params = {"user_id": current_user_id, "exercise_id": exercise_id}
+    exercise = db.execute(statements.EXERCISE_VISIBILITY, params).first()
     if not exercise:
         raise HTTPException(status_code=404, detail="Exercise not found")
 
-    existing = db.query(Saved).filter(
-        Saved.user_id == current_user_id,
-        Saved.exercise_id == exercise_id
-    ).first()
+    existing = db.execute(statements.INTERACTION[Saved], params).scalars().first()
 
     if existing:
         raise HTTPException(status_code=400, detail="Already saved")
 
-    new_save = Saved(user_id=current_user_id, exercise_id=exercise_id)
+    created_at = datetime.utcnow()
+    new_save = Saved(user_id=current_user_id, exercise_id=exercise_id, created_at=created_at)
     db.add(new_save)
+    changes.record(db, "save", exercise, user_id=current_user_id)
     db.commit()
+    membership.cache.invalidate(current_user_id)
+    leaderboard.record_event("save", exercise_id, created_at)
+    firestore_counters.record("save", exercise_id)
 
 @router.delete("/{exercise_id}", status_code=204)
 def unsave_exercise(
     exercise_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_write_db),
     current_user_id: int = Depends(get_current_user_id),
 ):
     """
     Unsave an exercise for the authenticated user.
     """
-    saved_record = db.query(Saved).filter(
-        Saved.user_id == current_user_id,
-        Saved.exercise_id == exercise_id
-    ).first()
+    if settings.WRITE_BEHIND_ENABLED:
+        write_behind.queue.submit("save", current_user_id, exercise_id, False)
+        return
+
+    params = {"user_id": current_user_id, "exercise_id": exercise_id}
+    saved_record = db.execute(statements.INTERACTION[Saved], params).scalars().first()
 
     if not saved_record:
         raise HTTPException(status_code=404, detail="Save record not found")
 
+    created_at = saved_record.created_at
     db.delete(saved_record)
+    exercise = db.execute(statements.EXERCISE_VISIBILITY, params).first()
+    if exercise:
+        changes.record(db, "save", exercise, user_id=current_user_id, deleted=True)
     db.commit()
+    membership.cache.invalidate(current_user_id)
+    leaderboard.record_event("save", exercise_id, created_at, removed=True)
+    firestore_counters.record("save", exercise_id, removed=True)
@@ -0,0 +1,104 @@
+"""
+Delta sync for offline clients: everything that changed since a version the client already has.
+"""
+
+from typing import Dict, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from app.core import membership
+from app.core.security import get_current_user_id
+from app.db import exercise_queries, maintenance, write_behind
+from app.db.database import get_read_db
+from app.db.models import Change, Exercise, Rating
+
+router = APIRouter(prefix="/sync", tags=["Sync"])
+
+
+@router.get("/")
+def sync(
+    since: Optional[int] = Query(None, ge=0),
+    limit: int = Query(500, ge=1, le=1000),
+    db: Session = Depends(get_read_db),
+    current_user_id: int = Depends(get_current_user_id),
+):
+    """
+    Changes after version `since`, oldest first, at most `limit` change-log entries per page.
+
+    Without `since` only the current version is returned: clients do a full pull
+    (GET /exercises/) and then sync from that version. Each key (an exercise, or one of the
+    caller's favorites/saves/ratings) appears at most once per page with its current state;
+    deleted exercises, unfavorites and unsaves come back as `"deleted": true` tombstones.
+    Keep requesting with `since=next_since` while `has_more` is true.
+
+    Entries older than CHANGES_RETENTION_DAYS are pruned; a `since` from before the retained
+    log gets 410 and the client has to do a full pull again.
+    """
+    write_behind.settle(current_user_id)
+    if since is None:
+        current = db.query(func.max(Change.version)).scalar() or 0
+        return {"changes": [], "next_since": current, "has_more": False}
+    if since < maintenance.oldest_complete_version(db):
+        raise HTTPException(status_code=410, detail="Full resync required")
+
+    # A range scan on the primary key: a client that is up to date costs one empty query
+    entries = (
+        db.query(Change.version, Change.entity, Change.exercise_id, Change.user_id)
+        .filter(Change.version > since)
+        .filter(or_(Change.public == True, Change.owner_id == current_user_id, Change.user_id == current_user_id))
+        .order_by(Change.version)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    if not entries:
+        return {"changes": [], "next_since": since, "has_more": False}
+
+    # Collapse to the latest version per key. Anyone's favorite/save/rating changes the
+    # exercise's counts; the caller's own also change their flags or rating.
+    latest: Dict[Tuple[str, int], int] = {}
+    for version, entity, exercise_id, user_id in entries:
+        latest[("exercise", exercise_id)] = version
+        if entity != "exercise" and user_id == current_user_id:
+            latest[(entity, exercise_id)] = version
+
+    exercise_ids = [exercise_id for (kind, exercise_id) in latest if kind == "exercise"]
+    rows = (
+        db.query(*exercise_queries.columns(exercise_queries.ALL_FIELDS))
+        .filter(Exercise.id.in_(exercise_ids))
+        .filter((Exercise.is_public == True) | (Exercise.owner_id == current_user_id))
+        .all()
+    )
+    exercises = {
+        item["id"]: item
+        for item in exercise_queries.hydrate(db, rows, exercise_queries.ALL_FIELDS, current_user_id)
+    }
+    favorited, saved = membership.cache.lookup(
+        db, current_user_id, [exercise_id for (kind, exercise_id) in latest if kind in ("favorite", "save")]
+    )
+    rated_ids = [exercise_id for (kind, exercise_id) in latest if kind == "rating"]
+    ratings = dict(
+        db.query(Rating.exercise_id, Rating.rating)
+        .filter(Rating.user_id == current_user_id, Rating.exercise_id.in_(rated_ids))
+    ) if rated_ids else {}
+
+    changes = []
+    for (kind, exercise_id), version in sorted(latest.items(), key=lambda item: item[1]):
+        if kind == "exercise":
+            item = exercises.get(exercise_id)
+            # Deleted, or no longer visible to the caller (made private)
+            change = {"type": "exercise", "id": exercise_id, "deleted": item is None}
+            if item is not None:
+                change["data"] = item
+        elif kind == "rating":
+            change = {"type": "rating", "exercise_id": exercise_id, "rating": ratings.get(exercise_id)}
+        else:
+            current = favorited if kind == "favorite" else saved
+            change = {"type": kind, "exercise_id": exercise_id, "deleted": exercise_id not in current}
+        change["version"] = version
+        changes.append(change)
+
+    return {"changes": changes, "next_since": entries[-1].version, "has_more": has_more}
@@ -0,0 +1,179 @@
+"""
+Exercise videos on local disk: upload, stream (with Range/ETag support) and delete.
+"""
+
+from datetime import timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from jose import JWTError
+from sqlalchemy.orm import Session
+
+from app.core import file_ranges, video_storage
+from app.core.config import settings
+from app.core.security import create_video_token, decode_jwt, get_current_user_id
+from app.db import changes, statements
+from app.db.database import ReadSessionLocal, SessionLocal, get_write_db, primary_pins
+from app.db.models import Exercise
+
+router = APIRouter(prefix="/videos", tags=["Videos"])
+
+
+def _viewer_id(request: Request, exercise_id: int) -> Optional[int]:
+    """
+    The caller's user id, from an access token in the Authorization header or, since `<video>`
+    elements can't set headers, a video token for this exercise in the `token` query parameter.
+    Access tokens are never accepted in the URL, where logs and browser history would keep them.
+    """
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        token, scope = authorization[7:], "access_token"
+    else:
+        token, scope = request.query_params.get("token"), "video"
+    if not token:
+        return None
+    try:
+        payload = decode_jwt(token)
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    if payload.get("scope") != scope or (scope == "video" and payload.get("exercise_id") != exercise_id):
+        raise HTTPException(status_code=401, detail="Invalid token scope")
+    return int(payload.get("sub"))
+
+
+def _check_visible(exercise_id: int, user_id: Optional[int]):
+    db = ReadSessionLocal()
+    try:
+        exercise = db.execute(statements.EXERCISE_VISIBILITY, {"exercise_id": exercise_id}).first()
+    finally:
+        db.close()
+    if exercise is None:
+        raise HTTPException(status_code=404, detail="Exercise not found")
+    if not exercise.is_public and exercise.owner_id != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to view this exercise")
+
+
+def _check_owner(exercise_id: int, user_id: int):
+    db = SessionLocal()
+    try:
+        exercise = db.execute(statements.EXERCISE_VISIBILITY, {"exercise_id": exercise_id}).first()
+    finally:
+        db.close()
+    if exercise is None:
+        raise HTTPException(status_code=404, detail="Exercise not found")
+    if exercise.owner_id != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to update this exercise")
+
+
+def _set_video_url(exercise_id: int, video_url: str):
+    db = SessionLocal()
+    try:
+        exercise = db.get(Exercise, exercise_id)
+        if exercise is None:
+            # Deleted while the upload was running
+            video_storage.store.delete(exercise_id)
+            raise HTTPException(status_code=404, detail="Exercise not found")
+        exercise.video_url = video_url
+        changes.record(db, "exercise", exercise)
+        db.commit()
+    finally:
+        db.close()
+
+
+@router.put("/{exercise_id}")
+async def upload_video(
+    exercise_id: int,
+    request: Request,
+    current_user_id: int = Depends(get_current_user_id),
+):
+    """
+    Store the request body as the exercise's video and point its `video_url` at
+    GET /videos/{exercise_id}. Send the raw file with its Content-Type (video/mp4, video/webm,
+    video/ogg or video/quicktime). Only the owner can upload; a new upload replaces the old video.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type not in video_storage.CONTENT_TYPES:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Content-Type must be one of {', '.join(sorted(video_storage.CONTENT_TYPES))}",
+        )
+    await run_in_threadpool(_check_owner, exercise_id, current_user_id)
+
+    try:
+        size = await video_storage.store.save(
+            exercise_id, content_type, request.stream(), settings.VIDEO_MAX_UPLOAD_BYTES
+        )
+    except video_storage.UploadTooLarge:
+        raise HTTPException(status_code=413, detail=f"Videos are limited to {settings.VIDEO_MAX_UPLOAD_BYTES} bytes")
+
+    video_url = str(request.url_for("stream_video", exercise_id=exercise_id))
+    await run_in_threadpool(_set_video_url, exercise_id, video_url)
+    primary_pins.pin(current_user_id)
+    return {"video_url": video_url, "size": size, "content_type": content_type}
+
+
+@router.post("/{exercise_id}/token")
+def create_stream_token(exercise_id: int, request: Request, current_user_id: int = Depends(get_current_user_id)):
+    """
+    A short-lived URL for streaming this exercise's video in a `<video>` element. Its token is
+    only valid for this video, so the URL can end up in logs without exposing the account.
+    """
+    _check_visible(exercise_id, current_user_id)
+    token = create_video_token(
+        str(current_user_id), exercise_id, timedelta(seconds=settings.VIDEO_TOKEN_EXPIRE_SECONDS)
+    )
+    url = request.url_for("stream_video", exercise_id=exercise_id).include_query_params(token=token)
+    return {"url": str(url), "expires_in": settings.VIDEO_TOKEN_EXPIRE_SECONDS}
+
+
+@router.api_route("/{exercise_id}", methods=["GET", "HEAD"])
+async def stream_video(exercise_id: int, request: Request):
+    """
+    Stream an exercise's video. Supports `Range` (206 Partial Content), `If-Range` and
+    `If-None-Match`. Videos of private exercises need the owner's access token in the
+    Authorization header, or a video token from POST /videos/{exercise_id}/token.
+    """
+    user_id = _viewer_id(request, exercise_id)
+    await run_in_threadpool(_check_visible, exercise_id, user_id)
+
+    found = video_storage.store.find(exercise_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Video not found")
+    path, media_type = found
+
+    if settings.VIDEO_ACCEL_REDIRECT_PREFIX:
+        # The proxy serves the file itself (sendfile, ranges, validators); no app worker is held
+        location = settings.VIDEO_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + video_storage.store.filename(path)
+        return Response(headers={"X-Accel-Redirect": location}, media_type=media_type)
+
+    try:
+        return file_ranges.file_response(request, path, media_type)
+    except FileNotFoundError:
+        # Replaced or deleted between the lookup and the stat
+        raise HTTPException(status_code=404, detail="Video not found")
+
+
+@router.delete("/{exercise_id}", status_code=204)
+def delete_video(
+    exercise_id: int,
+    request: Request,
+    db: Session = Depends(get_write_db),
+    current_user_id: int = Depends(get_current_user_id),
+):
+    """
+    Remove an exercise's locally stored video. Only the owner can delete it.
+    """
+    exercise = db.query(Exercise).filter(Exercise.id == exercise_id).first()
+    if not exercise:
+        raise HTTPException(status_code=404, detail="Exercise not found")
+    if exercise.owner_id != current_user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to update this exercise")
+
+    if not video_storage.store.delete(exercise_id):
+        raise HTTPException(status_code=404, detail="Video not found")
+    if exercise.video_url == str(request.url_for("stream_video", exercise_id=exercise_id)):
+        exercise.video_url = ""
+        changes.record(db, "exercise", exercise)
+        db.commit()
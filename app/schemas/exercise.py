@@ -2,8 +2,10 @@
 Pydantic schemas for Exercises.
 """
 
+from fastapi import HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import FrozenSet, Optional
 
 class ExerciseBase(BaseModel):
     
@@ -40,7 +42,35 @@ class ExerciseResponse(ExerciseBase):
     user_has_saved: bool = False     
     video_url: Optional[str] = None
 
+# Field names a client can select with ?fields=, in response order
+EXERCISE_FIELDS = tuple(ExerciseResponse.__fields__)
 
+def requested_fields(
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated subset of exercise fields to return, e.g. 'id,name,difficulty'",
+    )
+) -> Optional[FrozenSet[str]]:
+    """
+    Dependency parsing the sparse fieldset parameter. Returns None when all fields are wanted.
+    The id is always included.
+    """
+    if fields is None:
+        return None
+    names = frozenset(name.strip() for name in fields.split(",") if name.strip())
+    unknown = names - set(EXERCISE_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return names | {"id"}
+
+def exercise_response(content):
+    """
+    Encode exercise dicts built by app/db/exercise_queries.py with orjson. They already hold
+    exactly the (requested) ExerciseResponse fields, so returning a Response skips FastAPI's
+    second validation and encoding pass through the endpoint's response_model, which would
+    also reject sparse fieldsets that leave out required fields.
+    """
+    return ORJSONResponse(content=content)
 
 class Config:
     orm_mode = True
@@ -0,0 +1,98 @@
+"""
+Autocomplete latency: the in-memory prefix index (app/core/autocomplete.py) versus a LIKE scan
+over exercises.name, on a throwaway SQLite database of synthetic exercise names.
+
+Each query is a 1-6 character prefix of a random word, like the requests a search box sends
+while someone types. Reports p50/p99 per query and the index build time. The LIKE scan only
+returns the first ten matches it finds; the index also ranks them by popularity.
+
+Run from the repository root:
+    python -m benchmarks.autocomplete
+"""
+
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, or_
+from sqlalchemy.orm import sessionmaker
+
+from app.core.autocomplete import PrefixIndex
+from app.db.database import Base
+from app.db.models import Exercise
+
+EXERCISES = 100_000
+QUERIES = 2000
+WORDS = (
+    "barbell dumbbell kettlebell cable band single leg arm split front back overhead incline decline "
+    "seated standing walking reverse lateral bulgarian goblet sumo romanian squat lunge press row curl "
+    "raise deadlift pull push plank bridge extension fly dip crunch twist hold stretch jump step"
+).split()
+
+
+def seed(session, rng: random.Random):
+    session.bulk_insert_mappings(Exercise, [
+        {
+            "name": " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))).title(),
+            "description": "",
+            "difficulty": 1,
+            "is_public": rng.random() < 0.9,
+            "owner_id": rng.randint(1, 1000),
+        }
+        for _ in range(EXERCISES)
+    ])
+    session.commit()
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return statistics.median(samples) * 1e3, samples[int(len(samples) * 0.99)] * 1e3
+
+
+def like_query(db, prefix: str, user_id: int):
+    return (
+        db.query(Exercise.id, Exercise.name)
+        .filter(or_(Exercise.name.ilike(f"{prefix}%"), Exercise.name.ilike(f"% {prefix}%")))
+        .filter((Exercise.is_public == True) | (Exercise.owner_id == user_id))
+        .limit(10)
+        .all()
+    )
+
+
+def main():
+    rng = random.Random(7)
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    seed(db, rng)
+
+    index = PrefixIndex()
+    start = time.perf_counter()
+    index.rebuild(db)
+    build_seconds = time.perf_counter() - start
+
+    queries = [(rng.choice(WORDS)[:rng.randint(1, 6)], rng.randint(1, 1000)) for _ in range(QUERIES)]
+    timings = {"prefix index": [], "LIKE scan": []}
+    for prefix, user_id in queries:
+        start = time.perf_counter()
+        index.suggest(prefix, user_id, 10)
+        timings["prefix index"].append(time.perf_counter() - start)
+    for prefix, user_id in queries[:200]:
+        start = time.perf_counter()
+        like_query(db, prefix, user_id)
+        timings["LIKE scan"].append(time.perf_counter() - start)
+    db.close()
+    engine.dispose()
+
+    print(f"{EXERCISES} exercises, index built in {build_seconds:.2f} s")
+    print(f"{'variant':<14} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, samples in timings.items():
+        p50, p99 = percentiles(samples)
+        print(f"{name:<14} {p50:>8.3f} {p99:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Share of list-endpoint latency spent serializing, before and after the orjson response path.
+
+Seeds a throwaway SQLite database, then for each page size times:
+  - query: loading and hydrating the page (app/db/exercise_queries.py)
+  - response_model: the previous path, validating every row into ExerciseResponse and encoding
+    through jsonable_encoder + json.dumps (what FastAPI does for a returned list)
+  - orjson: the current path, encoding the hydrated dicts directly
+
+Run from the repository root:
+    python -m benchmarks.serialization
+"""
+
+import json
+import os
+import tempfile
+import timeit
+from typing import List
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import parse_obj_as
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import exercise_queries
+from app.db.database import Base
+from app.db.models import Exercise, Favorite, User
+from app.schemas.exercise import ExerciseResponse
+
+PAGE_SIZES = (10, 50, 500)
+REPEAT = 50
+
+
+def seed(session, exercises: int = 500, users: int = 50):
+    session.add_all(User(username=f"user{i}", hashed_password="x") for i in range(users))
+    session.add_all(
+        Exercise(name=f"Exercise {i}", description="Description " * 10, difficulty=i % 5 + 1,
+                 is_public=True, owner_id=1, video_url=None)
+        for i in range(exercises)
+    )
+    session.flush()
+    session.add_all(
+        Favorite(user_id=u + 1, exercise_id=e + 1) for u in range(users) for e in range(0, exercises, 7)
+    )
+    session.commit()
+
+
+def old_path(items: List[dict]) -> bytes:
+    validated = parse_obj_as(List[ExerciseResponse], items)
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def new_path(items: List[dict]) -> bytes:
+    return orjson.dumps(items)
+
+
+def main():
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    seed(session)
+
+    fields = exercise_queries.ALL_FIELDS
+    print(f"{'rows':>5} {'query ms':>9} {'response_model ms':>18} {'share':>6} {'orjson ms':>10} {'share':>6}")
+    for size in PAGE_SIZES:
+        def load():
+            rows = session.query(*exercise_queries.columns(fields)).limit(size).all()
+            return exercise_queries.hydrate(session, rows, fields, 1)
+
+        items = load()
+        query = timeit.timeit(load, number=REPEAT) / REPEAT * 1000
+        old = timeit.timeit(lambda: old_path(items), number=REPEAT) / REPEAT * 1000
+        new = timeit.timeit(lambda: new_path(items), number=REPEAT) / REPEAT * 1000
+        print(f"{size:>5} {query:>9.3f} {old:>18.3f} {old / (query + old):>6.0%} {new:>10.3f} {new / (query + new):>6.0%}")
+
+    session.close()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Per-request statement overhead on the hot read paths: ORM Query objects rebuilt on every call
+(the previous code) versus the cached statements in app/db/statements.py and
+app/db/exercise_queries.py.
+
+One "request" is an exercise list page: the visible page, the three aggregate lookups and the
+user's membership load. Besides wall time, the script reports the time spent building the
+statements and the keys SQLAlchemy looks them up by in its compiled cache; with cached
+statements only the key lookup is left.
+
+Run from the repository root:
+    python -m benchmarks.statements
+"""
+
+import os
+import tempfile
+import timeit
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from app.db import exercise_queries, statements
+from app.db.database import Base
+from app.db.models import Exercise, Favorite, Rating, Saved
+from benchmarks.serialization import seed
+
+REQUESTS = 2000
+FIELDS = exercise_queries.ALL_FIELDS
+
+
+def page_query(db, user_id: int):
+    return (
+        db.query(*exercise_queries.columns(FIELDS))
+        .filter((Exercise.is_public == True) | (Exercise.owner_id == user_id))
+        .offset(0)
+        .limit(10)
+    )
+
+
+def lookup_queries(db, user_id: int, ids) -> list:
+    return [
+        db.query(Favorite.exercise_id, func.count(Favorite.id))
+        .filter(Favorite.exercise_id.in_(ids)).group_by(Favorite.exercise_id),
+        db.query(Saved.exercise_id, func.count(Saved.id))
+        .filter(Saved.exercise_id.in_(ids)).group_by(Saved.exercise_id),
+        db.query(Rating.exercise_id, func.avg(Rating.rating))
+        .filter(Rating.exercise_id.in_(ids)).group_by(Rating.exercise_id),
+    ] + [
+        db.query(model.exercise_id).filter(model.user_id == user_id).order_by(model.exercise_id)
+        for model in (Favorite, Saved)
+    ]
+
+
+def query_statements(db, user_id: int, ids) -> list:
+    return [page_query(db, user_id)] + lookup_queries(db, user_id, ids)
+
+
+def cached_statements(db, user_id: int, ids) -> list:
+    return [
+        exercise_queries.visible_page_statement(FIELDS),
+        statements.FAVORITE_COUNTS,
+        statements.SAVE_COUNTS,
+        statements.AVERAGE_RATINGS,
+        statements.MEMBERSHIP_IDS[Favorite],
+        statements.MEMBERSHIP_IDS[Saved],
+    ]
+
+
+def query_request(db, user_id: int):
+    ids = [row.id for row in page_query(db, user_id)]
+    for query in lookup_queries(db, user_id, ids):
+        query.all()
+
+
+def cached_request(db, user_id: int):
+    rows = db.execute(
+        exercise_queries.visible_page_statement(FIELDS), {"user_id": user_id, "skip": 0, "limit": 10}
+    ).all()
+    exercise_queries.aggregates(db, [row.id for row in rows], exercise_queries.AGGREGATE_FIELDS)
+    for model in (Favorite, Saved):
+        list(db.execute(statements.MEMBERSHIP_IDS[model], {"user_id": user_id}).scalars())
+
+
+def statement_overhead(db, build) -> float:
+    """
+    Microseconds per request spent building the statements and their compiled-cache keys.
+    """
+    def run():
+        for statement in build(db, 1, list(range(1, 11))):
+            statement = getattr(statement, "statement", statement)
+            statement._generate_cache_key()
+    return timeit.timeit(run, number=REQUESTS) / REQUESTS * 1e6
+
+
+def measure(path: str, request, build) -> tuple:
+    engine = create_engine(f"sqlite:///{path}")
+    db = sessionmaker(bind=engine)()
+    try:
+        request(db, 1)  # warm up connection and compiled cache
+        total = timeit.timeit(lambda: request(db, 1), number=REQUESTS) / REQUESTS * 1e6
+        overhead = statement_overhead(db, build)
+    finally:
+        db.close()
+        engine.dispose()
+    return total, overhead
+
+
+def main():
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    seed(session)
+    session.close()
+    engine.dispose()
+
+    query_us, query_overhead = measure(path, query_request, query_statements)
+    cached_us, cached_overhead = measure(path, cached_request, cached_statements)
+    print(f"{'variant':<20} {'us/request':>11} {'statement build + cache key us':>31}")
+    print(f"{'ORM Query per call':<20} {query_us:>11.1f} {query_overhead:>31.1f}")
+    print(f"{'cached statements':<20} {cached_us:>11.1f} {cached_overhead:>31.1f}")
+    print(f"saved per request: {query_us - cached_us:.1f} us ({1 - cached_us / query_us:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -25,6 +25,11 @@ const App: React.FC = () => {
   };
 
   const handleLogout = () => {
+    const storedRefreshToken = localStorage.getItem('refresh_token');
+    if (storedRefreshToken) {
+      // Revoke the refresh token family so a copy of it can't be used after sign-out.
+      API.post('/auth/revoke', { refresh_token: storedRefreshToken }).catch(console.error);
+    }
     localStorage.removeItem('token');
     localStorage.removeItem('refresh_token');
     setToken(null);
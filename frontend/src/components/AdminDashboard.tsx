@@ -1,12 +1,26 @@
 /*
 Provides admin controls for:
 1. Toggling between local (SQLite) and cloud (Firestore) data sources.
-2. Migrating local exercise data to Firestore.
+2. Migrating local exercise data to Firestore, as a background job whose progress is polled.
 */
 
-import React from 'react';
+import React, { useEffect, useState } from 'react';
 import API from '../api/axios';
 
+interface Job {
+  id: number;
+  status: 'queued' | 'running' | 'succeeded' | 'failed' | 'cancelled';
+  total: number | null;
+  processed: number;
+  progress: number | null;
+  eta_seconds: number | null;
+  result: Record<string, any> | null;
+  error: string | null;
+}
+
+const FINISHED = ['succeeded', 'failed', 'cancelled'];
+const POLL_INTERVAL_MS = 1000;
+
 interface AdminDashboardProps {
   useCloudData: boolean;
   setUseCloudData: (value: boolean) => void;
@@ -17,16 +31,42 @@ export const AdminDashboard: React.FC<AdminDashboardProps> = ({ useCloudData, se
     setUseCloudData(!useCloudData);
   };
 
+  const [migrationJob, setMigrationJob] = useState<Job | null>(null);
+
+  useEffect(() => {
+    if (!migrationJob || FINISHED.includes(migrationJob.status)) return;
+    const timer = setTimeout(async () => {
+      try {
+        const res = await API.get(`/jobs/${migrationJob.id}`);
+        setMigrationJob(res.data);
+      } catch (error) {
+        console.error(error);
+      }
+    }, POLL_INTERVAL_MS);
+    return () => clearTimeout(timer);
+  }, [migrationJob]);
+
   const handleMigrateData = async () => {
     try {
       const res = await API.post('/migrate/exercises');
-      alert(res.data.message);
+      setMigrationJob({
+        id: res.data.job_id, status: 'queued', total: null, processed: 0,
+        progress: null, eta_seconds: null, result: null, error: null,
+      });
     } catch (error: any) {
       alert('Data migration failed: ' + (error.response?.data.detail || error.message));
       console.error(error);
     }
   };
 
+  const handleCancelMigration = async () => {
+    if (!migrationJob) return;
+    const res = await API.post(`/jobs/${migrationJob.id}/cancel`);
+    setMigrationJob(res.data);
+  };
+
+  const migrationRunning = migrationJob !== null && !FINISHED.includes(migrationJob.status);
+
   const handleUploadCSV = async () => {
     // Placeholder for CSV upload functionality.
     alert("CSV upload functionality not yet implemented.");
@@ -73,9 +113,27 @@ export const AdminDashboard: React.FC<AdminDashboardProps> = ({ useCloudData, se
           Click the button below to migrate all local exercise data (SQLite) to Firestore.
           Ensure your backend is running and Firebase Admin is configured.
         </p>
-        <button onClick={handleMigrateData} style={{ padding: '0.5rem 1rem' }}>
+        <button onClick={handleMigrateData} disabled={migrationRunning} style={{ padding: '0.5rem 1rem' }}>
           Migrate Data to Cloud
         </button>
+        {migrationJob && (
+          <div>
+            <progress value={migrationJob.processed} max={migrationJob.total || undefined} style={{ width: '100%' }} />
+            <div style={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center' }}>
+              <span>
+                {migrationJob.status}: {migrationJob.processed}
+                {migrationJob.total !== null && ` of ${migrationJob.total}`} exercises
+                {migrationJob.eta_seconds !== null && `, about ${Math.ceil(migrationJob.eta_seconds)} s left`}
+                {migrationJob.error && ` (${migrationJob.error})`}
+              </span>
+              {migrationRunning && (
+                <button onClick={handleCancelMigration} style={{ padding: '0.25rem 0.75rem' }}>
+                  Cancel
+                </button>
+              )}
+            </div>
+          </div>
+        )}
       </div>
 
       {/* CSV Upload Section */}
@@ -27,6 +27,40 @@ interface Exercise {
   video_url?: string;
 }
 
+// Private videos served by the backend need a token in the URL, since <video> can't send headers.
+// The backend issues a short-lived token valid for that one video; the access token stays out of URLs.
+const ExerciseVideo: React.FC<{ exercise: Exercise }> = ({ exercise }) => {
+  const url = exercise.video_url || '';
+  const needsToken = !exercise.is_public && !!API.defaults.baseURL && url.startsWith(`${API.defaults.baseURL}/videos/`);
+  const [src, setSrc] = useState<string | null>(needsToken ? null : url);
+
+  const fetchSignedUrl = async () => {
+    try {
+      const res = await API.post(`/videos/${exercise.id}/token`);
+      setSrc(res.data.url);
+    } catch (error) {
+      console.error(error);
+    }
+  };
+
+  useEffect(() => {
+    if (needsToken) {
+      fetchSignedUrl();
+    } else {
+      setSrc(url);
+    }
+  }, [url, needsToken]);
+
+  if (!src) return null;
+  return (
+    // The token expires; get a fresh URL if the player fails to load it later
+    <video width="320" height="240" controls key={src} onError={needsToken ? fetchSignedUrl : undefined}>
+      <source src={src} />
+      Your browser does not support the video tag.
+    </video>
+  );
+};
+
 interface User {
   id: number;
   username: string;
@@ -328,10 +362,7 @@ export const ExerciseDashboard: React.FC<ExerciseDashboardProps> = ({ token, use
 
             {ex.video_url && (
               <div style={{ marginBottom: '0.5rem' }}>
-                <video width="320" height="240" controls>
-                  <source src={ex.video_url} type="video/mp4" />
-                  Your browser does not support the video tag.
-                </video>
+                <ExerciseVideo exercise={ex} />
               </div>
             )}
 
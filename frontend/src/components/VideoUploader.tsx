@@ -1,11 +1,15 @@
 /*
-Component to handle video file selection and upload to Firebase Cloud Storage.
-It tracks the upload progress and returns the download URL via the onUpload callback.
+Component to handle video file selection and upload to Firebase Cloud Storage, or to the
+backend's local video storage when VITE_VIDEO_STORAGE is "local".
+It tracks the upload progress and returns the video URL via the onUpload callback.
 */
 
 import React, { useState } from 'react';
 import { ref, uploadBytesResumable, getDownloadURL } from 'firebase/storage';
 import { storage } from '../api/firebase';
+import API from '../api/axios';
+
+const storeVideosLocally = import.meta.env.VITE_VIDEO_STORAGE === 'local';
 
 interface VideoUploaderProps {
   exerciseId: number;
@@ -24,8 +28,26 @@ export const VideoUploader: React.FC<VideoUploaderProps> = ({ exerciseId, onUplo
 
   
   
+  const handleLocalUpload = async (file: File) => { // Send the raw file to the backend, which stores it on disk
+    try {
+      const response = await API.put(`/videos/${exerciseId}`, file, {
+        headers: { 'Content-Type': file.type || 'video/mp4' },
+        onUploadProgress: (event) => {
+          if (event.total) setProgress((event.loaded / event.total) * 100);
+        },
+      });
+      onUpload(response.data.video_url);
+    } catch (error: any) {
+      alert('Upload failed: ' + (error.response?.data?.detail ?? error.message));
+    }
+  };
+
   const handleUpload = () => { // Handle uploading the video to Firebase Cloud Storage
     if (!file) return;
+    if (storeVideosLocally) {
+      handleLocalUpload(file);
+      return;
+    }
     
     const storageRef = ref(storage, `videos/exercise_${exerciseId}/${file.name}`); // Create a reference in Firebase Storage using exerciseId and the file name.
     const uploadTask = uploadBytesResumable(storageRef, file); // Start the upload task using uploadBytesResumable, which allows us to track progress
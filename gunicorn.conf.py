@@ -0,0 +1,46 @@
+"""
+Production server configuration: Gunicorn managing N Uvicorn workers.
+
+Run from the project root with:
+    gunicorn -c gunicorn.conf.py app.main:app
+
+The app is imported once in the master (preload_app) and forked into the workers. Send
+SIGHUP to the master to replace workers one by one without dropping in-flight requests.
+"""
+
+import multiprocessing
+import os
+
+from app.core.config import settings
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+if settings.WRITE_BEHIND_ENABLED and workers > 1:
+    # Pending toggles are only visible to the process that queued them (app/db/write_behind.py)
+    raise RuntimeError("WRITE_BEHIND_ENABLED needs a single worker process; set WEB_CONCURRENCY=1")
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Import the app before forking so workers share its memory pages and start quickly
+preload_app = True
+
+# Give in-flight requests time to finish on restart/shutdown
+graceful_timeout = settings.GRACEFUL_TIMEOUT
+timeout = int(os.getenv("WORKER_TIMEOUT", 60))
+keepalive = 5
+
+# Recycle workers periodically (staggered by the jitter) to bound memory growth
+max_requests = int(os.getenv("MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", 1000))
+
+
+def post_fork(server, worker):
+    # Connections and locks created in the master must not be shared with forked workers
+    from app.db.database import engine, membership_epochs, primary_pins, read_engine, writer_lock
+    from app.db.maintenance import compaction_leader
+
+    engine.dispose()
+    read_engine.dispose()
+    writer_lock.reset_after_fork()
+    membership_epochs.reset_after_fork()
+    primary_pins.slots.reset_after_fork()
+    compaction_leader.reset_after_fork()
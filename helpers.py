@@ -0,0 +1,26 @@
+"""
+Helpers shared by the test modules.
+"""
+
+import time
+
+from app.db import jobs
+
+def login_with_id(client, username="user1", password="pass"):
+    # Register and then login a user; returns their id and the headers for authenticated requests.
+    client.post("/auth/register", json={"username": username, "password": password})
+    tokens = client.post("/auth/login", json={"username": username, "password": password}).json()
+    return tokens["user_id"], {"Authorization": f"Bearer {tokens['access_token']}"}
+
+def register_and_login(client, username="user1", password="pass"):
+    # Helper function to register and then login a user; returns only the headers.
+    return login_with_id(client, username, password)[1]
+
+def wait_for_job(client, job_id, headers, statuses=jobs.FINISHED, timeout=10):
+    # Poll a background job until it reaches one of `statuses` (or the timeout passes).
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/jobs/{job_id}", headers=headers).json()
+        if job["status"] in statuses or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
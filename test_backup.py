@@ -0,0 +1,45 @@
+import gzip
+import sqlite3
+
+from app.core.config import settings
+from app.db import backup
+from helpers import register_and_login, wait_for_job
+
+def test_backup_is_complete_and_verified(client, tmp_path):
+    headers = register_and_login(client, "backup_user", "pass")
+    for i in range(20):
+        data = {"name": f"Ex {i}", "description": "x" * 500, "difficulty": 1, "is_public": True}
+        client.post("/exercises/", json=data, headers=headers)
+
+    destination = str(tmp_path / "copy.db.gz")
+    report = backup.backup(destination, pages=2, sleep=0, compress=True)
+    assert report["verified"] and report["pages"] > 2
+    assert backup.backup_progress.value() == 1.0
+    assert [path.name for path in tmp_path.iterdir()] == ["copy.db.gz"]
+
+    restored = tmp_path / "restored.db"
+    with gzip.open(destination) as source:
+        restored.write_bytes(source.read())
+    connection = sqlite3.connect(restored)
+    try:
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+        assert connection.execute("SELECT COUNT(*) FROM exercises").fetchone()[0] == 20
+    finally:
+        connection.close()
+
+def test_admin_backup_endpoint(client, tmp_path, monkeypatch):
+    assert client.post("/admin/backup").status_code == 404
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(settings, "BACKUP_DIR", str(tmp_path))
+    assert client.post("/admin/backup", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    response = client.post("/admin/backup?compress=false", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    # Admin jobs have no owner: without the admin token they look like jobs that don't exist
+    assert client.get(f"/jobs/{job_id}", headers=register_and_login(client, "backup_user", "pass")).status_code == 404
+    assert client.get(f"/jobs/{job_id}", headers={"X-Admin-Token": "wrong"}).status_code == 404
+    job = wait_for_job(client, job_id, {"X-Admin-Token": "secret"})
+    assert job["status"] == "succeeded" and job["processed"] == job["total"] > 0
+    assert job["result"]["destination"].startswith(str(tmp_path)) and job["result"]["file_bytes"] > 0
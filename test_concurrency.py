@@ -0,0 +1,65 @@
+import asyncio
+
+from app.core.concurrency import AdaptiveLimiter, route_group
+
+def test_limiter_queues_sheds_and_adapts():
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial=1, min_limit=1, max_limit=4, max_queue=1, latency_target=0.1)
+        assert await limiter.acquire(timeout=1) is None
+
+        # One request may wait for the slot; the next is shed straight away.
+        waiting = asyncio.ensure_future(limiter.acquire(timeout=1))
+        await asyncio.sleep(0)
+        assert await limiter.acquire(timeout=1) == "queue_full"
+        limiter.release(latency=0.01, failed=False)
+        assert await waiting is None and limiter.in_flight == 1 and limiter.limit == 2.0
+
+        # Queued requests give up after the timeout.
+        assert await limiter.acquire(timeout=1) is None
+        assert await limiter.acquire(timeout=0.01) == "timeout"
+
+        # Fast responses raise the limit additively, slow or failed ones cut it.
+        limiter.release(latency=0.01, failed=False)
+        limiter.release(latency=0.01, failed=True)
+        assert limiter.limit == 1.875 and limiter.in_flight == 0
+        for _ in range(20):
+            await limiter.acquire(timeout=1)
+            limiter.release(latency=0.01, failed=False)
+        assert limiter.limit == 4.0
+        await limiter.acquire(timeout=1)
+        limiter.release(latency=1.0, failed=False)
+        assert limiter.limit == 3.0
+
+    asyncio.run(scenario())
+
+def test_slot_handed_to_cancelled_waiter_is_returned():
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial=1, min_limit=1, max_limit=1, max_queue=2, latency_target=0.1)
+        assert await limiter.acquire(timeout=1) is None
+        waiting = asyncio.ensure_future(limiter.acquire(timeout=1))
+        behind = asyncio.ensure_future(limiter.acquire(timeout=1))
+        await asyncio.sleep(0)
+
+        # The slot is handed to the first waiter, which is cancelled before it resumes
+        limiter.release(latency=0.01, failed=False)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        if not waiting.cancelled():
+            # Some Python versions' wait_for deliver the result despite the cancel; then the
+            # request owns the slot and releases it when done
+            assert waiting.result() is None
+            limiter.release(latency=0.01, failed=False)
+
+        # Either way the slot reaches the next waiter instead of leaking
+        assert await behind is None and limiter.in_flight == 1
+        limiter.release(latency=0.01, failed=False)
+        assert limiter.in_flight == 0
+
+    asyncio.run(scenario())
+
+def test_route_groups():
+    assert route_group({"path": "/migrate/exercises", "query_string": b""}) == "migrate"
+    assert route_group({"path": "/exercises/", "query_string": b"use_cloud=true&limit=5"}) == "cloud"
+    assert route_group({"path": "/collection/", "query_string": b""}) == "collection"
+    assert route_group({"path": "/exercises/1", "query_string": b""}) == "default"
+    assert route_group({"path": "/metrics", "query_string": b""}) is None
@@ -0,0 +1,44 @@
+from app.core import membership
+from app.db.csv_import import import_csv_dir
+from app.db.database import SessionLocal
+from app.db.models import Change, Exercise, Favorite
+
+def write_exports(directory, exercises, favorites):
+    # Same layout as ExportData.java: upper-case H2 column names, empty fields for NULL.
+    (directory / "users.csv").write_text("ID,USERNAME,HASHED_PASSWORD\n1,john_doe,hash\n")
+    (directory / "exercises.csv").write_text(
+        "ID,NAME,DESCRIPTION,DIFFICULTY,IS_PUBLIC,OWNER_ID\n" + "".join(f"{row}\n" for row in exercises)
+    )
+    (directory / "favorites.csv").write_text("ID,USER_ID,EXERCISE_ID\n" + "".join(f"{row}\n" for row in favorites))
+
+def test_incremental_csv_reimport(client, tmp_path):
+    write_exports(tmp_path, ["1,Push Ups,Do push ups,3,TRUE,1", "2,Squats,,2,TRUE,1"], ["1,1,1", "2,1,2"])
+    db = SessionLocal()
+    try:
+        report = import_csv_dir(db, str(tmp_path), batch_size=1)
+        assert report["exercises"]["inserted"] == 2 and report["favorites"]["inserted"] == 2
+        assert all(result["ok"] for result in report.values())
+        assert db.get(Exercise, 2).description is None
+        assert membership.cache.lookup(db, 1, [1, 2])[0] == {1, 2}
+
+        # Only the changed, new and removed rows are applied on the next run.
+        write_exports(tmp_path, ["1,Push Ups,Slow push ups,3,TRUE,1", "3,Plank,Hold,1,FALSE,1"], ["1,1,1"])
+        report = import_csv_dir(db, str(tmp_path), batch_size=1)
+        assert report["users"]["unchanged"] == 1
+        exercises = report["exercises"]
+        assert (exercises["inserted"], exercises["updated"], exercises["deleted"], exercises["unchanged"]) == (1, 1, 1, 0)
+        assert (report["favorites"]["deleted"], report["favorites"]["unchanged"]) == (1, 1)
+        assert all(result["ok"] for result in report.values())
+        assert db.get(Exercise, 1).description == "Slow push ups"
+        assert db.get(Exercise, 2) is None and db.query(Favorite).count() == 1
+        # The cached flags of the user whose favorite was removed are reloaded
+        assert membership.cache.lookup(db, 1, [1, 2])[0] == {1}
+        assert db.query(Change).filter(Change.exercise_id == 2, Change.deleted == True).count() == 1
+
+        # Verification catches rows that drifted from the export outside of the import.
+        db.query(Exercise).filter(Exercise.id == 3).update({"name": "Side Plank"})
+        db.commit()
+        report = import_csv_dir(db, str(tmp_path))
+        assert report["exercises"]["unchanged"] == 2 and report["exercises"]["ok"] is False
+    finally:
+        db.close()
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.db.database import ReadSessionLocal, engine, primary_pins, read_engine
+from app.db.models import User
+from helpers import login_with_id
+
+def test_read_sessions_route_to_read_engine_until_they_write(client):
+    db = ReadSessionLocal()
+    try:
+        assert db.get_bind() is read_engine
+        with pytest.raises(OperationalError):
+            with read_engine.begin() as conn:
+                conn.exec_driver_sql("DELETE FROM users")
+        db.rollback()
+
+        # After its first flush the session reads and writes through the primary.
+        db.add(User(username="routed", hashed_password="x"))
+        db.flush()
+        assert db.get_bind() is engine
+        assert db.query(User).filter(User.username == "routed").count() == 1
+    finally:
+        db.rollback()
+        db.close()
+
+def test_writers_are_pinned_to_primary(client):
+    user_id, headers = login_with_id(client, "pinned_user", "pass")
+    data = {"name": "Row", "description": "Row", "difficulty": 2, "is_public": True}
+    exercise_id = client.post("/exercises/", json=data, headers=headers).json()["id"]
+    assert primary_pins.is_pinned(user_id)
+    assert client.get(f"/exercises/{exercise_id}", headers=headers).json()["name"] == "Row"
+
+def test_pins_are_shared_between_processes(client):
+    import multiprocessing
+
+    child = multiprocessing.get_context("fork").Process(target=primary_pins.pin, args=(4242,))
+    child.start()
+    child.join(10)
+    assert child.exitcode == 0
+    assert primary_pins.is_pinned(4242)
+    assert not primary_pins.is_pinned(4243)
+
+def test_only_one_process_leads_compaction(tmp_path):
+    import multiprocessing
+    from app.db.maintenance import LeaderLock
+
+    leader = LeaderLock(str(tmp_path / "test.db.maintenance.lock"))
+    assert leader.claim() and leader.claim()
+
+    def other_worker(queue):
+        leader.reset_after_fork()
+        queue.put(leader.claim())
+
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    child = context.Process(target=other_worker, args=(queue,))
+    child.start()
+    assert queue.get(timeout=10) is False
+    child.join(10)
+
+    # When the leader's process exits its lock is released and the next claim takes over
+    follower = LeaderLock(leader.path)
+    assert not follower.claim()
+    os.close(leader._fd)
+    assert follower.claim()
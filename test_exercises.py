@@ -1,14 +1,7 @@
 import pytest
 from fastapi.testclient import TestClient
 
-def register_and_login(client, username="user1", password="pass"):
-    # Helper function to register and then login a user.
-    client.post("/auth/register", json={"username": username, "password": password})
-    response = client.post("/auth/login", json={"username": username, "password": password})
-    tokens = response.json()
-    # Return headers including the bearer token for authenticated requests.
-    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
-    return headers
+from helpers import login_with_id, register_and_login
 
 def test_exercise_crud(client):
     headers = register_and_login(client, "user1", "pass")
@@ -138,3 +131,441 @@ def test_register_and_login(client):
     # Check that the response contains both access and refresh tokens.
     assert "access_token" in data
     assert "refresh_token" in data
+
+def test_view_users_pagination(client):
+    owner_headers = register_and_login(client, "owner", "pass")
+    create_data = {"name": "Bridges", "description": "Do bridges", "difficulty": 2, "is_public": True}
+    exercise_id = client.post("/exercises/", json=create_data, headers=owner_headers).json()["id"]
+
+    # Three users favorite the exercise, one of them also saves it.
+    for name in ("fan1", "fan2", "fan3"):
+        headers = register_and_login(client, name, "pass")
+        client.post(f"/favorites/{exercise_id}", headers=headers)
+    client.post(f"/saves/{exercise_id}", headers=headers)
+
+    # First page of favorites only, two at a time.
+    response = client.get(f"/exercises/{exercise_id}/users?kind=favorited&limit=2", headers=owner_headers)
+    data = response.json()
+    assert "saved_by" not in data
+    assert [u["username"] for u in data["favorited_by"]] == ["fan1", "fan2"]
+    cursor = data["favorited_next_cursor"]
+    assert cursor is not None
+
+    # Second page picks up after the cursor and is the last one.
+    response = client.get(
+        f"/exercises/{exercise_id}/users?kind=favorited&limit=2&favorited_after={cursor}", headers=owner_headers
+    )
+    data = response.json()
+    assert [u["username"] for u in data["favorited_by"]] == ["fan3"]
+    assert data["favorited_next_cursor"] is None
+
+    # Totals-only mode returns just the counts.
+    response = client.get(f"/exercises/{exercise_id}/users?totals_only=true", headers=owner_headers)
+    assert response.json() == {"favorite_count": 3, "save_count": 1}
+
+def test_trending_and_popular(client):
+    headers = register_and_login(client, "trender", "pass")
+    ids = []
+    for name in ("Rows", "Dips", "Curls"):
+        data = {"name": name, "description": name, "difficulty": 1, "is_public": True}
+        ids.append(client.post("/exercises/", json=data, headers=headers).json()["id"])
+    private = {"name": "Secret", "description": "Hidden", "difficulty": 1, "is_public": False}
+    private_id = client.post("/exercises/", json=private, headers=headers).json()["id"]
+
+    # Dips gets a favorite and a save, Curls gets a favorite, the private one gets everything.
+    client.post(f"/favorites/{ids[1]}", headers=headers)
+    client.post(f"/saves/{ids[1]}", headers=headers)
+    client.post(f"/favorites/{ids[2]}", headers=headers)
+    client.post(f"/favorites/{private_id}", headers=headers)
+    client.post(f"/saves/{private_id}", headers=headers)
+
+    for board in ("trending", "popular"):
+        ranked = [row["id"] for row in client.get(f"/exercises/{board}", headers=headers).json()]
+        assert ranked == [ids[1], ids[2]]
+
+    # Retracting events updates the rankings incrementally.
+    client.delete(f"/saves/{ids[1]}", headers=headers)
+    client.delete(f"/favorites/{ids[1]}", headers=headers)
+    ranked = [row["id"] for row in client.get("/exercises/trending", headers=headers).json()]
+    assert ranked == [ids[2]]
+
+def test_leaderboards_converge_on_other_workers_writes(client, monkeypatch):
+    from app.core import leaderboard
+    from app.db.database import SessionLocal
+    from app.db.models import Favorite, Saved
+
+    user_id, headers = login_with_id(client, "board_worker", "pass")
+    ids = []
+    for name in ("Rows", "Dips", "Curls"):
+        data = {"name": name, "description": name, "difficulty": 1, "is_public": True}
+        ids.append(client.post("/exercises/", json=data, headers=headers).json()["id"])
+    client.post(f"/favorites/{ids[0]}", headers=headers)
+
+    # Another worker commits a save this process never sees
+    db = SessionLocal()
+    try:
+        db.add(Saved(user_id=user_id, exercise_id=ids[1]))
+        db.commit()
+        assert [row["id"] for row in leaderboard.popular.top(10)] == [ids[0]]
+
+        # This worker's own favorite lands while the scheduled rebuild reads the tables
+        load = leaderboard._load
+        def load_then_favorite(session):
+            fresh = load(session)
+            client.post(f"/favorites/{ids[2]}", headers=headers)
+            return fresh
+        monkeypatch.setattr(leaderboard, "_load", load_then_favorite)
+        leaderboard.rebuild(db)
+        assert db.query(Favorite).count() == 2
+    finally:
+        db.close()
+
+    for board in ("trending", "popular"):
+        ranked = [row["id"] for row in client.get(f"/exercises/{board}", headers=headers).json()]
+        # The save outweighs both favorites, and the favorite made during the rebuild was kept
+        assert ranked[0] == ids[1] and sorted(ranked[1:]) == sorted([ids[0], ids[2]])
+
+def test_retracted_events_leave_no_ghost_scores():
+    from datetime import datetime, timedelta
+    from app.core import leaderboard
+
+    # Events far from the epoch carry huge forward-decay weights, so retracting them leaves
+    # rounding residue many orders of magnitude above zero
+    board = leaderboard.Leaderboard(10, half_life_seconds=3600)
+    later = datetime.utcnow() + timedelta(days=15)
+    board.add(1, 1.0, later)
+    board.add(2, 2.0, later)
+    board.add(1, 0.1, later)
+    board.add(1, -1.0, later)
+    board.add(1, -0.1, later)
+    assert 1 not in board.scores()
+    assert [row["id"] for row in board.top(10)] == [2]
+
+def test_autocomplete(client):
+    owner = register_and_login(client, "typer", "pass")
+    other = register_and_login(client, "other_typer", "pass")
+    ids = {}
+    for name, is_public in (("Barbell Back Squat", True), ("Split Squat", True), ("Squat Jump", True),
+                            ("Bench Press", True), ("Secret Squat", False)):
+        data = {"name": name, "description": name, "difficulty": 1, "is_public": is_public}
+        ids[name] = client.post("/exercises/", json=data, headers=owner).json()["id"]
+    client.post(f"/favorites/{ids['Squat Jump']}", headers=owner)
+
+    def suggest(q, headers=owner):
+        return [row["name"] for row in client.get(f"/exercises/autocomplete?q={q}", headers=headers).json()]
+
+    # Any word can start the match; most popular first, then alphabetical
+    assert suggest("squ") == ["Squat Jump", "Barbell Back Squat", "Secret Squat", "Split Squat"]
+    assert suggest("squ", other) == ["Squat Jump", "Barbell Back Squat", "Split Squat"]
+    assert suggest("back sq") == ["Barbell Back Squat"]
+    assert suggest("BENCH-") == ["Bench Press"]
+
+    client.put(f"/exercises/{ids['Bench Press']}", json={"name": "Incline Press"}, headers=owner)
+    client.put(f"/exercises/{ids['Secret Squat']}", json={"is_public": True}, headers=owner)
+    client.delete(f"/exercises/{ids['Split Squat']}", headers=owner)
+    assert suggest("bench") == []
+    assert suggest("press") == ["Incline Press"]
+    assert suggest("squ", other) == ["Squat Jump", "Barbell Back Squat", "Secret Squat"]
+
+def test_autocomplete_ranks_every_match(monkeypatch):
+    from app.core import autocomplete, leaderboard
+
+    popular = leaderboard.Leaderboard(10)
+    monkeypatch.setattr(leaderboard, "popular", popular)
+    index = autocomplete.PrefixIndex()
+    count = autocomplete.MAX_CANDIDATES + 500
+    for exercise_id in range(count):
+        index.put(exercise_id, f"Aaa move {exercise_id:04d}", 1, True)
+    popular.add(count - 1, 1.0, None)
+
+    def suggest(q, limit=3):
+        return [row["id"] for row in index.suggest(q, 2, limit)]
+
+    # The most popular match wins even when it sorts after the first MAX_CANDIDATES keys
+    assert suggest("a") == [count - 1, 0, 1]
+    assert suggest("aaa move 1") == [count - 1, 1000, 1001]
+
+    # Later popularity, new exercises and deletions are reflected in the precomputed list
+    popular.add(700, 2.0, None)
+    index.put(count, "Aardvark Crawl", 1, True)
+    index.remove(0)
+    assert suggest("a", 4) == [700, count - 1, 1, 2]
+    assert suggest("aar") == [count]
+
+def test_similar_exercises(client):
+    from app.core import similarity
+    from app.db.database import SessionLocal
+
+    ids = []
+    headers = register_and_login(client, "sim0", "pass")
+    for name in ("Squat", "Deadlift", "Bench", "Yoga"):
+        data = {"name": name, "description": name, "difficulty": 3, "is_public": True}
+        ids.append(client.post("/exercises/", json=data, headers=headers).json()["id"])
+    squat, deadlift, bench, yoga = ids
+
+    # Two users save squat + deadlift, one of them also bench; yoga is saved alone.
+    for name, picks in (("sim1", [squat, deadlift, bench]), ("sim2", [squat, deadlift]), ("sim3", [yoga])):
+        user_headers = register_and_login(client, name, "pass")
+        for exercise_id in picks:
+            client.post(f"/saves/{exercise_id}", headers=user_headers)
+
+    # The scheduled refresh would pick these up; rebuild directly for the test.
+    db = SessionLocal()
+    try:
+        similarity.index.rebuild(db)
+    finally:
+        db.close()
+
+    neighbors = client.get(f"/exercises/{squat}/similar", headers=headers).json()
+    assert [n["id"] for n in neighbors] == [deadlift, bench]
+    assert neighbors[0]["score"] == 1.0
+    assert client.get(f"/exercises/{yoga}/similar", headers=headers).json() == []
+
+def test_similar_keeps_exclusions_made_during_rebuild(client, monkeypatch):
+    from app.core import similarity
+    from app.db.database import SessionLocal
+
+    ids = []
+    headers = register_and_login(client, "simx0", "pass")
+    for name in ("Squat", "Deadlift", "Bench"):
+        data = {"name": name, "description": name, "difficulty": 3, "is_public": True}
+        ids.append(client.post("/exercises/", json=data, headers=headers).json()["id"])
+    squat, deadlift, bench = ids
+    user_headers = register_and_login(client, "simx1", "pass")
+    for exercise_id in ids:
+        client.post(f"/saves/{exercise_id}", headers=user_headers)
+
+    # Deadlift is made private after the rebuild has read the tables
+    compute = similarity.compute_neighbors
+    def compute_then_hide(*args):
+        data = compute(*args)
+        client.put(f"/exercises/{deadlift}", json={"is_public": False}, headers=headers)
+        return data
+    monkeypatch.setattr(similarity, "compute_neighbors", compute_then_hide)
+    db = SessionLocal()
+    try:
+        similarity.index.rebuild(db)
+    finally:
+        db.close()
+
+    neighbors = client.get(f"/exercises/{squat}/similar", headers=headers).json()
+    assert [n["id"] for n in neighbors] == [bench]
+
+def test_user_flags_follow_favorite_toggles(client):
+    headers = register_and_login(client, "flagger", "pass")
+    data = {"name": "Pull Ups", "description": "Do pull ups", "difficulty": 4, "is_public": True}
+    exercise_id = client.post("/exercises/", json=data, headers=headers).json()["id"]
+
+    # Prime the membership cache, then favorite: the cached entry must be invalidated.
+    assert client.get("/exercises/", headers=headers).json()[0]["user_has_favorited"] is False
+    client.post(f"/favorites/{exercise_id}", headers=headers)
+    client.post(f"/saves/{exercise_id}", headers=headers)
+    listed = client.get("/exercises/", headers=headers).json()[0]
+    assert listed["user_has_favorited"] is True and listed["user_has_saved"] is True
+
+    client.delete(f"/favorites/{exercise_id}", headers=headers)
+    fetched = client.get(f"/exercises/{exercise_id}", headers=headers).json()
+    assert fetched["user_has_favorited"] is False and fetched["user_has_saved"] is True
+
+def test_membership_invalidation_reaches_other_workers(client):
+    from app.core import membership
+    from app.core.config import settings
+    from app.db.database import SessionLocal
+
+    user_id, headers = login_with_id(client, "two_workers", "pass")
+    data = {"name": "Lunges", "description": "Do lunges", "difficulty": 2, "is_public": True}
+    exercise_id = client.post("/exercises/", json=data, headers=headers).json()["id"]
+
+    # Another worker's cache shares only the epochs with this process's cache
+    other_worker = membership.MembershipCache(10, settings.MEMBERSHIP_CACHE_TTL_SECONDS)
+    db = SessionLocal()
+    try:
+        assert other_worker.lookup(db, user_id, [exercise_id]) == (set(), set())
+        client.post(f"/favorites/{exercise_id}", headers=headers)
+        assert other_worker.lookup(db, user_id, [exercise_id]) == ({exercise_id}, set())
+    finally:
+        db.close()
+
+def test_write_behind_toggles(client, monkeypatch):
+    from app.core.config import settings
+    from app.db import write_behind
+
+    headers = register_and_login(client, "clicker", "pass")
+    data = {"name": "Burpees", "description": "Do burpees", "difficulty": 5, "is_public": True}
+    exercise_id = client.post("/exercises/", json=data, headers=headers).json()["id"]
+
+    monkeypatch.setattr(settings, "WRITE_BEHIND_ENABLED", True)
+    published = []
+    monkeypatch.setattr(write_behind.firestore_counters, "record", lambda *args, **kwargs: published.append(args))
+    # Rapid toggles are acknowledged immediately and collapse to the final state.
+    for _ in range(3):
+        assert client.post(f"/favorites/{exercise_id}", headers=headers).status_code == 204
+        assert client.delete(f"/favorites/{exercise_id}", headers=headers).status_code == 204
+    client.post(f"/favorites/{exercise_id}", headers=headers)
+    client.post(f"/saves/{exercise_id}", headers=headers)
+
+    # The acting user reads their own writes.
+    fetched = client.get(f"/exercises/{exercise_id}", headers=headers).json()
+    assert fetched["user_has_favorited"] is True and fetched["user_has_saved"] is True
+    assert fetched["favorite_count"] == 1 and fetched["save_count"] == 1
+    # Firestore counters are left to the background thread, not the settling read
+    assert published == []
+
+    client.delete(f"/saves/{exercise_id}", headers=headers)
+    write_behind.queue.stop()
+    assert client.get(f"/exercises/{exercise_id}", headers=headers).json()["save_count"] == 0
+    assert sorted(published) == [("favorite", exercise_id), ("save", exercise_id), ("save", exercise_id)]
+
+def test_delete_exercise_removes_interactions(client):
+    from app.db import maintenance
+    from app.db.database import SessionLocal
+    from app.db.models import Favorite, Rating, Saved
+
+    headers = register_and_login(client, "deleter", "pass")
+    data = {"name": "Jumping Jacks", "description": "Jump", "difficulty": 1, "is_public": True}
+    exercise_id = client.post("/exercises/", json=data, headers=headers).json()["id"]
+    client.post(f"/favorites/{exercise_id}", headers=headers)
+    client.post(f"/saves/{exercise_id}", headers=headers)
+    client.post(f"/ratings/{exercise_id}", json={"rating": 4}, headers=headers)
+
+    assert client.delete(f"/exercises/{exercise_id}", headers=headers).status_code == 204
+
+    db = SessionLocal()
+    try:
+        for model in (Favorite, Saved, Rating):
+            assert db.query(model).filter(model.exercise_id == exercise_id).count() == 0
+
+        # Orphans left behind by older deletes are removed by the compaction job.
+        db.add(Favorite(user_id=1, exercise_id=9999))
+        db.commit()
+        assert maintenance.delete_orphans(db, batch_size=10)["favorites"] == 1
+        assert db.query(Favorite).count() == 0
+    finally:
+        db.close()
+    assert client.get("/collection/", headers=headers).json() == []
+
+def test_sparse_fieldsets(client):
+    headers = register_and_login(client, "sparse", "pass")
+    data = {"name": "Planche", "description": "Hard", "difficulty": 5, "is_public": True}
+    exercise_id = client.post("/exercises/", json=data, headers=headers).json()["id"]
+    client.post(f"/favorites/{exercise_id}", headers=headers)
+
+    # Only the requested fields (plus the id) come back.
+    listed = client.get("/exercises/?fields=name,difficulty", headers=headers).json()
+    assert listed == [{"name": "Planche", "difficulty": 5, "id": exercise_id}]
+
+    fetched = client.get(f"/exercises/{exercise_id}?fields=favorite_count,user_has_favorited", headers=headers).json()
+    assert fetched == {"id": exercise_id, "favorite_count": 1, "user_has_favorited": True}
+
+    assert client.get("/favorites/?fields=name", headers=headers).json() == [{"name": "Planche", "id": exercise_id}]
+    assert client.get("/collection/?fields=save_count", headers=headers).json() == [{"id": exercise_id, "save_count": 0}]
+
+    # Without fields the full response is unchanged; unknown fields are rejected.
+    full = client.get(f"/exercises/{exercise_id}", headers=headers).json()
+    assert full["user_has_favorited"] is True and full["average_rating"] == 0.0
+    assert client.get("/exercises/?fields=bogus", headers=headers).status_code == 400
+
+def test_batch_get_by_ids(client):
+    owner = register_and_login(client, "batch_owner", "pass")
+    other = register_and_login(client, "batch_other", "pass")
+    public = {"name": "Row", "description": "Row", "difficulty": 2, "is_public": True}
+    private = {"name": "Mine", "description": "Mine", "difficulty": 2, "is_public": False}
+    public_id = client.post("/exercises/", json=public, headers=owner).json()["id"]
+    private_id = client.post("/exercises/", json=private, headers=owner).json()["id"]
+    client.post(f"/favorites/{public_id}", headers=other)
+
+    # Results follow request order; missing and invisible ids get not-found markers.
+    response = client.get(f"/exercises/?ids={private_id},9999,{public_id}", headers=other)
+    assert response.status_code == 200
+    assert response.json()[:2] == [{"id": private_id, "not_found": True}, {"id": 9999, "not_found": True}]
+    item = response.json()[2]
+    assert item["name"] == "Row" and item["favorite_count"] == 1 and item["user_has_favorited"] is True
+
+    # The owner can see their private exercise, and sparse fieldsets apply.
+    response = client.get(f"/exercises/?ids={private_id}&fields=name", headers=owner)
+    assert response.json() == [{"name": "Mine", "id": private_id}]
+    assert client.get("/exercises/?ids=1,x", headers=owner).status_code == 400
+
+def test_delta_sync(client):
+    owner = register_and_login(client, "sync_owner", "pass")
+    other = register_and_login(client, "sync_other", "pass")
+    cursor = client.get("/sync/", headers=other).json()["next_since"]
+
+    public = {"name": "Lunge", "description": "Lunge", "difficulty": 2, "is_public": True}
+    private = {"name": "Secret", "description": "Secret", "difficulty": 2, "is_public": False}
+    public_id = client.post("/exercises/", json=public, headers=owner).json()["id"]
+    client.post("/exercises/", json=private, headers=owner)
+    client.post(f"/favorites/{public_id}", headers=other)
+    client.delete(f"/favorites/{public_id}", headers=other)
+
+    # Private exercises stay hidden; repeated changes collapse into their current state.
+    body = client.get(f"/sync/?since={cursor}", headers=other).json()
+    assert body["has_more"] is False
+    assert [(c["type"], c.get("id", c.get("exercise_id")), c["deleted"]) for c in body["changes"]] == [
+        ("exercise", public_id, False),
+        ("favorite", public_id, True),
+    ]
+    assert body["changes"][0]["data"]["favorite_count"] == 0
+    cursor = body["next_since"]
+    assert client.get(f"/sync/?since={cursor}", headers=other).json() == {
+        "changes": [], "next_since": cursor, "has_more": False
+    }
+
+    # Deletes and exercises turning private become tombstones; pages follow next_since.
+    client.put(f"/exercises/{public_id}", json={"is_public": False}, headers=owner)
+    second_id = client.post("/exercises/", json=public, headers=owner).json()["id"]
+    client.delete(f"/exercises/{second_id}", headers=owner)
+    first = client.get(f"/sync/?since={cursor}&limit=1", headers=other).json()
+    assert first["has_more"] is True
+    assert first["changes"] == [{"type": "exercise", "id": public_id, "deleted": True, "version": first["next_since"]}]
+    rest = client.get(f"/sync/?since={first['next_since']}", headers=other).json()
+    assert [(c["id"], c["deleted"]) for c in rest["changes"]] == [(second_id, True)]
+
+def test_sync_requires_full_resync_after_pruning(client):
+    from datetime import datetime, timedelta
+    from app.db import maintenance
+    from app.db.database import SessionLocal
+    from app.db.models import Change
+
+    headers = register_and_login(client, "sync_pruned", "pass")
+    data = {"name": "Plank", "description": "Plank", "difficulty": 1, "is_public": True}
+    for _ in range(3):
+        client.post("/exercises/", json=data, headers=headers)
+    start = 0
+    recent = client.get("/sync/", headers=headers).json()["next_since"]
+    client.post("/exercises/", json=data, headers=headers)
+
+    # Everything up to `recent` falls out of the retention window
+    db = SessionLocal()
+    try:
+        db.query(Change).filter(Change.version <= recent).update(
+            {Change.created_at: datetime.utcnow() - timedelta(days=60)}, synchronize_session=False
+        )
+        db.commit()
+        assert maintenance.prune_changes(db, retention_days=30, batch_size=2) == recent
+    finally:
+        db.close()
+
+    response = client.get(f"/sync/?since={start}", headers=headers)
+    assert response.status_code == 410
+    assert response.json() == {"detail": "Full resync required"}
+    body = client.get(f"/sync/?since={recent}", headers=headers).json()
+    assert len(body["changes"]) == 1 and body["has_more"] is False
+
+def test_list_responses_are_compressed(client):
+    headers = register_and_login(client, "gzip_user", "pass")
+    for i in range(20):
+        data = {"name": f"Exercise {i}", "description": "Long description " * 5, "difficulty": 3, "is_public": True}
+        client.post("/exercises/", json=data, headers=headers)
+
+    # Large bodies are gzipped when the client accepts it (the test client decodes transparently).
+    response = client.get("/exercises/?limit=20", headers={**headers, "Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert len(response.json()) == 20 and response.json()[0]["favorite_count"] == 0
+
+    # Small bodies and clients that don't accept compression get plain JSON.
+    response = client.get("/exercises/?limit=1&fields=name", headers={**headers, "Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    response = client.get("/exercises/?limit=20", headers={**headers, "Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
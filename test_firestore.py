@@ -0,0 +1,117 @@
+from google.api_core.exceptions import NotFound
+from google.cloud.firestore import Increment
+
+from app.core import firestore_counters
+from app.core.config import settings
+from app.routers import exercises, migrate
+from helpers import register_and_login, wait_for_job
+
+class FakeDocument:
+    def __init__(self, collection, doc_id):
+        self.collection_ref = collection
+        self.id = doc_id
+
+    def set(self, data, merge=False):
+        current = self.collection_ref.docs.get(self.id, {}) if merge else {}
+        for field, value in data.items():
+            if isinstance(value, Increment):
+                value = current.get(field, 0) + value.value
+            current[field] = value
+        self.collection_ref.docs[self.id] = current
+
+    def update(self, data):
+        if self.id not in self.collection_ref.docs:
+            raise NotFound("No document to update")
+        self.set(data, merge=True)
+
+    def collection(self, name):
+        return self.collection_ref.subcollections.setdefault((self.id, name), FakeCollection())
+
+    def to_dict(self):
+        return dict(self.collection_ref.docs[self.id])
+
+class FakeCollection:
+    # Minimal in-memory stand-in for the Firestore collection API used by the app.
+    def __init__(self):
+        self.docs = {}
+        self.subcollections = {}
+        self.order_field = None
+
+    def document(self, doc_id):
+        return FakeDocument(self, doc_id)
+
+    def order_by(self, field):
+        self.order_field = field
+        return self
+
+    def stream(self):
+        ids = sorted(self.docs, key=lambda doc_id: self.docs[doc_id][self.order_field]) if self.order_field else list(self.docs)
+        for doc_id in ids:
+            yield FakeDocument(self, doc_id)
+
+class FakeFirestore:
+    def __init__(self):
+        self.collections = {}
+
+    def collection(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+def test_cloud_mode_flags_and_live_counts(client, monkeypatch):
+    fake = FakeFirestore()
+    monkeypatch.setattr(exercises, "db_firestore", fake)
+    owner = register_and_login(client, "cloud_owner", "pass")
+    other = register_and_login(client, "cloud_other", "pass")
+    ids = []
+    for i, is_public in enumerate([True, False, True, True]):
+        data = {"name": f"Cloud {i}", "description": "Cloud", "difficulty": 2, "is_public": is_public}
+        ids.append(client.post("/exercises/", json=data, headers=owner).json()["id"])
+    for exercise_id in ids:
+        # The migration writes zero counts into every document.
+        fake.collection("exercises").document(str(exercise_id)).set(
+            {"id": exercise_id, "name": f"Cloud {exercise_id}", "description": "Cloud", "difficulty": 2,
+             "is_public": exercise_id != ids[1], "owner_id": 1, "favorite_count": 0, "save_count": 0}
+        )
+    client.post(f"/favorites/{ids[2]}", headers=other)
+    client.post(f"/saves/{ids[2]}", headers=owner)
+
+    # Private documents of other users are hidden and skip/limit page over the visible ones.
+    page = client.get("/exercises/?use_cloud=true&skip=1&limit=2", headers=other).json()
+    assert [item["id"] for item in page] == [ids[2], ids[3]]
+    assert page[0]["favorite_count"] == 1 and page[0]["save_count"] == 1
+    assert page[0]["user_has_favorited"] is True and page[0]["user_has_saved"] is False
+
+    page = client.get("/exercises/?use_cloud=true&fields=user_has_saved", headers=owner).json()
+    assert [item["id"] for item in page] == ids
+    assert [item["user_has_saved"] for item in page] == [False, False, True, False]
+
+def test_sharded_counters(client, monkeypatch):
+    fake = FakeFirestore()
+    monkeypatch.setattr(migrate, "db_firestore", fake)
+    monkeypatch.setattr(exercises, "db_firestore", fake)
+    monkeypatch.setattr(firestore_counters.store, "client", fake)
+    monkeypatch.setattr(firestore_counters.store, "num_shards", 4)
+    monkeypatch.setattr(settings, "FIRESTORE_COUNTERS_ENABLED", True)
+    headers = register_and_login(client, "shard_user", "pass")
+    data = {"name": "Deadlift", "description": "Lift", "difficulty": 4, "is_public": True}
+    exercise_id = client.post("/exercises/", json=data, headers=headers).json()["id"]
+    client.post(f"/favorites/{exercise_id}", headers=headers)
+
+    # Migration seeds the shards and the document with the SQLite counts.
+    response = client.post("/migrate/exercises", headers=headers)
+    assert response.status_code == 202
+    assert wait_for_job(client, response.json()["job_id"], headers)["result"] == {"migrated": 1}
+    shards = fake.collection("exercises").document(str(exercise_id)).collection("counter_shards")
+    assert len(shards.docs) == 4
+    assert firestore_counters.store.totals(exercise_id) == {"favorite_count": 1, "save_count": 0}
+
+    # Changes increment random shards; cloud reads see them after a rollup.
+    for i in range(5):
+        other = register_and_login(client, f"shard_other{i}", "pass")
+        client.post(f"/saves/{exercise_id}", headers=other)
+    client.delete(f"/favorites/{exercise_id}", headers=headers)
+    assert firestore_counters.store.totals(exercise_id) == {"favorite_count": 0, "save_count": 5}
+    item = client.get("/exercises/?use_cloud=true", headers=headers).json()[0]
+    assert (item["favorite_count"], item["save_count"]) == (1, 0)
+    assert firestore_counters.rollup() == 1
+    item = client.get("/exercises/?use_cloud=true", headers=headers).json()[0]
+    assert (item["favorite_count"], item["save_count"]) == (0, 5)
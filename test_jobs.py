@@ -0,0 +1,94 @@
+import threading
+import time
+
+from app.db import jobs
+from helpers import login_with_id, register_and_login, wait_for_job
+
+release = threading.Event()
+
+@jobs.handler("test_count")
+def count_job(context):
+    context.set_total(context.params["n"])
+    for i in range(context.params["n"]):
+        if i == context.params.get("wait_at"):
+            release.wait(10)
+        context.advance()
+    return {"counted": context.processed}
+
+def test_job_reports_progress_and_result(client, monkeypatch):
+    monkeypatch.setattr(jobs, "PROGRESS_INTERVAL_SECONDS", 0)
+    user_id, headers = login_with_id(client, "job_user")
+    release.clear()
+    job_id = jobs.runner.submit("test_count", {"n": 10, "wait_at": 5}, user_id)
+
+    job = wait_for_job(client, job_id, headers, statuses=("running",))
+    while job["processed"] < 5:
+        job = client.get(f"/jobs/{job_id}", headers=headers).json()
+    assert (job["status"], job["total"], job["progress"]) == ("running", 10, 0.5)
+    assert job["eta_seconds"] is not None
+
+    release.set()
+    job = wait_for_job(client, job_id, headers)
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"counted": 10} and job["progress"] == 1.0
+
+def test_cancel_running_job(client, monkeypatch):
+    monkeypatch.setattr(jobs, "PROGRESS_INTERVAL_SECONDS", 0)
+    user_id, headers = login_with_id(client, "job_cancel")
+    release.clear()
+    job_id = jobs.runner.submit("test_count", {"n": 10, "wait_at": 3}, user_id)
+    wait_for_job(client, job_id, headers, statuses=("running",))
+
+    # Other users can neither see nor cancel it
+    other = register_and_login(client, "job_other", "pass")
+    assert client.get(f"/jobs/{job_id}", headers=other).status_code == 404
+    assert client.post(f"/jobs/{job_id}/cancel", headers=other).status_code == 404
+    assert client.get(f"/jobs/{job_id}").status_code == 404
+
+    assert client.post(f"/jobs/{job_id}/cancel", headers=headers).status_code == 202
+    release.set()
+    job = wait_for_job(client, job_id, headers)
+    assert job["status"] == "cancelled" and job["processed"] < 10 and job["result"] is None
+
+    assert client.get("/jobs/999999", headers=headers).status_code == 404
+    assert client.post("/jobs/999999/cancel", headers=headers).status_code == 404
+
+def test_shutdown_leaves_jobs_for_other_workers(client, monkeypatch):
+    monkeypatch.setattr(jobs, "PROGRESS_INTERVAL_SECONDS", 0)
+    user_id, headers = login_with_id(client, "job_shutdown")
+    release.clear()
+    stopping = jobs.JobRunner(max_workers=1, max_queued=5)
+    running_id = stopping.submit("test_count", {"n": 10, "wait_at": 2}, user_id)
+    queued_id = stopping.submit("test_count", {"n": 3}, user_id)
+    wait_for_job(client, running_id, headers, statuses=("running",))
+
+    # A graceful stop lets the running job finish and leaves the queued one alone
+    stop = threading.Thread(target=stopping.stop, args=(10,))
+    stop.start()
+    time.sleep(0.1)
+    release.set()
+    stop.join(10)
+    assert wait_for_job(client, running_id, headers)["status"] == "succeeded"
+    assert client.get(f"/jobs/{queued_id}", headers=headers).json()["status"] == "queued"
+
+    # Another worker's runner adopts it
+    jobs.runner.adopt_queued()
+    job = wait_for_job(client, queued_id, headers)
+    assert job["status"] == "succeeded" and job["result"] == {"counted": 3}
+
+def test_shutdown_timeout_queues_running_job_again(client, monkeypatch):
+    monkeypatch.setattr(jobs, "PROGRESS_INTERVAL_SECONDS", 0)
+    user_id, headers = login_with_id(client, "job_interrupted")
+    release.clear()
+    stopping = jobs.JobRunner(max_workers=1, max_queued=5)
+    job_id = stopping.submit("test_count", {"n": 10, "wait_at": 2}, user_id)
+    wait_for_job(client, job_id, headers, statuses=("running",))
+
+    # Still running when the wait ends: interrupted at its next progress update, not cancelled
+    stop = threading.Thread(target=stopping.stop, args=(0.1,))
+    stop.start()
+    time.sleep(0.3)
+    release.set()
+    stop.join(10)
+    job = client.get(f"/jobs/{job_id}", headers=headers).json()
+    assert (job["status"], job["processed"], job["cancel_requested"]) == ("queued", 0, False)
@@ -0,0 +1,18 @@
+from helpers import register_and_login
+
+def test_metrics_endpoint(client):
+    headers = register_and_login(client, "metrics_user", "pass")
+
+    # Create and fetch an exercise so the route template shows up in the histograms.
+    create_data = {"name": "Lunges", "description": "Do lunges", "difficulty": 2, "is_public": True}
+    exercise_id = client.post("/exercises/", json=create_data, headers=headers).json()["id"]
+    client.get(f"/exercises/{exercise_id}", headers=headers)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    body = response.text
+    # Latency is labelled by the route template, not the concrete path.
+    assert 'http_request_duration_seconds_count{method="GET",route="/exercises/{exercise_id}"}' in body
+    assert f"/exercises/{exercise_id}\"" not in body
+    assert "db_pool_checkout_wait_seconds_count" in body
+    assert "db_pool_connections_in_use" in body
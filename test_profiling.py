@@ -0,0 +1,36 @@
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.core import profiling
+
+def test_profiling_only_for_token_requests(tmp_path):
+    engine = create_engine("sqlite://")
+    read_engine = create_engine("sqlite://")
+    app = FastAPI()
+
+    @app.get("/slow")
+    def slow():
+        with engine.connect() as conn, read_engine.connect() as reader:
+            reader.execute(text("SELECT :secret, :id"), {"secret": "hash$abc", "id": 7})
+            return {"value": conn.execute(text("SELECT 41 + 1")).scalar()}
+
+    profiling.install(app, (engine, read_engine), "secret", str(tmp_path))
+    with TestClient(app) as client:
+        # Requests without the token (or with a wrong one) are not profiled.
+        assert "x-profile-report" not in client.get("/slow").headers
+        assert "x-profile-report" not in client.get("/slow", headers={"X-Profile-Token": "guess"}).headers
+        assert list(tmp_path.iterdir()) == []
+
+        response = client.get("/slow", headers={"X-Profile-Token": "secret"})
+        assert response.json() == {"value": 42}
+
+    report = json.loads((tmp_path / f"{response.headers['x-profile-report']}.json").read_text())
+    assert report["path"] == "/slow" and report["duration_seconds"] > 0
+    statements = report["statements"]
+    assert [statement["sql"] for statement in statements] == ["SELECT ?, ?", "SELECT 41 + 1"]
+    # Parameters are redacted before the report is written
+    assert statements[0]["parameters"] == ["<str len=8>", 7]
+    assert "hash$abc" not in json.dumps(report)
@@ -0,0 +1,64 @@
+import threading
+import time
+
+from app.core.singleflight import SingleFlight
+
+def test_concurrent_calls_share_one_computation():
+    flight = SingleFlight("test_singleflight")
+    calls = []
+    results = []
+
+    def slow_load():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"id": 1}
+
+    # Start several identical requests while the first one is still in flight.
+    threads = [threading.Thread(target=lambda: results.append(flight.do(1, slow_load))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [{"id": 1}] * 5
+
+    # Once the flight has finished, the next call computes again.
+    flight.do(1, slow_load)
+    assert len(calls) == 2
+
+def test_recent_writer_does_not_join_an_older_flight(client, monkeypatch):
+    from app.routers import exercises
+    from helpers import register_and_login
+
+    owner = register_and_login(client, "flight_owner", "pass")
+    reader = register_and_login(client, "flight_reader", "pass")
+    data = {"name": "Row", "description": "Row", "difficulty": 2, "is_public": True}
+    exercise_id = client.post("/exercises/", json=data, headers=owner).json()["id"]
+
+    # The reader's load reads the row, then stalls before returning it
+    loaded, release = threading.Event(), threading.Event()
+    snapshot = exercises._exercise_snapshot
+    def stalled_snapshot(db, *args):
+        result = snapshot(db, *args)
+        if not loaded.is_set():
+            loaded.set()
+            release.wait(10)
+        return result
+    monkeypatch.setattr(exercises, "_exercise_snapshot", stalled_snapshot)
+    leader = threading.Thread(target=client.get, args=(f"/exercises/{exercise_id}",), kwargs={"headers": reader})
+    leader.start()
+    assert loaded.wait(10)
+
+    # The owner's read after their update must not be answered by that older load
+    client.put(f"/exercises/{exercise_id}", json={"name": "Pendlay Row"}, headers=owner)
+    responses = []
+    follower = threading.Thread(
+        target=lambda: responses.append(client.get(f"/exercises/{exercise_id}", headers=owner).json())
+    )
+    follower.start()
+    follower.join(5)
+    release.set()
+    follower.join(10)
+    leader.join(10)
+    assert responses[0]["name"] == "Pendlay Row"
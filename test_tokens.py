@@ -0,0 +1,101 @@
+from app.core.bloom import BloomFilter
+from app.db.database import SessionLocal
+from app.db.models import RevokedToken
+from app.db.token_revocation import refresh_checks, revocations
+
+def login(client, username):
+    client.post("/auth/register", json={"username": username, "password": "pass"})
+    return client.post("/auth/login", json={"username": username, "password": "pass"}).json()
+
+def refresh(client, token):
+    return client.post("/auth/refresh", json={"refresh_token": token})
+
+def test_bloom_filter():
+    bloom = BloomFilter(1000, 0.01)
+    keys = [f"key{i}" for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"other{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+def test_refresh_rotates_without_database(client, monkeypatch):
+    tokens = login(client, "rotator")
+
+    def no_database():
+        raise AssertionError("refresh touched the database")
+    monkeypatch.setattr(revocations, "session_factory", no_database)
+    fast_before = refresh_checks.value(("filter", "ok"))
+    response = refresh(client, tokens["refresh_token"])
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["user_id"] == tokens["user_id"]
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    assert refresh_checks.value(("filter", "ok")) == fast_before + 1
+
+    # The new access token works, and so does the next refresh token.
+    headers = {"Authorization": f"Bearer {rotated['access_token']}"}
+    assert client.get("/exercises/", headers=headers).status_code == 200
+    assert refresh(client, rotated["refresh_token"]).status_code == 200
+
+def test_reuse_revokes_family(client):
+    tokens = login(client, "victim")
+    first = refresh(client, tokens["refresh_token"]).json()
+
+    # A stolen copy of the used token comes back, from memory and after a sync.
+    assert refresh(client, tokens["refresh_token"]).status_code == 401
+    assert refresh(client, first["refresh_token"]).json()["detail"] == "Refresh token revoked"
+
+    other = login(client, "victim")
+    second = refresh(client, other["refresh_token"]).json()
+    revocations.sync()
+    assert refresh(client, other["refresh_token"]).status_code == 401
+    assert refresh(client, second["refresh_token"]).status_code == 401
+
+    # Revocations survive a restart through the table.
+    db = SessionLocal()
+    try:
+        assert db.query(RevokedToken).filter(RevokedToken.kind == "family").count() == 2
+    finally:
+        db.close()
+    revocations.rebuild()
+    assert refresh(client, first["refresh_token"]).status_code == 401
+
+def test_legacy_refresh_token_is_rotated_once(client):
+    from datetime import datetime, timedelta
+    from jose import jwt
+    from app.core.config import settings
+    from app.core.security import ALGORITHM
+
+    tokens = login(client, "legacy")
+    # Issued before rotation: no jti or fam claim
+    legacy = jwt.encode(
+        {"exp": datetime.utcnow() + timedelta(days=1), "sub": str(tokens["user_id"]), "scope": "refresh_token"},
+        settings.JWT_SECRET_KEY, algorithm=ALGORITHM,
+    )
+    response = refresh(client, legacy)
+    assert response.status_code == 200 and response.json()["user_id"] == tokens["user_id"]
+    rotated = refresh(client, response.json()["refresh_token"]).json()["refresh_token"]
+
+    # A second use is reuse, which revokes the family it was rotated into
+    assert refresh(client, legacy).status_code == 401
+    assert refresh(client, rotated).json()["detail"] == "Refresh token revoked"
+
+def test_revoke_endpoint(client):
+    tokens = login(client, "leaky")
+    rotated = refresh(client, tokens["refresh_token"]).json()
+    assert client.post("/auth/revoke", json={"refresh_token": tokens["refresh_token"]}).status_code == 204
+    assert refresh(client, rotated["refresh_token"]).status_code == 401
+    assert client.post("/auth/revoke", json={"refresh_token": "garbage"}).status_code == 204
+    # Other logins are unaffected.
+    assert refresh(client, login(client, "leaky")["refresh_token"]).status_code == 200
+
+def test_filter_grows_when_full(client, monkeypatch):
+    monkeypatch.setattr(revocations, "capacity", 4)
+    revocations.rebuild()
+    tokens = login(client, "busy")
+    for _ in range(6):
+        tokens = refresh(client, tokens["refresh_token"]).json()
+    revocations.sync()
+    assert revocations._filter.capacity >= 12
+    assert refresh(client, tokens["refresh_token"]).status_code == 200
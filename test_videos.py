@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+from app.core import file_ranges, video_storage
+from helpers import register_and_login
+
+VIDEO = bytes(range(256)) * 4096  # 1 MiB
+
+@pytest.fixture
+def video_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(video_storage.store, "root", str(tmp_path))
+    return tmp_path
+
+def create_with_video(client, headers, is_public=True):
+    data = {"name": "Squat", "description": "Squat", "difficulty": 2, "is_public": is_public}
+    exercise_id = client.post("/exercises/", json=data, headers=headers).json()["id"]
+    response = client.put(
+        f"/videos/{exercise_id}", content=VIDEO, headers={**headers, "Content-Type": "video/mp4"}
+    )
+    assert response.status_code == 200, response.text
+    return exercise_id, response.json()
+
+def test_upload_sets_video_url_and_streams_whole_file(client, video_dir):
+    headers = register_and_login(client, "video_owner", "pass")
+    exercise_id, uploaded = create_with_video(client, headers)
+    assert uploaded["size"] == len(VIDEO)
+    assert uploaded["video_url"].endswith(f"/videos/{exercise_id}")
+    assert client.get(f"/exercises/{exercise_id}", headers=headers).json()["video_url"] == uploaded["video_url"]
+
+    response = client.get(f"/videos/{exercise_id}")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "video/mp4"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.content == VIDEO
+
+    head = client.head(f"/videos/{exercise_id}")
+    assert head.status_code == 200
+    assert head.headers["content-length"] == str(len(VIDEO))
+    assert head.content == b""
+
+def test_range_requests(client, video_dir):
+    headers = register_and_login(client, "range_owner", "pass")
+    exercise_id, _ = create_with_video(client, headers)
+    url = f"/videos/{exercise_id}"
+
+    response = client.get(url, headers={"Range": "bytes=1000-1999"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 1000-1999/{len(VIDEO)}"
+    assert response.content == VIDEO[1000:2000]
+
+    response = client.get(url, headers={"Range": "bytes=-10"})
+    assert response.status_code == 206
+    assert response.content == VIDEO[-10:]
+
+    response = client.get(url, headers={"Range": "bytes=1040000-"})
+    assert response.content == VIDEO[1040000:]
+
+    response = client.get(url, headers={"Range": f"bytes={len(VIDEO)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(VIDEO)}"
+
+    # A stale If-Range validator gets the whole (changed) file
+    response = client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert len(response.content) == len(VIDEO)
+
+def test_etag_revalidation(client, video_dir):
+    headers = register_and_login(client, "etag_owner", "pass")
+    exercise_id, _ = create_with_video(client, headers)
+    etag = client.head(f"/videos/{exercise_id}").headers["etag"]
+
+    response = client.get(f"/videos/{exercise_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = client.get(f"/videos/{exercise_id}", headers={"Range": "bytes=0-3", "If-Range": etag})
+    assert response.status_code == 206
+
+def test_private_videos_and_permissions(client, video_dir):
+    owner = register_and_login(client, "private_owner", "pass")
+    other = register_and_login(client, "other_viewer", "pass")
+    exercise_id, _ = create_with_video(client, owner, is_public=False)
+
+    assert client.get(f"/videos/{exercise_id}").status_code == 403
+    assert client.get(f"/videos/{exercise_id}", headers=other).status_code == 403
+    assert client.get(f"/videos/{exercise_id}", headers=owner).status_code == 200
+
+    # <video> elements get a URL with a token for this one video; access tokens aren't accepted there
+    access_token = owner["Authorization"].split()[1]
+    assert client.get(f"/videos/{exercise_id}?token={access_token}").status_code == 401
+    assert client.post(f"/videos/{exercise_id}/token", headers=other).status_code == 403
+    signed = client.post(f"/videos/{exercise_id}/token", headers=owner).json()
+    assert signed["expires_in"] > 0
+    assert client.get(signed["url"]).status_code == 200
+    other_id, _ = create_with_video(client, owner, is_public=False)
+    video_token = signed["url"].split("token=")[1]
+    assert client.get(f"/videos/{other_id}?token={video_token}").status_code == 401
+
+    response = client.put(f"/videos/{exercise_id}", content=b"x", headers={**other, "Content-Type": "video/mp4"})
+    assert response.status_code == 403
+    response = client.put(f"/videos/{exercise_id}", content=b"x", headers={**owner, "Content-Type": "image/png"})
+    assert response.status_code == 415
+
+def test_delete_removes_file(client, video_dir):
+    headers = register_and_login(client, "delete_owner", "pass")
+    exercise_id, _ = create_with_video(client, headers)
+    assert client.delete(f"/videos/{exercise_id}", headers=headers).status_code == 204
+    assert client.get(f"/exercises/{exercise_id}", headers=headers).json()["video_url"] == ""
+    assert client.get(f"/videos/{exercise_id}").status_code == 404
+
+    exercise_id, _ = create_with_video(client, headers)
+    client.delete(f"/exercises/{exercise_id}", headers=headers)
+    assert not list(video_dir.iterdir())
+
+def test_zero_copy_send_when_server_supports_it(tmp_path):
+    path = tmp_path / "1.mp4"
+    path.write_bytes(VIDEO)
+    response = file_ranges.FileRangeResponse(str(path), 100, 50, 206, {"content-length": "50"}, "video/mp4")
+    messages = []
+
+    async def send(message):
+        if message["type"] == file_ranges.ZEROCOPY_EXTENSION:
+            message["file"].seek(message["offset"])
+            message = {**message, "data": message["file"].read(message["count"])}
+        messages.append(message)
+
+    scope = {"type": "http", "extensions": {file_ranges.ZEROCOPY_EXTENSION: {}}}
+    asyncio.run(response(scope, None, send))
+    assert messages[0]["status"] == 206
+    assert messages[1]["type"] == file_ranges.ZEROCOPY_EXTENSION
+    assert messages[1]["data"] == VIDEO[100:150]